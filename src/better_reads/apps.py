@@ -6,3 +6,8 @@ class BetterReadsConfig(AppConfig):
     """Config for the better_reads application."""
 
     name = "better_reads"
+
+    def ready(self):
+        """Import signals."""
+        # noqa pylint: disable=unused-import,import-outside-toplevel
+        from better_reads import signals
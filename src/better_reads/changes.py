@@ -0,0 +1,132 @@
+"""Change feed of users' shelves, shelfbooks and reviews for delta sync."""
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from django.db.models.expressions import RawSQL
+from rest_framework.response import Response
+from rest_framework_json_api import utils
+
+from webapp.pagination import JsonApiCursorPagination
+from webapp.prefetch import plan
+from webapp.renderers import JSONAPIRenderer
+
+from . import objects
+from .models import Change, Review, Shelf, Shelfbook
+from .serializers import ReviewSerializer, ShelfbookSerializer, ShelfSerializer
+
+# Every transaction with a lower id has committed or rolled back.
+TXID_HORIZON_SQL = "txid_snapshot_xmin(txid_current_snapshot())"
+
+# Resource name: (model, serializer, lookup of the owner).
+RESOURCES = OrderedDict(
+    [
+        (Shelf.JSONAPIMeta.resource_name, (Shelf, ShelfSerializer, "user")),
+        (
+            Shelfbook.JSONAPIMeta.resource_name,
+            (Shelfbook, ShelfbookSerializer, "shelf__user"),
+        ),
+        (Review.JSONAPIMeta.resource_name, (Review, ReviewSerializer, "user")),
+    ]
+)
+
+
+def get_changes(user):
+    """Return the changes to the user's library which can no longer move.
+
+    The log is ordered by the id of the writing transaction: changes are only
+    served once every transaction with a lower id has ended, so a transaction
+    committing late can never land behind a cursor handed out earlier.
+    """
+    return Change.objects.filter(user=user, txid__lt=RawSQL(TXID_HORIZON_SQL, []))
+
+
+def collapse(changes: List[Change]) -> Dict[Tuple[str, int], str]:
+    """Return the latest action of each record, in the order of their last change."""
+    actions: Dict[Tuple[str, int], str] = OrderedDict()
+    for change in changes:
+        key = (change.resource_name, change.resource_id)
+        action = change.action
+        if (
+            action == objects.ChangeAction.updated.value
+            and actions.get(key) == objects.ChangeAction.created.value
+        ):
+            action = objects.ChangeAction.created.value
+        actions.pop(key, None)
+        actions[key] = action
+    return actions
+
+
+def get_resources(request, changes: List[Change]) -> List[Dict]:
+    """Return the current state of the changed records, or their tombstones.
+
+    Records which are gone, or no longer owned by the user, are returned as
+    resource identifiers with a `deleted` action.
+    """
+    actions = collapse(changes)
+    deleted = objects.ChangeAction.deleted.value
+    resources = {}
+    for resource_name, (model, serializer_class, owner) in RESOURCES.items():
+        pks = [
+            pk
+            for (name, pk), action in actions.items()
+            if name == resource_name and action != deleted
+        ]
+        if not pks:
+            continue
+        select, prefetch = plan(serializer_class, [])
+        queryset = (
+            model.objects.filter(pk__in=pks, **{owner: request.user})
+            .select_related(*select)
+            .prefetch_related(*prefetch)
+        )
+        serializer = serializer_class(
+            list(queryset), many=True, context={"request": request}
+        )
+        fields = utils.get_serializer_fields(serializer.child)
+        for resource, instance in zip(serializer.data, serializer.instance):
+            key = (resource_name, instance.pk)
+            resources[key] = JSONAPIRenderer.build_json_resource_obj(
+                fields, resource, instance, resource_name
+            )
+    data = []
+    for (resource_name, pk), action in actions.items():
+        resource = resources.get((resource_name, pk))
+        if resource is None:
+            resource = OrderedDict([("type", resource_name), ("id", str(pk))])
+            action = deleted
+        resource["meta"] = {"action": action}
+        data.append(resource)
+    return data
+
+
+class ChangeFeedPagination(JsonApiCursorPagination):
+    """Forward-only keyset pagination over the change log.
+
+    `meta.cursor` is the high-water mark to poll from next, even when the page
+    is empty; `links.next` is only set while more changes are waiting.
+    """
+
+    ordering = ["txid", "pk"]
+    max_page_size = 1000
+
+    def decode_cursor(self, request):
+        """Return the position of the requested cursor, always going forward."""
+        cursor = super().decode_cursor(request)
+        return None if cursor is None else (cursor[0], False)
+
+    def get_cursor(self) -> str:
+        """Return the cursor positioned after the last change of the page."""
+        if self.results:
+            return self.encode_cursor(self.results[-1], False)
+        return self.request.query_params.get(self.cursor_query_param, "")
+
+    def get_paginated_response(self, data):
+        """Return the changed resources with the cursor to continue from."""
+        cursor = self.get_cursor()
+        return Response(
+            {
+                "data": data,
+                "meta": {"cursor": cursor},
+                "links": {"next": self.build_link(cursor) if self.has_next else None},
+            }
+        )
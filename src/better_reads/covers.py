@@ -0,0 +1,224 @@
+"""Render book covers into thumbnails for lists, cards and detail pages."""
+import io
+import logging
+from hashlib import sha1
+from typing import Dict, List, NamedTuple, Optional
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from webapp.storage import delete_later
+
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+# Covers with more pixels are rejected before being decoded.
+MAX_PIXELS = 40_000_000
+RENDITIONS_PREFIX = "book_covers/renditions"
+UPLOADS_PREFIX = "book_covers/uploads"
+UPLOAD_FORMATS = ["JPEG", "PNG", "WEBP"]
+UPLOAD_CONTENT_TYPES = ["image/jpeg", "image/png", "image/webp"]
+INVALID_IMAGE = (
+    "Upload a valid image. The file you uploaded was either not an image or a "
+    "corrupted image."
+)
+
+
+class Rendition(NamedTuple):
+    """Name and bounding box of a rendition, in pixels."""
+
+    name: str
+    width: int
+    height: int
+
+
+class Format(NamedTuple):
+    """File extension, Pillow format and save options of an encoding."""
+
+    extension: str
+    pil_format: str
+    options: Dict
+
+
+# From the largest to the smallest, each is resized from the previous one.
+RENDITIONS = [
+    Rendition("full", 800, 1200),
+    Rendition("card", 320, 480),
+    Rendition("thumb", 120, 180),
+]
+FORMATS = [
+    Format("webp", "WEBP", {"quality": 80, "method": 4}),
+    Format("jpeg", "JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+]
+
+
+def get_key(book_id: int, source: str, rendition: str, extension: str) -> str:
+    """Return the storage key of a rendition of the cover stored at source.
+
+    Keys only depend on their inputs, so retried renders overwrite their own
+    files, while a new cover never reuses the URLs of the previous one.
+    """
+    digest = sha1(source.encode()).hexdigest()[:16]
+    return f"{RENDITIONS_PREFIX}/{book_id}/{digest}/{rendition}.{extension}"
+
+
+def get_keys(renditions: Dict) -> List[str]:
+    """Return the storage keys of the rendered files."""
+    return [
+        rendition[fmt.extension]
+        for rendition in renditions.get("renditions", {}).values()
+        for fmt in FORMATS
+    ]
+
+
+def get_upload_prefix(book_id: int) -> str:
+    """Return the prefix of the keys covers of the book are uploaded to."""
+    return f"{UPLOADS_PREFIX}/{book_id}/"
+
+
+def is_upload_key(book_id: int, name: str) -> bool:
+    """Return whether the key is one covers of the book are uploaded to."""
+    prefix = get_upload_prefix(book_id)
+    return name.startswith(prefix) and name[len(prefix) :].isalnum()
+
+
+def get_upload_error(name: str, max_size: int) -> Optional[str]:
+    """Return why an uploaded file cannot be a cover, if it cannot.
+
+    Only the size and content type are checked, from the file's metadata:
+    whether it is an image is checked when it is rendered.
+    """
+    head = default_storage.head(name)
+    if head is None:
+        return "No file was uploaded with this key."
+    size, content_type = head
+    if size > max_size:
+        return f"Covers are limited to {max_size} bytes."
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        return INVALID_IMAGE
+    return None
+
+
+class InvalidCover(ValueError):
+    """The cover is not an image renditions can be rendered from."""
+
+
+def overwrite(key: str, content: ContentFile) -> str:
+    """Write the file at key, replacing the one a previous render wrote.
+
+    S3 overwrites in place with one request. Other storages would pick
+    another name, so the previous file is deleted first.
+    """
+    if not getattr(default_storage, "file_overwrite", False):
+        default_storage.delete(key)
+    return default_storage.save(key, content)
+
+
+def decode(fyl, formats: Optional[List[str]] = None) -> Image.Image:
+    """Decode an image in RGB, no larger than the largest rendition needs.
+
+    JPEGs are scaled down by the decoder itself, so a large photo never has
+    its full resolution held in memory. Raises InvalidCover for files which
+    are not images, in one of the formats when given.
+    """
+    try:
+        image = Image.open(fyl)
+        if formats is not None and image.format not in formats:
+            raise InvalidCover(INVALID_IMAGE)
+        width, height = image.size
+        if width * height > MAX_PIXELS:
+            raise InvalidCover(f"Covers are limited to {MAX_PIXELS} pixels.")
+        image.draft("RGB", (RENDITIONS[0].width, RENDITIONS[0].height))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.convert("RGBA"))
+            return background
+        return image.convert("RGB")
+    except InvalidCover:
+        raise
+    except Exception as error:  # pylint: disable=broad-except
+        raise InvalidCover(INVALID_IMAGE) from error
+
+
+def render(book: Book, formats: Optional[List[str]] = None) -> Dict:
+    """Write the renditions of the book's cover and return their keys and sizes."""
+    source = book.cover.name
+    # Read before decoding, so storage errors are not taken for invalid images.
+    with book.cover.open("rb") as fyl:
+        content = fyl.read()
+    image = decode(io.BytesIO(content), formats)
+    renditions = {}
+    for rendition in RENDITIONS:
+        image.thumbnail((rendition.width, rendition.height), Image.LANCZOS)
+        files = {"width": image.width, "height": image.height}
+        for fmt in FORMATS:
+            output = io.BytesIO()
+            image.save(output, fmt.pil_format, **fmt.options)
+            key = get_key(book.pk, source, rendition.name, fmt.extension)
+            files[fmt.extension] = overwrite(key, ContentFile(output.getvalue()))
+        renditions[rendition.name] = files
+    return {"source": source, "renditions": renditions}
+
+
+def reject_cover(book_id: int, source: str):
+    """Put the cover rendered last back in place of one which is not an image."""
+    with transaction.atomic():
+        book = (
+            Book.objects.select_for_update()
+            .filter(pk=book_id)
+            .only("id", "cover", "cover_renditions")
+            .first()
+        )
+        stale = [source]
+        if book is not None and book.cover.name == source:
+            previous = book.cover_renditions.get("source")
+            if previous and default_storage.exists(previous):
+                book.cover = previous
+            else:
+                stale += get_keys(book.cover_renditions)
+                book.cover = None
+                book.cover_renditions = {}
+            book.save(update_fields=["cover", "cover_renditions"])
+    delete_later(stale)
+
+
+def process_cover(book_id: int):
+    """Render the current cover of the book, replacing the previous renditions.
+
+    Nothing is stored when the cover changed while rendering: the upload of
+    the new cover has queued its own render. Uploaded covers are first
+    checked to be images here, and put back to the previous cover if not.
+    """
+    book = Book.objects.filter(pk=book_id).only("id", "cover").first()
+    if book is None:
+        return
+    source: Optional[str] = book.cover.name or None
+    formats = UPLOAD_FORMATS if source and is_upload_key(book_id, source) else None
+    try:
+        renditions = render(book, formats) if source else {}
+    except InvalidCover:
+        logger.warning("Cover %s of book %s is not a valid image", source, book_id)
+        reject_cover(book_id, source)
+        return
+    with transaction.atomic():
+        book = (
+            Book.objects.select_for_update()
+            .filter(pk=book_id)
+            .only("id", "cover", "cover_renditions")
+            .first()
+        )
+        if book is None or (book.cover.name or None) != source:
+            stale = get_keys(renditions)
+        else:
+            previous = get_keys(book.cover_renditions)
+            stale = [key for key in previous if key not in get_keys(renditions)]
+            # The cover rendered last was kept in case this one was invalid.
+            if book.cover_renditions.get("source") not in (None, source):
+                stale.append(book.cover_renditions["source"])
+            book.cover_renditions = renditions
+            book.save(update_fields=["cover_renditions"])
+    delete_later(stale)
@@ -0,0 +1,226 @@
+"""Import libraries exported from Goodreads as CSV."""
+import csv
+import re
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils.timezone import now
+
+from webapp.cache import invalidate
+from webapp.storage import iter_lines
+
+from . import objects
+from .models import Book, LibraryImport, Review, Shelf
+from .signals import get_book_namespace
+
+CHUNK_SIZE = 1000
+
+# Goodreads puts every book on exactly one of these shelves.
+EXCLUSIVE_SHELVES = {
+    "to-read": objects.ReadStatus.wish.value,
+    "currently-reading": objects.ReadStatus.reading.value,
+    "read": objects.ReadStatus.read.value,
+}
+
+INVALID_LIBRARY_MESSAGE = "The file is not a CSV export encoded in UTF-8."
+
+# Only the rows actually inserted are returned, so they can be counted.
+INSERT_SHELFBOOKS_SQL = """
+INSERT INTO better_reads_shelfbook (shelf_id, book_id, status, updated_at)
+SELECT shelf_id, book_id, status, %s
+FROM unnest(%s::integer[], %s::integer[], %s::varchar[])
+    AS shelfbook (shelf_id, book_id, status)
+ON CONFLICT (shelf_id, book_id) DO NOTHING
+RETURNING shelf_id, book_id
+"""
+
+# "Title (Series, #1)" is stored as "Title" by most libraries.
+SERIES_RE = re.compile(r"\s*\([^()]*#[\d.]+\)$")
+
+
+def normalize(value: str) -> str:
+    """Return the value lower-cased, with whitespace collapsed."""
+    return " ".join(value.split()).lower()
+
+
+def read_rows(lines: Iterable[bytes]) -> Iterator[Dict[str, str]]:
+    """Iterate over the rows of a CSV file, reading it one line at a time."""
+    return csv.DictReader(line.decode("utf-8-sig") for line in lines)
+
+
+def read_chunks(rows: Iterable, size: int = CHUNK_SIZE) -> Iterator[List]:
+    """Yield lists of up to size consecutive rows."""
+    rows = iter(rows)
+    chunk = list(islice(rows, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, size))
+
+
+def get_titles(row: Dict[str, str]) -> List[str]:
+    """Return the normalized titles the row's book may be stored under."""
+    title = normalize(row.get("Title") or "")
+    without_series = SERIES_RE.sub("", title)
+    return [title, without_series] if without_series != title else [title]
+
+
+def get_shelves(row: Dict[str, str]) -> Tuple[List[str], str]:
+    """Return the shelf names of the row and the read status they imply."""
+    exclusive = (row.get("Exclusive Shelf") or "").strip() or "to-read"
+    names = [name.strip() for name in (row.get("Bookshelves") or "").split(",")]
+    if exclusive not in names:
+        names.append(exclusive)
+    max_length = Shelf._meta.get_field("name").max_length
+    names = list(dict.fromkeys(name[:max_length] for name in names if name))
+    return names, EXCLUSIVE_SHELVES.get(exclusive, objects.ReadStatus.wish.value)
+
+
+def get_rate(row: Dict[str, str]) -> str:
+    """Return the rate of the row as a Review.rate, blank when unrated."""
+    rate = (row.get("My Rating") or "").strip()
+    return rate if rate in dict(Review.ratings) else ""
+
+
+class InvalidLibrary(ValueError):
+    """The file is not a library export rows can be read from."""
+
+
+class BookIndex:
+    """In-memory index of the books a chunk of rows may refer to.
+
+    Built with one query per chunk, through the lower(title) index. Books are
+    matched by title and author, or by title alone when it is unambiguous.
+    """
+
+    def __init__(self, rows: List[Dict[str, str]]):
+        """Load the books whose title matches one of the rows."""
+        titles = {title for row in rows for title in get_titles(row)}
+        self.by_title_author: Dict[Tuple[str, str], int] = {}
+        self.by_title: Dict[str, set] = defaultdict(set)
+        books = (
+            Book.objects.annotate(title_lower=Lower("title"))
+            .filter(title_lower__in=titles)
+            .values_list("pk", "title", "author")
+        )
+        for pk, title, author in books:
+            self.by_title_author[(normalize(title), normalize(author))] = pk
+            self.by_title[normalize(title)].add(pk)
+
+    def get(self, row: Dict[str, str]) -> Optional[int]:
+        """Return the primary key of the row's book, if it is known."""
+        author = normalize(row.get("Author") or "")
+        titles = get_titles(row)
+        for title in titles:
+            if (title, author) in self.by_title_author:
+                return self.by_title_author[(title, author)]
+        for title in titles:
+            if len(self.by_title[title]) == 1:
+                return next(iter(self.by_title[title]))
+        return None
+
+
+class LibraryImporter:
+    """Import a Goodreads export into a user's shelves and reviews.
+
+    The file is streamed in chunks of `chunk_size` rows; each chunk is written
+    with one insert per model in its own transaction, then the progress
+    counters of the import are updated. Shelfbooks and reviews which already
+    exist are left as they are and counted as skipped, so an import can be
+    run again.
+    """
+
+    chunk_size = CHUNK_SIZE
+
+    def __init__(self, library_import: LibraryImport):
+        """Load the shelves the user already has."""
+        self.library_import = library_import
+        self.user_id = library_import.user_id
+        self.shelves = dict(
+            Shelf.objects.filter(user=self.user_id).values_list("name", "pk")
+        )
+
+    def run(self):
+        """Import every chunk of the file."""
+        lines = iter_lines(self.library_import.file.name)
+        try:
+            for chunk in read_chunks(read_rows(lines), self.chunk_size):
+                with transaction.atomic():
+                    counts = self.import_chunk(chunk)
+                    LibraryImport.objects.filter(pk=self.library_import.pk).update(
+                        processed=F("processed") + len(chunk),
+                        **{name: F(name) + count for name, count in counts.items()},
+                    )
+        except (csv.Error, UnicodeDecodeError) as error:
+            raise InvalidLibrary(INVALID_LIBRARY_MESSAGE) from error
+
+    def create_shelves(self, names: Iterable[str]):
+        """Create the shelves the user does not have yet."""
+        shelves = Shelf.objects.bulk_create(
+            Shelf(name=name, user_id=self.user_id)
+            for name in dict.fromkeys(names)
+            if name not in self.shelves
+        )
+        self.shelves.update((shelf.name, shelf.pk) for shelf in shelves)
+
+    @staticmethod
+    def create_shelfbooks(shelfbooks: Dict[Tuple[int, int], str]) -> int:
+        """Create the shelfbooks which do not exist yet, return their count.
+
+        Rows inserted by concurrent imports since the chunk started are left
+        as they are and not counted.
+        """
+        if not shelfbooks:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                INSERT_SHELFBOOKS_SQL,
+                [
+                    now(),
+                    [shelf_id for shelf_id, _ in shelfbooks],
+                    [book_id for _, book_id in shelfbooks],
+                    list(shelfbooks.values()),
+                ],
+            )
+            return len(cursor.fetchall())
+
+    def import_chunk(self, rows: List[Dict[str, str]]) -> Dict[str, int]:
+        """Write the shelfbooks and reviews of the rows, return their counts."""
+        index = BookIndex(rows)
+        shelfbooks: Dict[Tuple[int, int], str] = {}
+        reviews: Dict[int, Review] = {}
+        matched = []
+        for row in rows:
+            book_id = index.get(row)
+            if book_id is not None:
+                matched.append((row, book_id, *get_shelves(row)))
+        self.create_shelves(name for _, _, names, _ in matched for name in names)
+        for row, book_id, names, status in matched:
+            for name in names:
+                shelfbooks[(self.shelves[name], book_id)] = status
+            rate, content = get_rate(row), (row.get("My Review") or "").strip()
+            if rate or content:
+                reviews[book_id] = Review(
+                    rate=rate, content=content, user_id=self.user_id, book_id=book_id
+                )
+        shelved = self.create_shelfbooks(shelfbooks)
+        reviewed = set(
+            Review.objects.filter(user=self.user_id, book__in=reviews).values_list(
+                "book", flat=True
+            )
+        )
+        created_reviews = Review.objects.bulk_create(
+            review for book_id, review in reviews.items() if book_id not in reviewed
+        )
+        for review in created_reviews:
+            # bulk_create sends no signals, the ratings of books have changed.
+            invalidate(get_book_namespace(review.book_id))
+        return {
+            "shelved": shelved,
+            "reviewed": len(created_reviews),
+            "skipped": len(shelfbooks) - shelved + len(reviewed),
+            "unmatched": len(rows) - len(matched),
+        }
@@ -0,0 +1,68 @@
+"""Management command to delete the cover files no book refers to."""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from better_reads.orphans import MIN_AGE, RATE, collect_orphans, set_checkpoint
+
+
+class Command(BaseCommand):
+    """Management command to delete the cover files no book refers to."""
+
+    help = (
+        "List the covers and renditions in the bucket page by page and delete "
+        "those no book refers to, 1000 at a time. Interrupted runs resume "
+        "after the last page collected."
+    )
+
+    def add_arguments(self, parser):
+        """Add the age, rate, time limit, restart and dry run arguments."""
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=MIN_AGE.total_seconds() / 3600,
+            help="Only delete files older than this many hours. Default: %(default)s",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=RATE,
+            help="Send at most this many S3 requests per second. Default: %(default)s",
+        )
+        parser.add_argument(
+            "--time-limit",
+            type=float,
+            help="Stop after this many seconds, to resume on the next run.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Start from the first file instead of resuming.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the orphaned files without deleting them.",
+        )
+
+    def handle(self, *args, **options):
+        """Run the management command."""
+        if options["restart"]:
+            set_checkpoint("")
+        collection = collect_orphans(
+            min_age=timedelta(hours=options["min_age"]),
+            rate=options["rate"],
+            time_limit=options["time_limit"],
+            dry_run=options["dry_run"],
+        )
+        if options["verbosity"] >= 1:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Listed {collection.listed} files, {collection.orphaned} "
+                    f"orphaned, {collection.deleted} deleted"
+                )
+            )
+            if not collection.finished:
+                self.stdout.write(
+                    self.style.NOTICE("Stopped by the time limit, run again to resume")
+                )
@@ -0,0 +1,105 @@
+"""Management command to compare the query plans before and after indexing."""
+from typing import List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, QuerySet
+
+from better_reads.models import Book, Review, Shelf, Shelfbook
+
+# Puts back the indexes of the shelves, shelfbooks and reviews as they were
+# before migrations 0013_accessPathIndexes and 0016_dropForeignKeyIndexes,
+# inside a transaction rolled back.
+BEFORE_INDEXES_SQL = """
+DROP INDEX shelf_user_public_idx;
+DROP INDEX shelf_public_idx;
+DROP INDEX review_book_created_idx;
+ALTER TABLE better_reads_shelfbook DROP CONSTRAINT shelfbook_shelf_book_uniq;
+CREATE INDEX ON better_reads_shelf (user_id);
+CREATE INDEX ON better_reads_shelfbook (shelf_id);
+CREATE INDEX ON better_reads_review (book_id);
+"""
+
+
+def get_access_paths(shelf: Shelf, book: Book) -> List[Tuple[str, QuerySet]]:
+    """Return the queries of the shelf, shelfbook and review views."""
+    user_id = shelf.user_id
+    return [
+        (
+            "Shelves visible to a user",
+            Shelf.objects.visible_to(shelf.user).order_by("pk")[:100],
+        ),
+        ("Shelves of a user", Shelf.objects.filter(user=user_id)),
+        (
+            "Shelfbooks visible to a user",
+            Shelfbook.objects.visible_to(shelf.user).order_by("pk")[:100],
+        ),
+        ("Shelfbooks of a user", Shelfbook.objects.filter(shelf__user=user_id)),
+        ("Shelfbooks of a shelf", Shelfbook.objects.filter(shelf=shelf)),
+        (
+            "Shelfbook of a shelf and book",
+            Shelfbook.objects.filter(shelf=shelf, book=book),
+        ),
+        (
+            "Latest reviews of a book",
+            Review.objects.filter(book=book).order_by("-created_at")[:100],
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    """Management command to compare the query plans before and after indexing."""
+
+    help = (
+        "Show the plan of each query of the shelf, shelfbook and review views "
+        "with the indexes before migration 0013_accessPathIndexes, then with "
+        "the current ones. The old indexes are rebuilt in a transaction which "
+        "is rolled back, locking the tables meanwhile: run it on a copy of the "
+        "production database."
+    )
+
+    def add_arguments(self, parser):
+        """Add the arguments of the management command."""
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries and show their actual timings.",
+        )
+        parser.add_argument(
+            "--no-seqscan",
+            action="store_true",
+            help="Discourage sequential scans, to see which indexes serve each "
+            "query on small databases.",
+        )
+
+    def handle(self, *args, **options):
+        """Run the management command."""
+        shelf = (
+            Shelf.objects.annotate(count=Count("shelfbooks"))
+            .order_by("-count", "pk")
+            .first()
+        )
+        book = Book.objects.order_by("-rating_count", "pk").first()
+        if shelf is None or book is None:
+            raise CommandError("There are no shelves or books to query.")
+        access_paths = get_access_paths(shelf, book)
+        with transaction.atomic():
+            if options["no_seqscan"]:
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            savepoint = transaction.savepoint()
+            with connection.cursor() as cursor:
+                cursor.execute(BEFORE_INDEXES_SQL)
+            before = [
+                queryset.explain(analyze=options["analyze"])
+                for _, queryset in access_paths
+            ]
+            transaction.savepoint_rollback(savepoint)
+            after = [
+                queryset.explain(analyze=options["analyze"])
+                for _, queryset in access_paths
+            ]
+        for (name, _), before_plan, after_plan in zip(access_paths, before, after):
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"Before:\n{before_plan}\nAfter:\n{after_plan}")
+            self.stdout.write("")
@@ -0,0 +1,104 @@
+"""Management command to rebuild the rating aggregates of every book."""
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from better_reads.models import Book
+from better_reads.signals import get_book_namespace
+from webapp.cache import invalidate
+
+# Books are rebuilt REBUILD_BATCH_SIZE at a time, each batch in a transaction
+# of its own so review writes are only held up by the batch of their book.
+REBUILD_BATCH_SIZE = 1000
+
+# Locks the next batch of books as the rating trigger of a review does, so
+# reviews written meanwhile wait for the batch and are seen by its rebuild.
+LOCK_BOOKS_SQL = """
+SELECT id FROM better_reads_book WHERE id > %s ORDER BY id LIMIT %s
+FOR NO KEY UPDATE
+"""
+
+# Only rewrites the books of the batch whose aggregates are out of date.
+REBUILD_RATINGS_SQL = """
+UPDATE better_reads_book AS book SET
+    rating_sum = ratings.sum,
+    rating_count = ratings.count,
+    rating_average = ratings.average,
+    rating_histogram = ratings.histogram
+FROM (
+    SELECT
+        book.id,
+        coalesce(review.sum, 0) AS sum,
+        coalesce(review.count, 0) AS count,
+        coalesce(review.sum::float / review.count, 0) AS average,
+        coalesce(review.histogram, '{0,0,0,0,0}') AS histogram
+    FROM better_reads_book AS book
+    LEFT JOIN (
+        SELECT
+            book_id,
+            sum(rate::integer) AS sum,
+            count(*) AS count,
+            ARRAY[
+                count(*) FILTER (WHERE rate = '1'),
+                count(*) FILTER (WHERE rate = '2'),
+                count(*) FILTER (WHERE rate = '3'),
+                count(*) FILTER (WHERE rate = '4'),
+                count(*) FILTER (WHERE rate = '5')
+            ]::integer[] AS histogram
+        FROM better_reads_review
+        WHERE rate <> '' AND book_id = ANY(%(ids)s)
+        GROUP BY book_id
+    ) AS review ON review.book_id = book.id
+    WHERE book.id = ANY(%(ids)s)
+) AS ratings
+WHERE book.id = ratings.id AND (
+    book.rating_sum, book.rating_count, book.rating_average, book.rating_histogram
+) IS DISTINCT FROM (
+    ratings.sum, ratings.count, ratings.average, ratings.histogram
+)
+RETURNING book.id
+"""
+
+
+def rebuild_ratings(batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Recompute the rating aggregates from the reviews, return the books fixed.
+
+    The rating trigger keeps the books outside of the current batch right, so
+    no lock is held on the reviews and a batch only locks its own books.
+    """
+    count = 0
+    last_id = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(LOCK_BOOKS_SQL, [last_id, batch_size])
+            book_ids = [row[0] for row in cursor.fetchall()]
+            if not book_ids:
+                return count
+            cursor.execute(REBUILD_RATINGS_SQL, {"ids": book_ids})
+            for (book_id,) in cursor.fetchall():
+                invalidate(get_book_namespace(book_id))
+                count += 1
+        last_id = book_ids[-1]
+
+
+class Command(BaseCommand):
+    """Management command to rebuild the rating aggregates of every book."""
+
+    help = (
+        "Recompute the rating sum, count, average and histogram of every "
+        f"{Book._meta.verbose_name} from its reviews, in batches of books."
+    )
+
+    def add_arguments(self, parser):
+        """Add the arguments of the management command."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help="Number of books rebuilt in each transaction.",
+        )
+
+    def handle(self, *args, **options):
+        """Run the management command."""
+        count = rebuild_ratings(options["batch_size"])
+        if options["verbosity"] >= 1:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings of {count} books"))
@@ -0,0 +1,30 @@
+"""Querysets of shelves and shelfbooks, filtering what users may see."""
+from django.db import models
+
+
+class ShelfQuerySet(models.QuerySet):
+    """Queryset of shelves."""
+
+    def visible_to(self, user):
+        """Return the shelves of the user and the public shelves of others.
+
+        Both conditions are on the shelf itself, so Postgres answers them with
+        a bitmap OR of the (user_id, public) index and the partial index of
+        public shelves.
+        """
+        return self.filter(models.Q(public=True) | models.Q(user=user.pk))
+
+
+class ShelfbookQuerySet(models.QuerySet):
+    """Queryset of shelfbooks."""
+
+    def visible_to(self, user):
+        """Return the shelfbooks on shelves visible to the user.
+
+        The visible shelves are a semi-join on the shelf ids rather than an OR
+        across the join of shelfbooks and shelves: they are found from the
+        shelf indexes, then their shelfbooks from the (shelf_id, book_id) one.
+        """
+        shelf_model = self.model._meta.get_field("shelf").related_model
+        shelves = shelf_model.objects.visible_to(user)
+        return self.filter(shelf__in=shelves.values("pk"))
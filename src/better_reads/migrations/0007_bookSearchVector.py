@@ -0,0 +1,70 @@
+# Generated by Django 2.2.11 on 2026-10-18 15:24
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+BOOK_SEARCH_VECTOR_SQL = """
+CREATE FUNCTION better_reads_book_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce((
+            SELECT name FROM better_reads_category WHERE id = NEW.category_id
+        ), '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER better_reads_book_search_vector
+    BEFORE INSERT OR UPDATE OF title, author, category_id, description
+    ON better_reads_book
+    FOR EACH ROW EXECUTE PROCEDURE better_reads_book_search_vector();
+
+CREATE FUNCTION better_reads_category_search_vector() RETURNS trigger AS $$
+BEGIN
+    UPDATE better_reads_book SET title = title WHERE category_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER better_reads_category_search_vector
+    AFTER UPDATE OF name ON better_reads_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE PROCEDURE better_reads_category_search_vector();
+
+UPDATE better_reads_book SET title = title;
+"""
+
+REVERSE_BOOK_SEARCH_VECTOR_SQL = """
+DROP TRIGGER better_reads_category_search_vector ON better_reads_category;
+DROP FUNCTION better_reads_category_search_vector();
+DROP TRIGGER better_reads_book_search_vector ON better_reads_book;
+DROP FUNCTION better_reads_book_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("better_reads", "0006_nullBookCover"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="book_search_vector_idx"
+            ),
+        ),
+        migrations.RunSQL(BOOK_SEARCH_VECTOR_SQL, REVERSE_BOOK_SEARCH_VECTOR_SQL),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 2.2.11 on 2026-10-18 15:41
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+import better_reads.models
+
+BOOK_RATINGS_SQL = """
+CREATE FUNCTION better_reads_review_rating() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.rate = NEW.rate AND OLD.book_id = NEW.book_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP <> 'INSERT' AND OLD.rate <> '' THEN
+        UPDATE better_reads_book SET
+            rating_sum = rating_sum - OLD.rate::integer,
+            rating_count = rating_count - 1,
+            rating_average = coalesce(
+                (rating_sum - OLD.rate::integer)::float / nullif(rating_count - 1, 0),
+                0
+            ),
+            rating_histogram[OLD.rate::integer] =
+                rating_histogram[OLD.rate::integer] - 1
+        WHERE id = OLD.book_id;
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.rate <> '' THEN
+        UPDATE better_reads_book SET
+            rating_sum = rating_sum + NEW.rate::integer,
+            rating_count = rating_count + 1,
+            rating_average =
+                (rating_sum + NEW.rate::integer)::float / (rating_count + 1),
+            rating_histogram[NEW.rate::integer] =
+                rating_histogram[NEW.rate::integer] + 1
+        WHERE id = NEW.book_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER better_reads_review_rating
+    AFTER INSERT OR DELETE OR UPDATE OF rate, book_id ON better_reads_review
+    FOR EACH ROW EXECUTE PROCEDURE better_reads_review_rating();
+
+UPDATE better_reads_book AS book SET
+    rating_sum = review.sum,
+    rating_count = review.count,
+    rating_average = review.sum::float / review.count,
+    rating_histogram = review.histogram
+FROM (
+    SELECT
+        book_id,
+        sum(rate::integer) AS sum,
+        count(*) AS count,
+        ARRAY[
+            count(*) FILTER (WHERE rate = '1'),
+            count(*) FILTER (WHERE rate = '2'),
+            count(*) FILTER (WHERE rate = '3'),
+            count(*) FILTER (WHERE rate = '4'),
+            count(*) FILTER (WHERE rate = '5')
+        ]::integer[] AS histogram
+    FROM better_reads_review
+    WHERE rate <> ''
+    GROUP BY book_id
+) AS review
+WHERE review.book_id = book.id;
+"""
+
+REVERSE_BOOK_RATINGS_SQL = """
+DROP TRIGGER better_reads_review_rating ON better_reads_review;
+DROP FUNCTION better_reads_review_rating();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("better_reads", "0008_bookTrigramIndexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="rating_average",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_histogram",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.PositiveIntegerField(),
+                default=better_reads.models.empty_rating_histogram,
+                editable=False,
+                size=5,
+            ),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(
+                fields=["category", "-rating_average"], name="book_category_rating_idx"
+            ),
+        ),
+        migrations.RunSQL(BOOK_RATINGS_SQL, REVERSE_BOOK_RATINGS_SQL),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 2.2.11 on 2026-10-18 15:48
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Imports resolve books by case-insensitive title.
+BOOK_TITLE_LOWER_INDEX_SQL = """
+CREATE INDEX book_title_lower_idx ON better_reads_book (lower(title));
+"""
+
+REVERSE_BOOK_TITLE_LOWER_INDEX_SQL = """
+DROP INDEX book_title_lower_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("better_reads", "0009_bookRatingAggregates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LibraryImport",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        upload_to="library_imports/",
+                        validators=[
+                            django.core.validators.FileExtensionValidator(
+                                allowed_extensions=["csv"]
+                            )
+                        ],
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "pending"),
+                            ("running", "running"),
+                            ("done", "done"),
+                            ("failed", "failed"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("processed", models.PositiveIntegerField(default=0)),
+                ("shelved", models.PositiveIntegerField(default=0)),
+                ("reviewed", models.PositiveIntegerField(default=0)),
+                ("unmatched", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="library_imports",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(
+            BOOK_TITLE_LOWER_INDEX_SQL, REVERSE_BOOK_TITLE_LOWER_INDEX_SQL
+        ),
+    ]
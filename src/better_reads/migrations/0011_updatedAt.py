@@ -0,0 +1,89 @@
+# Generated by Django 2.2.11 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+TABLES = [
+    "better_reads_book",
+    "better_reads_review",
+    "better_reads_shelf",
+    "better_reads_shelfbook",
+]
+
+UPDATED_AT_SQL = """
+CREATE FUNCTION better_reads_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+""" + "".join(
+    f"""
+CREATE TRIGGER {table}_updated_at
+    BEFORE INSERT OR UPDATE ON {table}
+    FOR EACH ROW EXECUTE PROCEDURE better_reads_updated_at();
+"""
+    for table in TABLES
+)
+
+REVERSE_UPDATED_AT_SQL = (
+    "".join(f"DROP TRIGGER {table}_updated_at ON {table};\n" for table in TABLES)
+    + "DROP FUNCTION better_reads_updated_at();"
+)
+
+# Shelves are touched at most once per statement when their books change.
+SHELF_UPDATED_AT_SQL = """
+CREATE FUNCTION better_reads_shelfbook_shelf_updated_at() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE better_reads_shelf SET updated_at = clock_timestamp()
+        WHERE id = OLD.shelf_id AND updated_at < statement_timestamp();
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        UPDATE better_reads_shelf SET updated_at = clock_timestamp()
+        WHERE id = NEW.shelf_id AND updated_at < statement_timestamp();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER better_reads_shelfbook_shelf_updated_at
+    AFTER INSERT OR DELETE OR UPDATE OF shelf_id, book_id ON better_reads_shelfbook
+    FOR EACH ROW EXECUTE PROCEDURE better_reads_shelfbook_shelf_updated_at();
+"""
+
+REVERSE_SHELF_UPDATED_AT_SQL = """
+DROP TRIGGER better_reads_shelfbook_shelf_updated_at ON better_reads_shelfbook;
+DROP FUNCTION better_reads_shelfbook_shelf_updated_at();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("better_reads", "0010_libraryImport"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="review",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="shelf",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="shelfbook",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunSQL(UPDATED_AT_SQL, REVERSE_UPDATED_AT_SQL),
+        migrations.RunSQL(SHELF_UPDATED_AT_SQL, REVERSE_SHELF_UPDATED_AT_SQL),
+    ]
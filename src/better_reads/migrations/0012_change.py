@@ -0,0 +1,134 @@
+# Generated by Django 2.2.11 on 2026-10-18 16:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+RESOURCES = {
+    "better_reads_shelf": "shelves",
+    "better_reads_shelfbook": "shelfbooks",
+    "better_reads_review": "reviews",
+}
+
+# Logs a deletion for the previous owner and a creation for the new one when
+# a record changes hands, e.g. a shelfbook moved to another user's shelf.
+CHANGE_SQL = """
+CREATE FUNCTION better_reads_change() RETURNS trigger AS $$
+DECLARE
+    old_user integer;
+    new_user integer;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        IF TG_TABLE_NAME = 'better_reads_shelfbook' THEN
+            SELECT user_id INTO old_user FROM better_reads_shelf
+            WHERE id = OLD.shelf_id;
+        ELSE
+            old_user := OLD.user_id;
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        IF TG_TABLE_NAME = 'better_reads_shelfbook' THEN
+            SELECT user_id INTO new_user FROM better_reads_shelf
+            WHERE id = NEW.shelf_id;
+        ELSE
+            new_user := NEW.user_id;
+        END IF;
+    END IF;
+    IF TG_OP = 'UPDATE' AND old_user = new_user THEN
+        INSERT INTO better_reads_change
+            (user_id, resource_name, resource_id, action, txid, created_at)
+        VALUES (new_user, TG_ARGV[0], NEW.id, 'updated', txid_current(), now());
+        RETURN NULL;
+    END IF;
+    IF old_user IS NOT NULL THEN
+        INSERT INTO better_reads_change
+            (user_id, resource_name, resource_id, action, txid, created_at)
+        VALUES (old_user, TG_ARGV[0], OLD.id, 'deleted', txid_current(), now());
+    END IF;
+    IF new_user IS NOT NULL THEN
+        INSERT INTO better_reads_change
+            (user_id, resource_name, resource_id, action, txid, created_at)
+        VALUES (new_user, TG_ARGV[0], NEW.id, 'created', txid_current(), now());
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+""" + "".join(
+    f"""
+CREATE TRIGGER {table}_change
+    AFTER INSERT OR UPDATE OR DELETE ON {table}
+    FOR EACH ROW EXECUTE PROCEDURE better_reads_change('{resource_name}');
+"""
+    for table, resource_name in RESOURCES.items()
+)
+
+REVERSE_CHANGE_SQL = (
+    "".join(f"DROP TRIGGER {table}_change ON {table};\n" for table in RESOURCES)
+    + "DROP FUNCTION better_reads_change();"
+)
+
+# Existing records are logged as created, so clients can start syncing from
+# an empty cursor.
+BACKFILL_CHANGES_SQL = """
+INSERT INTO better_reads_change
+    (user_id, resource_name, resource_id, action, txid, created_at)
+SELECT user_id, 'shelves', id, 'created', txid_current(), now()
+FROM better_reads_shelf
+UNION ALL
+SELECT shelf.user_id, 'shelfbooks', shelfbook.id, 'created', txid_current(), now()
+FROM better_reads_shelfbook AS shelfbook
+JOIN better_reads_shelf AS shelf ON shelf.id = shelfbook.shelf_id
+UNION ALL
+SELECT user_id, 'reviews', id, 'created', txid_current(), now()
+FROM better_reads_review;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("better_reads", "0011_updatedAt"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Change",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("resource_name", models.CharField(max_length=20)),
+                ("resource_id", models.IntegerField()),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "created"),
+                            ("updated", "updated"),
+                            ("deleted", "deleted"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("txid", models.BigIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="change",
+            index=models.Index(
+                fields=["user", "txid", "id"], name="change_user_txid_idx"
+            ),
+        ),
+        migrations.RunSQL(CHANGE_SQL, REVERSE_CHANGE_SQL),
+        migrations.RunSQL(BACKFILL_CHANGES_SQL, migrations.RunSQL.noop),
+    ]
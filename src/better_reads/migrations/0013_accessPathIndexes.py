@@ -0,0 +1,150 @@
+# Generated by Django 2.2.11 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+# Keep the first of the shelfbooks putting a book on the same shelf twice.
+DEDUPLICATE_SHELFBOOKS_SQL = """
+DELETE FROM better_reads_shelfbook duplicate
+USING better_reads_shelfbook original
+WHERE duplicate.shelf_id = original.shelf_id
+AND duplicate.book_id = original.book_id
+AND duplicate.id > original.id;
+"""
+
+
+# A failed concurrent build leaves an invalid index behind, which IF NOT
+# EXISTS would keep instead of building it again.
+INVALID_INDEX_SQL = """
+SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(%s) AND NOT indisvalid;
+"""
+
+# Indexes are built without locking out writes, which needs a migration
+# outside of a transaction. The unique constraint takes over its index,
+# unless a previous attempt already got that far.
+SHELFBOOK_UNIQUE_INDEX_SQL = """
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS shelfbook_shelf_book_uniq
+ON better_reads_shelfbook (shelf_id, book_id);
+"""
+SHELFBOOK_UNIQUE_SQL = """
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT FROM pg_constraint WHERE conname = 'shelfbook_shelf_book_uniq'
+    ) THEN
+        ALTER TABLE better_reads_shelfbook ADD CONSTRAINT shelfbook_shelf_book_uniq
+        UNIQUE USING INDEX shelfbook_shelf_book_uniq;
+    END IF;
+END
+$$;
+"""
+REVERSE_SHELFBOOK_UNIQUE_SQL = """
+ALTER TABLE better_reads_shelfbook DROP CONSTRAINT IF EXISTS shelfbook_shelf_book_uniq;
+"""
+SHELF_USER_PUBLIC_SQL = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS shelf_user_public_idx
+ON better_reads_shelf (user_id, public);
+"""
+SHELF_PUBLIC_SQL = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS shelf_public_idx
+ON better_reads_shelf (id) WHERE public = true;
+"""
+REVIEW_BOOK_CREATED_SQL = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS review_book_created_idx
+ON better_reads_review (book_id, created_at);
+"""
+
+
+def drop_index_sql(name: str) -> str:
+    """Return the SQL dropping an index without locking out writes."""
+    return f"DROP INDEX CONCURRENTLY IF EXISTS {name};"
+
+
+def drop_invalid_shelfbook_unique_index(apps, schema_editor):
+    """Drop what a failed build of the shelfbook unique index left behind."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(INVALID_INDEX_SQL, ["shelfbook_shelf_book_uniq"])
+        if cursor.fetchone():
+            cursor.execute(drop_index_sql("shelfbook_shelf_book_uniq"))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("better_reads", "0012_change"),
+    ]
+
+    # The foreign key indexes these replace are dropped by
+    # 0016_dropForeignKeyIndexes, once they are all built.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(
+                    drop_invalid_shelfbook_unique_index,
+                    migrations.RunPython.noop,
+                    atomic=False,
+                ),
+                # Right before the build, so fewer duplicates can sneak in.
+                migrations.RunSQL(DEDUPLICATE_SHELFBOOKS_SQL, migrations.RunSQL.noop),
+                migrations.RunSQL(
+                    SHELFBOOK_UNIQUE_INDEX_SQL,
+                    drop_index_sql("shelfbook_shelf_book_uniq"),
+                ),
+                migrations.RunSQL(SHELFBOOK_UNIQUE_SQL, REVERSE_SHELFBOOK_UNIQUE_SQL),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="shelfbook",
+                    constraint=models.UniqueConstraint(
+                        fields=("shelf", "book"), name="shelfbook_shelf_book_uniq"
+                    ),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    SHELF_USER_PUBLIC_SQL, drop_index_sql("shelf_user_public_idx")
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="shelf",
+                    index=models.Index(
+                        fields=["user", "public"], name="shelf_user_public_idx"
+                    ),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(SHELF_PUBLIC_SQL, drop_index_sql("shelf_public_idx")),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="shelf",
+                    index=models.Index(
+                        condition=models.Q(public=True),
+                        fields=["id"],
+                        name="shelf_public_idx",
+                    ),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    REVIEW_BOOK_CREATED_SQL, drop_index_sql("review_book_created_idx")
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="review",
+                    index=models.Index(
+                        fields=["book", "created_at"], name="review_book_created_idx"
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.11 on 2026-10-18 16:43
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("better_reads", "0013_accessPathIndexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="cover_renditions",
+            field=django.contrib.postgres.fields.jsonb.JSONField(
+                default=dict, editable=False
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.11 on 2026-10-18 17:05
+
+from django.db import migrations
+
+# Model.save() rewrites every column, so shelfbook updates which keep the
+# same shelf and book no longer touch the shelf.
+GUARD_SQL = """
+CREATE OR REPLACE FUNCTION better_reads_shelfbook_shelf_updated_at() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.shelf_id = NEW.shelf_id AND OLD.book_id = NEW.book_id
+    THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE better_reads_shelf SET updated_at = clock_timestamp()
+        WHERE id = OLD.shelf_id AND updated_at < statement_timestamp();
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        UPDATE better_reads_shelf SET updated_at = clock_timestamp()
+        WHERE id = NEW.shelf_id AND updated_at < statement_timestamp();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+REVERSE_GUARD_SQL = """
+CREATE OR REPLACE FUNCTION better_reads_shelfbook_shelf_updated_at() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE better_reads_shelf SET updated_at = clock_timestamp()
+        WHERE id = OLD.shelf_id AND updated_at < statement_timestamp();
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        UPDATE better_reads_shelf SET updated_at = clock_timestamp()
+        WHERE id = NEW.shelf_id AND updated_at < statement_timestamp();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("better_reads", "0014_bookCoverRenditions"),
+    ]
+
+    operations = [
+        migrations.RunSQL(GUARD_SQL, REVERSE_GUARD_SQL),
+    ]
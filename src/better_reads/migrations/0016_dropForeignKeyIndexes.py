@@ -0,0 +1,67 @@
+# Generated by Django 2.2.11 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The foreign key indexes covered by the composite indexes of
+# 0013_accessPathIndexes, dropped without locking out writes. The foreign
+# key constraints are kept as they are.
+INDEXES = [
+    ("better_reads_shelfbook_shelf_id_58f00542", "better_reads_shelfbook", "shelf_id"),
+    ("better_reads_shelf_user_id_b21369b7", "better_reads_shelf", "user_id"),
+    ("better_reads_note_book_id_2e4dbbc3", "better_reads_review", "book_id"),
+]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("better_reads", "0015_shelfUpdatedAtGuard"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f"DROP INDEX CONCURRENTLY IF EXISTS {name};",
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column});",
+                )
+                for name, table, column in INDEXES
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="shelfbook",
+                    name="shelf",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shelfbooks",
+                        to="better_reads.Shelf",
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="shelf",
+                    name="user",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shelves",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="review",
+                    name="book",
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notes",
+                        to="better_reads.Book",
+                    ),
+                ),
+            ],
+        ),
+    ]
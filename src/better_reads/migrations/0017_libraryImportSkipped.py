@@ -0,0 +1,18 @@
+# Generated by Django 2.2.11 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("better_reads", "0016_dropForeignKeyIndexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="libraryimport",
+            name="skipped",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.11 on 2026-10-18 19:05
+
+from django.db import migrations
+
+# The words of the title and author, for BookSuggestionView to find books by
+# word prefix without reading the descriptions indexed by search_vector. The
+# expression is the SQL of BookSuggestionView.words, which Django 2.2 cannot
+# declare as a model index; it is built without locking out writes.
+BOOK_WORDS_INDEX_SQL = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS book_words_idx ON better_reads_book
+USING gin (to_tsvector('simple'::regconfig, COALESCE(title, '') || ' ' || COALESCE(author, '')));
+"""
+REVERSE_BOOK_WORDS_INDEX_SQL = "DROP INDEX CONCURRENTLY IF EXISTS book_words_idx;"
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("better_reads", "0017_libraryImportSkipped"),
+    ]
+
+    operations = [
+        migrations.RunSQL(BOOK_WORDS_INDEX_SQL, REVERSE_BOOK_WORDS_INDEX_SQL),
+    ]
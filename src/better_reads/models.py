@@ -1,11 +1,23 @@
 """Better reads models."""
 from datetime import datetime
 
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import FileExtensionValidator
 from django.db import models
 
 from better_reads import objects
+from better_reads.managers import ShelfbookQuerySet, ShelfQuerySet
 from users.models import User
 
+RATINGS = range(1, 6)
+
+
+def empty_rating_histogram():
+    """Return a histogram with no ratings."""
+    return [0 for _ in RATINGS]
+
 
 class Category(models.Model):
     """Book category model."""
@@ -32,11 +44,71 @@ class Book(models.Model):
     )
     description = models.CharField(max_length=200, blank=True)
     cover = models.ImageField(null=True, upload_to="book_covers/")
+    # Keys and sizes of the thumbnails rendered from the cover in the
+    # background, see better_reads.covers.
+    cover_renditions = JSONField(default=dict, editable=False)
+    # Set on every write by database triggers, see migration 0011_updatedAt.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by database triggers, see migration 0007_bookSearchVector.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Maintained by database triggers on reviews, see migration
+    # 0009_bookRatingAggregates. The histogram counts the ratings 1 to 5.
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.FloatField(default=0, editable=False)
+    rating_histogram = ArrayField(
+        models.PositiveIntegerField(),
+        size=len(RATINGS),
+        default=empty_rating_histogram,
+        editable=False,
+    )
+
+    # Never written by save(), so a stale instance cannot overwrite them.
+    database_maintained_fields = [
+        "search_vector",
+        "rating_sum",
+        "rating_count",
+        "rating_average",
+        "rating_histogram",
+    ]
+    # Only written by background tasks, naming them in update_fields.
+    task_maintained_fields = ["cover_renditions"]
+
+    class Meta:
+        """Meta of book model."""
+
+        indexes = [
+            models.Index(
+                fields=["category", "-rating_average"], name="book_category_rating_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="book_search_vector_idx"),
+            GinIndex(
+                fields=["title"], name="book_title_trgm_idx", opclasses=["gin_trgm_ops"]
+            ),
+            GinIndex(
+                fields=["author"],
+                name="book_author_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     def __str__(self):
         """Show book title."""
         return self.title
 
+    def save(self, *args, **kwargs):
+        """Leave the database maintained fields out of updates."""
+        updating = not self._state.adding and not kwargs.get("force_insert")
+        if updating and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.database_maintained_fields
+                and field.name not in self.task_maintained_fields
+            ]
+        super().save(*args, **kwargs)
+
     class JSONAPIMeta:
         """JSON:API meta information."""
 
@@ -47,15 +119,33 @@ class Shelf(models.Model):
     """Shelf model owned by each user."""
 
     name = models.CharField(max_length=20)
-    user = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name="shelves")
+    # Indexed along with public below.
+    user = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name="shelves", db_index=False
+    )
     books = models.ManyToManyField(
         to=Book, blank=True, related_name="shelves", through="Shelfbook"
     )
     public = models.BooleanField(default=True)
+    # Also touched when books are added to or removed from the shelf.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShelfQuerySet.as_manager()
 
     def is_owner(self, user):
         """Return whether the user is the owner."""
-        return self.user == user
+        return self.user_id == user.pk
+
+    class Meta:
+        """Meta of shelf model."""
+
+        indexes = [
+            # Shelves visible to a user: their own, or any public one.
+            models.Index(fields=["user", "public"], name="shelf_user_public_idx"),
+            models.Index(
+                fields=["id"], name="shelf_public_idx", condition=models.Q(public=True)
+            ),
+        ]
 
     class JSONAPIMeta:
         """JSON:API meta information."""
@@ -66,8 +156,9 @@ class Shelf(models.Model):
 class Shelfbook(models.Model):
     """Book on the shelf."""
 
+    # Indexed by the unique constraint below.
     shelf = models.ForeignKey(
-        to=Shelf, on_delete=models.CASCADE, related_name="shelfbooks"
+        to=Shelf, on_delete=models.CASCADE, related_name="shelfbooks", db_index=False
     )
     book = models.ForeignKey(
         to=Book, on_delete=models.CASCADE, related_name="shelfbooks"
@@ -77,11 +168,26 @@ class Shelfbook(models.Model):
         choices=objects.ReadStatus.choices(),
         default=objects.ReadStatus.wish.value,
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShelfbookQuerySet.as_manager()
 
     def is_owner(self, user):
         """Return whether the user is the owner."""
+        # Querysets annotate owner_id to spare loading the shelf.
+        if hasattr(self, "owner_id"):
+            return self.owner_id == user.pk
         return self.shelf.is_owner(user)
 
+    class Meta:
+        """Meta of shelfbook model."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["shelf", "book"], name="shelfbook_shelf_book_uniq"
+            )
+        ]
+
     class JSONAPIMeta:
         """JSON:API meta information."""
 
@@ -91,18 +197,96 @@ class Shelfbook(models.Model):
 class Review(models.Model):
     """Note created by a user for a book."""
 
-    ratings = [(str(x), str(x)) for x in range(1, 6)]
+    ratings = [(str(x), str(x)) for x in RATINGS]
     rate = models.CharField(max_length=1, choices=ratings, blank=True)
     content = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name="notes")
-    book = models.ForeignKey(to=Book, on_delete=models.CASCADE, related_name="notes")
+    # Indexed along with created_at below.
+    book = models.ForeignKey(
+        to=Book, on_delete=models.CASCADE, related_name="notes", db_index=False
+    )
 
     def is_owner(self, user):
         """Return whether the user is the owner."""
-        return self.user == user
+        return self.user_id == user.pk
+
+    class Meta:
+        """Meta of review model."""
+
+        indexes = [
+            models.Index(fields=["book", "created_at"], name="review_book_created_idx")
+        ]
 
     class JSONAPIMeta:
         """JSON:API meta information."""
 
         resource_name = "reviews"
+
+
+class LibraryImport(models.Model):
+    """Library exported from another reading site, imported in the background."""
+
+    user = models.ForeignKey(
+        to=User, on_delete=models.CASCADE, related_name="library_imports"
+    )
+    file = models.FileField(
+        upload_to="library_imports/",
+        validators=[FileExtensionValidator(allowed_extensions=["csv"])],
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=objects.ImportStatus.choices(),
+        default=objects.ImportStatus.pending.value,
+    )
+    # Progress counters, updated after each chunk of rows.
+    processed = models.PositiveIntegerField(default=0)
+    shelved = models.PositiveIntegerField(default=0)
+    reviewed = models.PositiveIntegerField(default=0)
+    unmatched = models.PositiveIntegerField(default=0)
+    # Shelfbooks and reviews which already existed.
+    skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def is_owner(self, user):
+        """Return whether the user is the owner."""
+        return self.user_id == user.pk
+
+    class JSONAPIMeta:
+        """JSON:API meta information."""
+
+        resource_name = "library-imports"
+
+
+class Change(models.Model):
+    """Entry of the append-only log of changes to users' libraries.
+
+    Written by database triggers on shelves, shelfbooks and reviews, see
+    migration 0012_change, and read by the change feed.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    # Deleting a user logs the deletion of their records, so the log cannot
+    # reference users with a constraint. Indexed along with txid below.
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    resource_name = models.CharField(max_length=20)
+    resource_id = models.IntegerField()
+    action = models.CharField(max_length=10, choices=objects.ChangeAction.choices())
+    # Id of the writing transaction, see better_reads.changes.
+    txid = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta of change model."""
+
+        indexes = [
+            models.Index(fields=["user", "txid", "id"], name="change_user_txid_idx")
+        ]
@@ -17,3 +17,30 @@ class ReadStatus(Enum):
             (ReadStatus.reading.value, "reading"),
             (ReadStatus.read.value, "read"),
         )
+
+
+class ImportStatus(Enum):
+    """Progress of a library import."""
+
+    pending = "pending"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+    @staticmethod
+    def choices():
+        """Options for Django dropdowns."""
+        return tuple((status.value, status.name) for status in ImportStatus)
+
+
+class ChangeAction(Enum):
+    """Kind of change recorded in the change log."""
+
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+
+    @staticmethod
+    def choices():
+        """Options for Django dropdowns."""
+        return tuple((action.value, action.name) for action in ChangeAction)
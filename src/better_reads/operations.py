@@ -0,0 +1,286 @@
+"""Bulk shelfbook operations, following the JSON:API atomic operations extension."""
+from typing import Dict, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework import status
+
+from .models import Book, Shelf, Shelfbook
+
+OPS = ["add", "update", "remove"]
+
+
+class OperationError(Exception):
+    """An operation which cannot be applied."""
+
+    def __init__(self, index, pointer, detail, status_code=status.HTTP_400_BAD_REQUEST):
+        """Set the position of the error in the document."""
+        super().__init__(detail)
+        self.pointer = f"/atomic:operations/{index}{pointer}"
+        self.detail = detail
+        self.status_code = status_code
+
+    def as_error(self) -> Dict:
+        """Return the JSON:API error object."""
+        return {
+            "status": str(self.status_code),
+            "detail": self.detail,
+            "source": {"pointer": self.pointer},
+        }
+
+
+def get_object(container, key) -> Dict:
+    """Return the object member of the container, or an empty one."""
+    value = container.get(key) if isinstance(container, dict) else None
+    return value if isinstance(value, dict) else {}
+
+
+class ShelfbookOperations:
+    """Validate and apply a batch of shelfbook operations at once.
+
+    Every shelfbook, shelf and book referenced by the batch is looked up with
+    a single query per model, so ownership is checked once per shelf. The
+    operations are then applied with one DELETE, one bulk_update and one
+    bulk_create inside the transaction they were validated in: either all of
+    them succeed or none.
+    Books shelved twice are left to the unique constraint of shelfbooks, and
+    only looked up once it failed.
+    """
+
+    resource_name = Shelfbook.JSONAPIMeta.resource_name
+    permission_denied_message = "You have no permission to modify this shelf."
+    duplicate_message = "This book is already on the shelf."
+
+    def __init__(self, user, operations: List):
+        """Parse the operations, collecting the errors of malformed ones."""
+        self.user = user
+        self.operations: List[Dict] = []
+        self.errors: List[OperationError] = []
+        self.shelfbooks: Dict[int, Shelfbook] = {}
+        for index, operation in enumerate(operations):
+            try:
+                self.operations.append(self.parse(index, operation))
+            except OperationError as error:
+                self.errors.append(error)
+
+    @staticmethod
+    def parse_id(index, pointer, value) -> int:
+        """Return the primary key given as a resource id."""
+        try:
+            return int(str(value))
+        except ValueError:
+            raise OperationError(index, pointer, "Must be a valid id.")
+
+    def parse(self, index, operation) -> Dict:
+        """Return the op, shelfbook id and new values of an operation."""
+        if not isinstance(operation, dict):
+            raise OperationError(index, "", "Must be an operation object.")
+        op = operation.get("op")
+        if op not in OPS:
+            raise OperationError(index, "/op", f"Must be one of {', '.join(OPS)}.")
+        pointer = "/ref" if op == "remove" else "/data"
+        resource = get_object(operation, pointer[1:])
+        if resource.get("type") != self.resource_name:
+            raise OperationError(
+                index, f"{pointer}/type", f"Must be {self.resource_name}."
+            )
+        parsed = {"index": index, "op": op, "id": None, "values": {}}
+        if op != "add":
+            parsed["id"] = self.parse_id(index, f"{pointer}/id", resource.get("id"))
+        if op == "remove":
+            return parsed
+        attributes = get_object(resource, "attributes")
+        if "status" in attributes:
+            field = Shelfbook._meta.get_field("status")
+            try:
+                parsed["values"]["status"] = field.clean(attributes["status"], None)
+            except ValidationError as error:
+                raise OperationError(
+                    index, f"{pointer}/attributes/status", " ".join(error.messages)
+                )
+        relationships = get_object(resource, "relationships")
+        for name in ["shelf", "book"]:
+            if name in relationships:
+                data = get_object(relationships[name], "data")
+                parsed["values"][f"{name}_id"] = self.parse_id(
+                    index, f"{pointer}/relationships/{name}/data/id", data.get("id"),
+                )
+            elif op == "add":
+                raise OperationError(
+                    index, f"{pointer}/relationships", f"The {name} is required."
+                )
+        return parsed
+
+    def execute(self) -> Tuple[List[Optional[Shelfbook]], List[Dict]]:
+        """Validate and apply the operations, return the shelfbooks or errors."""
+        with transaction.atomic():
+            errors = self.validate()
+            if errors:
+                return [], errors
+            try:
+                return self.apply(), []
+            except IntegrityError:
+                errors = self.get_conflicts()
+                if not errors:
+                    raise
+                return [], errors
+
+    def validate(self) -> List[Dict]:
+        """Check the referenced resources exist and the user owns the shelves.
+
+        Shelfbooks and shelves are locked until the transaction ends, so they
+        cannot change hands before the operations are applied.
+        """
+        if self.errors:
+            return [error.as_error() for error in self.errors]
+        ids = [
+            operation["id"]
+            for operation in self.operations
+            if operation["id"] is not None
+        ]
+        shelf_ids = {
+            operation["values"]["shelf_id"]
+            for operation in self.operations
+            if "shelf_id" in operation["values"]
+        }
+        book_ids = {
+            operation["values"]["book_id"]
+            for operation in self.operations
+            if "book_id" in operation["values"]
+        }
+        if ids:
+            self.shelfbooks = {
+                shelfbook.pk: shelfbook
+                for shelfbook in Shelfbook.objects.filter(pk__in=ids)
+                .visible_to(self.user)
+                .annotate(owner_id=F("shelf__user"))
+                .select_for_update(of=("self",))
+            }
+        owners = {}
+        if shelf_ids:
+            owners = dict(
+                Shelf.objects.filter(pk__in=shelf_ids)
+                .select_for_update()
+                .values_list("pk", "user")
+            )
+        books = set()
+        if book_ids:
+            books = set(
+                Book.objects.filter(pk__in=book_ids).values_list("pk", flat=True)
+            )
+        seen, pairs = set(), set()
+        for operation in self.operations:
+            try:
+                self.validate_operation(operation, seen, pairs, owners, books)
+            except OperationError as error:
+                self.errors.append(error)
+        return [error.as_error() for error in self.errors]
+
+    def get_pair(self, operation) -> Tuple[int, int]:
+        """Return the shelf and book of the shelfbook once the operation applied."""
+        values = operation["values"]
+        if operation["op"] == "add":
+            return values["shelf_id"], values["book_id"]
+        shelfbook = self.shelfbooks[operation["id"]]
+        return (
+            values.get("shelf_id", shelfbook.shelf_id),
+            values.get("book_id", shelfbook.book_id),
+        )
+
+    def validate_operation(self, operation, seen, pairs, owners, books):
+        """Check a single operation against the resources looked up in bulk."""
+        index, pk, values = operation["index"], operation["id"], operation["values"]
+        pointer = "/ref" if operation["op"] == "remove" else "/data"
+        if pk is not None:
+            if pk not in self.shelfbooks:
+                raise OperationError(
+                    index, f"{pointer}/id", "Not found.", status.HTTP_404_NOT_FOUND
+                )
+            if self.shelfbooks[pk].owner_id != self.user.id:
+                raise OperationError(
+                    index,
+                    f"{pointer}/id",
+                    self.permission_denied_message,
+                    status.HTTP_403_FORBIDDEN,
+                )
+            if pk in seen:
+                raise OperationError(
+                    index, f"{pointer}/id", "Only one operation per shelfbook."
+                )
+            seen.add(pk)
+        if "shelf_id" in values and owners.get(values["shelf_id"]) != self.user.id:
+            raise OperationError(
+                index,
+                f"{pointer}/relationships/shelf",
+                self.permission_denied_message
+                if values["shelf_id"] in owners
+                else "Shelf not found.",
+            )
+        if "book_id" in values and values["book_id"] not in books:
+            raise OperationError(
+                index, f"{pointer}/relationships/book", "Book not found."
+            )
+        if operation["op"] != "remove":
+            pair = self.get_pair(operation)
+            if pair in pairs:
+                raise OperationError(
+                    index, f"{pointer}/relationships", self.duplicate_message
+                )
+            pairs.add(pair)
+
+    def get_conflicts(self) -> List[Dict]:
+        """Return the errors of operations shelving books already on the shelf."""
+        removed = [
+            operation["id"]
+            for operation in self.operations
+            if operation["op"] == "remove"
+        ]
+        pairs = [
+            (operation, self.get_pair(operation))
+            for operation in self.operations
+            if operation["op"] != "remove"
+        ]
+        existing = {
+            (shelf_id, book_id): pk
+            for pk, shelf_id, book_id in Shelfbook.objects.filter(
+                shelf__in={shelf_id for _, (shelf_id, _) in pairs},
+                book__in={book_id for _, (_, book_id) in pairs},
+            )
+            .exclude(pk__in=removed)
+            .values_list("pk", "shelf", "book")
+        }
+        return [
+            OperationError(
+                operation["index"], "/data/relationships", self.duplicate_message,
+            ).as_error()
+            for operation, pair in pairs
+            if existing.get(pair, operation["id"]) != operation["id"]
+        ]
+
+    def apply(self) -> List[Optional[Shelfbook]]:
+        """Apply the validated operations, return the shelfbook of each one."""
+        results: List[Optional[Shelfbook]] = []
+        added, updated, removed = [], [], []
+        for operation in self.operations:
+            if operation["op"] == "add":
+                shelfbook = Shelfbook(**operation["values"])
+                added.append(shelfbook)
+            elif operation["op"] == "update":
+                shelfbook = self.shelfbooks[operation["id"]]
+                for name, value in operation["values"].items():
+                    setattr(shelfbook, name, value)
+                updated.append(shelfbook)
+            else:
+                shelfbook = None
+                removed.append(operation["id"])
+            results.append(shelfbook)
+        # Removed first, so the books they held can be shelved again.
+        with transaction.atomic():
+            if removed:
+                Shelfbook.objects.filter(pk__in=removed).delete()
+            if updated:
+                Shelfbook.objects.bulk_update(updated, ["shelf", "book", "status"])
+            if added:
+                Shelfbook.objects.bulk_create(added)
+        return results
@@ -0,0 +1,149 @@
+"""Delete the cover files which no book refers to anymore."""
+import logging
+import time
+from datetime import timedelta
+from typing import Iterator, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils.timezone import now
+from django_redis import get_redis_connection
+
+from webapp.storage import get_queue_key
+
+from .covers import FORMATS
+
+logger = logging.getLogger(__name__)
+
+ORPHANS_PREFIX = "book_covers/"
+# The last file collected, in settings.STORAGE_QUEUE, to resume from.
+ORPHANS_CHECKPOINT = "orphans:checkpoint"
+# Younger files may belong to an upload or render not committed yet.
+MIN_AGE = timedelta(days=1)
+# S3 requests per second, and seconds of each periodic run.
+RATE = 10
+TIME_LIMIT = 15 * 60
+
+# Every key the books refer to, once per book, in the byte order S3 lists
+# keys in. The checkpoint is compared in that order too, whatever the
+# collation of the database.
+REFERENCED_KEYS_SQL = """
+SELECT key FROM (
+    SELECT cover AS key FROM better_reads_book
+    UNION ALL
+    SELECT rendition.value ->> extension
+    FROM better_reads_book,
+        jsonb_each(cover_renditions -> 'renditions') AS rendition,
+        unnest(%s) AS extension
+) AS keys
+WHERE key LIKE %s AND key COLLATE "C" > %s
+ORDER BY key COLLATE "C"
+"""
+
+
+class Collection(NamedTuple):
+    """Outcome of a run of the collector."""
+
+    listed: int
+    orphaned: int
+    deleted: int
+    finished: bool
+
+
+class Throttle:
+    """Space calls out to at most rate per second."""
+
+    def __init__(self, rate: Optional[float]):
+        """Allow the first call at once."""
+        self.interval = 1 / rate if rate else 0
+        self.next = time.monotonic()
+
+    def wait(self):
+        """Sleep until the next call is allowed."""
+        delay = self.next - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next = max(self.next, time.monotonic()) + self.interval
+
+
+def get_checkpoint() -> str:
+    """Return the last file collected by an unfinished run."""
+    checkpoint = get_redis_connection(settings.STORAGE_QUEUE).get(
+        get_queue_key(ORPHANS_CHECKPOINT)
+    )
+    return checkpoint.decode() if checkpoint else ""
+
+
+def set_checkpoint(name: str):
+    """Resume the next run after the file, or from the start when empty."""
+    redis = get_redis_connection(settings.STORAGE_QUEUE)
+    if name:
+        redis.set(get_queue_key(ORPHANS_CHECKPOINT), name)
+    else:
+        redis.delete(get_queue_key(ORPHANS_CHECKPOINT))
+
+
+def get_referenced_keys(start_after: str) -> Iterator[str]:
+    """Yield the keys the books refer to after start_after, in order.
+
+    Keys are streamed through a server side cursor, so they are never all
+    held in memory.
+    """
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(
+            REFERENCED_KEYS_SQL,
+            [[fmt.extension for fmt in FORMATS], f"{ORPHANS_PREFIX}%", start_after],
+        )
+        for (key,) in cursor:
+            yield key
+
+
+def collect_orphans(
+    min_age: timedelta = MIN_AGE,
+    rate: Optional[float] = None,
+    time_limit: Optional[float] = None,
+    dry_run: bool = False,
+) -> Collection:
+    """Delete the covers and renditions no book refers to.
+
+    The bucket is listed a page at a time and merged with the sorted
+    referenced keys, and each page's orphans are deleted with one request.
+    At most rate requests are sent per second. Runs stopped by time_limit,
+    in seconds, or by an error resume after the last page collected. Dry runs
+    count the orphans from the start, without deleting them.
+    """
+    if not hasattr(default_storage, "list_pages"):
+        raise ImproperlyConfigured("Orphaned media are only collected from S3.")
+    start_after = "" if dry_run else get_checkpoint()
+    deadline = time.monotonic() + time_limit if time_limit is not None else None
+    throttle = Throttle(rate)
+    referenced = get_referenced_keys(start_after)
+    reference = next(referenced, None)
+    listed = orphaned = deleted = 0
+    created_before = now() - min_age
+    throttle.wait()
+    for page in default_storage.list_pages(ORPHANS_PREFIX, start_after):
+        if listed and deadline is not None and time.monotonic() >= deadline:
+            return Collection(listed, orphaned, deleted, False)
+        orphans = []
+        for name, last_modified in page:
+            while reference is not None and reference < name:
+                reference = next(referenced, None)
+            if reference != name and last_modified < created_before:
+                orphans.append(name)
+        listed += len(page)
+        orphaned += len(orphans)
+        if orphans and not dry_run:
+            throttle.wait()
+            failed = default_storage.delete_many(orphans)
+            if failed:
+                logger.error("Could not delete media files: %s", ", ".join(failed))
+            deleted += len(orphans) - len(failed)
+        if page and not dry_run:
+            set_checkpoint(page[-1][0])
+        throttle.wait()
+    if not dry_run:
+        set_checkpoint("")
+    return Collection(listed, orphaned, deleted, True)
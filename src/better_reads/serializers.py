@@ -1,9 +1,14 @@
 """Serializers for better_reads app."""
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Manager
 from rest_framework_json_api import serializers
 
 from users.serializers import UserSerializer
+from webapp.storage import cache_urls
 
-from .models import Book, Category, Review, Shelf, Shelfbook
+from .covers import get_keys
+from .models import Book, Category, LibraryImport, Review, Shelf, Shelfbook
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -16,14 +21,68 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name"]
 
 
+class CoversField(serializers.Field):
+    """URLs and sizes of the rendered thumbnails of a cover, null until rendered."""
+
+    def __init__(self, **kwargs):
+        """Make the field read only."""
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        """Return each rendition with the URLs of its encodings."""
+        if not value:
+            return None
+        return {
+            name: {
+                key: default_storage.url(file) if isinstance(file, str) else file
+                for key, file in rendition.items()
+            }
+            for name, rendition in value["renditions"].items()
+        }
+
+
+class BookListSerializer(serializers.ListSerializer):
+    """Books serializer, signing the URLs of all their covers at once."""
+
+    def to_representation(self, data):
+        """Sign the cover URLs, then render the books."""
+        books = list(data.all() if isinstance(data, Manager) else data)
+        names = []
+        for book in books:
+            if "cover" in self.child.fields:
+                names.append(book.cover.name)
+            if "covers" in self.child.fields and book.cover_renditions:
+                names += get_keys(book.cover_renditions)
+        cache_urls(names)
+        return super().to_representation(books)
+
+
 class BookSerializer(serializers.ModelSerializer):
     """Book serializer."""
 
+    covers = CoversField(source="cover_renditions")
+
     class Meta:
         """Meta of book serializer."""
 
+        list_serializer_class = BookListSerializer
         model = Book
-        fields = ["id", "title", "author", "description", "category", "cover"]
+        read_only_fields = [
+            "rating_sum",
+            "rating_count",
+            "rating_average",
+            "rating_histogram",
+        ]
+        fields = [
+            "id",
+            "title",
+            "author",
+            "description",
+            "category",
+            "cover",
+            "covers",
+        ] + read_only_fields
 
     included_serializers = {"category": CategorySerializer}
 
@@ -66,15 +125,44 @@ class ShelfbookSerializer(serializers.ModelSerializer):
         fields = ["id", "shelf", "book", "status"]
 
     included_serializers = {"shelf": ShelfSerializer, "book": BookSerializer}
+    duplicate_message = "This book is already on the shelf."
 
     def validate_shelf(self, shelf):
         """Validate the requesting user is the owner of the shelf."""
-        if self.context["request"].user != shelf.user:
+        if not shelf.is_owner(self.context["request"].user):
             raise serializers.ValidationError(
                 "You have no permission to modify this shelf."
             )
         return shelf
 
+    def validate(self, attrs):
+        """Validate the book is not on the shelf yet, when either one is set."""
+        if "shelf" not in attrs and "book" not in attrs:
+            return attrs
+        shelf_id = attrs["shelf"].pk if "shelf" in attrs else self.instance.shelf_id
+        book_id = attrs["book"].pk if "book" in attrs else self.instance.book_id
+        queryset = Shelfbook.objects.filter(shelf=shelf_id, book=book_id)
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(self.duplicate_message)
+        return attrs
+
+    def save(self, **kwargs):
+        """Reject books put on the shelf concurrently, since validated."""
+        if "shelf" not in self.validated_data and "book" not in self.validated_data:
+            return super().save(**kwargs)
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as error:
+            constraint = getattr(
+                getattr(error.__cause__, "diag", None), "constraint_name", None
+            )
+            if constraint != "shelfbook_shelf_book_uniq":
+                raise
+            raise serializers.ValidationError(self.duplicate_message)
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     """Notes serializer."""
@@ -98,3 +186,30 @@ class ReviewSerializer(serializers.ModelSerializer):
         """Add request.user upon note creation."""
         validated_data["user"] = self.context["request"].user
         return super().create(validated_data)
+
+
+class LibraryImportSerializer(serializers.ModelSerializer):
+    """Library import serializer."""
+
+    class Meta:
+        """Meta of library import serializer."""
+
+        model = LibraryImport
+        read_only_fields = [
+            "status",
+            "processed",
+            "shelved",
+            "reviewed",
+            "unmatched",
+            "skipped",
+            "error",
+            "created_at",
+            "user",
+        ]
+        fields = ["id", "file"] + read_only_fields
+        extra_kwargs = {"file": {"write_only": True}}
+
+    def create(self, validated_data):
+        """Add request.user upon import creation."""
+        validated_data["user"] = self.context["request"].user
+        return super().create(validated_data)
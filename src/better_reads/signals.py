@@ -0,0 +1,61 @@
+"""Signals of the better_reads app."""
+# pylint: disable=unused-argument
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from webapp.cache import invalidate
+from webapp.storage import delete_later
+
+from .covers import get_keys
+from .models import Book, Category, LibraryImport, Review
+
+# Books and categories are cached together as books include their category.
+CATALOGUE = "catalogue"
+
+
+def get_book_namespace(book_id) -> str:
+    """Return the namespace of the cached responses of one book.
+
+    Reviews change the rating aggregates of their book, which only bump the
+    version of its own responses.
+    """
+    return f"{CATALOGUE}:book:{book_id}"
+
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalogue(sender, **kwargs):
+    """Stop serving cached catalogue responses."""
+    invalidate(CATALOGUE)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_book(sender, instance, **kwargs):
+    """Stop serving the cached responses of the reviewed book."""
+    invalidate(get_book_namespace(instance.book_id))
+
+
+@receiver(post_save, sender=Book)
+def render_cover(sender, instance, update_fields=None, **kwargs):
+    """Render the thumbnails of a new or removed cover once it is committed."""
+    # noqa pylint: disable=import-outside-toplevel
+    from webapp.tasks import render_book_cover
+
+    if update_fields is not None and "cover" not in update_fields:
+        return
+    if (instance.cover.name or None) == instance.cover_renditions.get("source"):
+        return
+    transaction.on_commit(lambda: render_book_cover.delay(instance.pk))
+
+
+@receiver(post_delete, sender=Book)
+def delete_cover(sender, instance, **kwargs):
+    """Delete the cover and its renditions once the deletion commits."""
+    delete_later([instance.cover.name, *get_keys(instance.cover_renditions)])
+
+
+@receiver(post_delete, sender=LibraryImport)
+def delete_library_file(sender, instance, **kwargs):
+    """Delete the imported file once the deletion commits."""
+    delete_later([instance.file.name])
@@ -0,0 +1 @@
+"""Tests module for better_reads app."""
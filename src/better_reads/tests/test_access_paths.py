@@ -0,0 +1,84 @@
+"""Tests for the indexes of the shelf, shelfbook and review queries."""
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test the plans of the queries of the views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create shelves of books with reviews."""
+        super().setUpTestData()
+        category = Category.objects.create(name="Fantasy")
+        books = Book.objects.bulk_create(
+            Book(title=f"book {index}", author="author", category=category)
+            for index in range(10)
+        )
+        for user in UserFactory.create_batch(3):
+            shelves = Shelf.objects.bulk_create(
+                [
+                    Shelf(name="Public", user=user),
+                    Shelf(name="Private", user=user, public=False),
+                ]
+            )
+            Shelfbook.objects.bulk_create(
+                Shelfbook(shelf=shelf, book=book) for shelf in shelves for book in books
+            )
+            Review.objects.bulk_create(
+                Review(rate="4", user=user, book=book) for book in books
+            )
+
+    def test_explain(self):
+        """The composite and partial indexes serve the queries of the views."""
+        with connection.cursor() as cursor:
+            # Tables with pending foreign key checks cannot be altered.
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        out = StringIO()
+        call_command("explain_access_paths", no_seqscan=True, stdout=out)
+        plans = {}
+        for section in out.getvalue().strip().split("\n\n"):
+            name, section = section.split("\nBefore:\n")
+            plans[name] = section.split("\nAfter:\n")
+        self.assertEqual(len(plans), 7)
+        before, after = plans["Shelves of a user"]
+        self.assertIn("shelf_user_public_idx", after)
+        before, after = plans["Shelfbook of a shelf and book"]
+        self.assertIn("Filter: (book_id", before)
+        self.assertIn("shelfbook_shelf_book_uniq", after)
+        self.assertNotIn("Filter", after)
+        # Reviews are read in order from the index, without sorting them.
+        before, after = plans["Latest reviews of a book"]
+        self.assertIn("Sort", before)
+        self.assertIn("review_book_created_idx", after)
+        self.assertNotIn("Sort", after)
+
+    def test_visible_to(self):
+        """Users see their own shelves and the public ones, without a join."""
+        user, other_user = UserFactory.create_batch(2)
+        mine = Shelf.objects.create(name="Mine", user=user, public=False)
+        theirs = Shelf.objects.create(name="Theirs", user=other_user)
+        Shelf.objects.create(name="Private", user=other_user, public=False)
+        shelves = Shelf.objects.visible_to(user)
+        self.assertIn(mine, shelves)
+        self.assertIn(theirs, shelves)
+        self.assertFalse(shelves.filter(public=False).exclude(user=user).exists())
+        shelfbooks = Shelfbook.objects.visible_to(user)
+        self.assertNotIn("JOIN", str(shelfbooks.query))
+        self.assertEqual(
+            set(shelfbooks.values_list("shelf", flat=True)),
+            set(shelves.filter(shelfbooks__isnull=False).values_list("pk", flat=True)),
+        )
+
+    def test_empty(self):
+        """There is nothing to explain without shelves."""
+        Shelf.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command("explain_access_paths")
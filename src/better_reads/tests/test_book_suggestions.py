@@ -0,0 +1,92 @@
+"""Tests for book-suggestions endpoint."""
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from better_reads.models import Book, Category
+from better_reads.views import BookSuggestionView
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test the typeahead suggestions for books."""
+
+    resource_name = "book-suggestions"
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create books to suggest."""
+        super().setUpTestData()
+        category = Category.objects.create(name="Fantasy")
+        cls.hobbit = Book.objects.create(
+            title="The Hobbit", author="Tolkien", category=category
+        )
+        cls.dune = Book.objects.create(
+            title="Dune", author="Herbert", category=category
+        )
+
+    def suggest(self, term, query_budget=1):
+        """Return the suggestions for the term."""
+        response = self.get(
+            f"/{self.resource_name}/",
+            {"filter[search]": term},
+            asserted_status=status.HTTP_200_OK,
+            query_budget=query_budget,
+        )
+        return response.json()["data"]
+
+    def test_word_prefix(self):
+        """Titles and authors are matched from the start of any word."""
+        data = self.suggest("hob")
+        self.assertEqual(
+            data,
+            [
+                {
+                    "type": "books",
+                    "id": str(self.hobbit.pk),
+                    "attributes": {"title": "The Hobbit", "author": "Tolkien"},
+                }
+            ],
+        )
+        self.assertEqual(
+            [book["id"] for book in self.suggest("herb")], [str(self.dune.pk)]
+        )
+        self.assertEqual(
+            [book["id"] for book in self.suggest("the hob")], [str(self.hobbit.pk)]
+        )
+
+    def test_prefix_index(self):
+        """Word prefixes are searched through book_words_idx."""
+        with CaptureQueriesContext(connection) as context:
+            self.suggest("hob")
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {context.captured_queries[-1]['sql']}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        self.assertIn("book_words_idx", plan)
+
+    def test_fuzzy(self):
+        """Misspelt terms still match, once no word starts with them."""
+        self.assertEqual(
+            [book["id"] for book in self.suggest("Tolkein", query_budget=2)],
+            [str(self.hobbit.pk)],
+        )
+
+    def test_short_term(self):
+        """Terms shorter than the minimum length return nothing without querying."""
+        response = self.get(
+            f"/{self.resource_name}/",
+            {"filter[search]": "ho"},
+            asserted_status=status.HTTP_200_OK,
+            query_budget=0,
+        )
+        self.assertEqual(response.json(), {"data": []})
+
+    def test_result_cap(self):
+        """At most max_results books are returned."""
+        category = Category.objects.first()
+        Book.objects.bulk_create(
+            Book(title=f"Hobbit {index}", author="Tolkien", category=category)
+            for index in range(BookSuggestionView.max_results + 5)
+        )
+        self.assertEqual(len(self.suggest("hobbit")), BookSuggestionView.max_results)
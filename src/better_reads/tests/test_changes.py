@@ -0,0 +1,158 @@
+"""Tests for the change feed."""
+from unittest import mock
+
+from rest_framework import status
+
+from better_reads.changes import TXID_HORIZON_SQL
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+from webapp.test.pagination import forge_cursor
+
+
+class TestCase(BaseTestCase):
+    """Test syncing libraries from the change feed."""
+
+    path = "/changes/"
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a library."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        category = Category.objects.create(name="Fantasy")
+        cls.books = [
+            Book.objects.create(
+                title=f"book {index}", author="author", category=category
+            )
+            for index in range(3)
+        ]
+        cls.shelf = Shelf.objects.create(name="Mine", user=cls.user)
+        cls.shelfbook = Shelfbook.objects.create(shelf=cls.shelf, book=cls.books[0])
+        cls.review = Review.objects.create(rate="4", user=cls.user, book=cls.books[0])
+
+    def setUp(self):
+        """Serve the changes of the test transaction, which never commits."""
+        super().setUp()
+        self.auth(self.user)
+        horizon = mock.patch(
+            "better_reads.changes.TXID_HORIZON_SQL", "txid_current() + 1"
+        )
+        horizon.start()
+        self.addCleanup(horizon.stop)
+
+    def sync(self, cursor="", query_budget=None, **params):
+        """Return the changed resources by (type, id) and the cursor to poll from."""
+        response = self.get(
+            self.path,
+            {"page[cursor]": cursor, **params},
+            asserted_status=status.HTTP_200_OK,
+            query_budget=query_budget,
+        )
+        document = response.json()
+        changes = {
+            (resource["type"], int(resource["id"])): resource
+            for resource in document["data"]
+        }
+        self.assertEqual(len(changes), len(document["data"]))
+        return changes, document["meta"]["cursor"], document["links"]["next"]
+
+    def test_sync(self):
+        """Clients receive what was created, updated and deleted since the cursor."""
+        # Changes, then shelves with their books, shelfbooks and reviews.
+        changes, cursor, _ = self.sync(query_budget=5)
+        self.assertEqual(
+            {key: change["meta"]["action"] for key, change in changes.items()},
+            {
+                ("shelves", self.shelf.pk): "created",
+                ("shelfbooks", self.shelfbook.pk): "created",
+                ("reviews", self.review.pk): "created",
+            },
+        )
+        self.assertEqual(
+            changes[("shelfbooks", self.shelfbook.pk)]["attributes"],
+            {"status": "wish"},
+        )
+        self.assertEqual(self.sync(cursor), ({}, cursor, None))
+
+        shelfbook = Shelfbook.objects.get(pk=self.shelfbook.pk)
+        shelfbook.status = "read"
+        shelfbook.save()
+        review_pk = self.review.pk
+        self.review.delete()
+        shelf = Shelf.objects.create(name="Later", user=self.user)
+        changes, next_cursor, _ = self.sync(cursor)
+        self.assertEqual(
+            {key: change["meta"]["action"] for key, change in changes.items()},
+            {
+                ("shelfbooks", self.shelfbook.pk): "updated",
+                ("reviews", review_pk): "deleted",
+                ("shelves", shelf.pk): "created",
+            },
+        )
+        self.assertEqual(
+            changes[("shelfbooks", self.shelfbook.pk)]["attributes"],
+            {"status": "read"},
+        )
+        self.assertEqual(
+            changes[("reviews", review_pk)],
+            {"type": "reviews", "id": str(review_pk), "meta": {"action": "deleted"},},
+        )
+        self.assertEqual(self.sync(next_cursor), ({}, next_cursor, None))
+
+    def test_pages(self):
+        """Pages are bounded and links lead through every change."""
+        shelfbooks = Shelfbook.objects.bulk_create(
+            Shelfbook(shelf=self.shelf, book=book) for book in self.books[1:]
+        )
+        seen = set()
+        changes, cursor, next_link = self.sync(**{"page[size]": 2})
+        seen.update(changes)
+        while next_link:
+            self.assertEqual(len(changes), 2)
+            changes, cursor, next_link = self.sync(cursor, **{"page[size]": 2})
+            seen.update(changes)
+        self.assertEqual(
+            seen,
+            {
+                ("shelves", self.shelf.pk),
+                ("reviews", self.review.pk),
+                *(("shelfbooks", shelfbook.pk) for shelfbook in shelfbooks),
+                ("shelfbooks", self.shelfbook.pk),
+            },
+        )
+        self.assertEqual(self.sync(cursor)[0], {})
+
+    def test_other_users(self):
+        """Users only receive changes to their own library."""
+        _, cursor, _ = self.sync()
+        other_shelf = Shelf.objects.create(name="Theirs", user=UserFactory())
+        Shelfbook.objects.create(shelf=other_shelf, book=self.books[1])
+        self.assertEqual(self.sync(cursor)[0], {})
+        shelfbook = Shelfbook.objects.get(pk=self.shelfbook.pk)
+        shelfbook.shelf = other_shelf
+        shelfbook.save()
+        changes, _, _ = self.sync(cursor)
+        self.assertEqual(
+            changes[("shelfbooks", self.shelfbook.pk)]["meta"], {"action": "deleted"}
+        )
+
+    def test_transactions_in_progress(self):
+        """Changes are only served once the transactions before them have ended."""
+        with mock.patch("better_reads.changes.TXID_HORIZON_SQL", TXID_HORIZON_SQL):
+            self.assertEqual(self.sync()[0], {})
+
+    def test_invalid_cursor(self):
+        """Unreadable cursors are rejected."""
+        self.get(
+            self.path,
+            {"page[cursor]": "nonsense"},
+            asserted_status=status.HTTP_404_NOT_FOUND,
+        )
+        self.get(
+            self.path,
+            {"page[cursor]": forge_cursor([1, "x"])},
+            asserted_status=status.HTTP_404_NOT_FOUND,
+        )
+        self.auth(None)
+        self.get(self.path, asserted_status=status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,168 @@
+"""Tests for uploading covers straight to the bucket."""
+import io
+from unittest import mock
+
+import requests
+from django.core.files.storage import default_storage
+from PIL import Image
+from rest_framework import status
+
+from better_reads.models import Book, Category
+from users.models import User
+from webapp.tasks import render_book_cover
+from webapp.test.base import BaseTestCase
+from webapp.test.storage import MockedS3Mixin, run_storage_operations
+
+
+def make_image(pil_format="JPEG", size=(600, 900)):
+    """Return the bytes of an image."""
+    output = io.BytesIO()
+    Image.new("RGB", size, "teal").save(output, pil_format)
+    return output.getvalue()
+
+
+class TestCase(MockedS3Mixin, BaseTestCase):
+    """Test the presigned POST and confirm actions against a mocked S3."""
+
+    bucket = "covers"
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a book and an admin."""
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser("uploads@example.com", "pass")
+        cls.book = Book.objects.create(
+            title="Dune",
+            author="Frank Herbert",
+            category=Category.objects.create(name="Science fiction"),
+        )
+
+    def setUp(self):
+        """Authenticate as an admin."""
+        super().setUp()
+        self.auth(self.admin)
+        self.path = f"/books/{self.book.pk}/"
+
+    def upload(self, content, content_type="image/jpeg"):
+        """Upload the content with a presigned POST and return its key."""
+        response = self.post(
+            f"{self.path}cover-upload/", asserted_status=status.HTTP_200_OK
+        )
+        data = response.json()["data"]
+        self.assertEqual(data["type"], "cover-uploads")
+        upload = requests.post(
+            data["attributes"]["url"],
+            data={**data["attributes"]["fields"], "Content-Type": content_type},
+            files={"file": content},
+        )
+        self.assertLess(upload.status_code, 300, upload.text)
+        return data["id"]
+
+    def confirm(self, key, asserted_status=status.HTTP_204_NO_CONTENT):
+        """Attach the uploaded key to the book."""
+        with run_storage_operations(), mock.patch.object(render_book_cover, "delay"):
+            return self.post(
+                f"{self.path}cover-confirm/",
+                data={
+                    "data": {
+                        "type": "books",
+                        "id": str(self.book.pk),
+                        "attributes": {"cover": key},
+                    }
+                },
+                asserted_status=asserted_status,
+            )
+
+    def test_upload(self):
+        """Uploaded covers are attached, replace the previous one and are rendered."""
+        first = self.upload(make_image())
+        self.assertTrue(first.startswith(f"book_covers/uploads/{self.book.pk}/"))
+        self.confirm(first)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).cover.name, first)
+        second = self.upload(make_image("PNG"), "image/png")
+        self.confirm(second)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).cover.name, second)
+        self.assertFalse(default_storage.exists(first))
+        with mock.patch.object(default_storage, "delete") as delete:
+            render_book_cover(self.book.pk)
+            render_book_cover(self.book.pk)
+        delete.assert_not_called()
+        attributes = self.get(self.path, asserted_status=status.HTTP_200_OK).json()[
+            "data"
+        ]["attributes"]
+        self.assertEqual(attributes["covers"]["full"]["width"], 600)
+
+    def test_metadata_only(self):
+        """Confirming a cover only reads its metadata, rejecting bad ones."""
+        with mock.patch.object(default_storage, "open") as open_file:
+            self.confirm(self.upload(make_image()))
+        open_file.assert_not_called()
+        key = self.upload(make_image("GIF"), "image/gif")
+        response = self.confirm(key, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json()["errors"][0]["source"]["pointer"], "/data/attributes/cover"
+        )
+        self.assertFalse(default_storage.exists(key))
+        with mock.patch("better_reads.views.BookView.cover_upload_max_size", 100):
+            key = self.upload(make_image())
+            response = self.confirm(key, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("limited", response.json()["errors"][0]["detail"])
+        self.assertFalse(default_storage.exists(key))
+
+    def test_invalid_files(self):
+        """Files which are not images are replaced by the previous cover and deleted."""
+        for content in [b"not an image", make_image("GIF")]:
+            with self.subTest(content=content[:10]):
+                key = self.upload(content)
+                self.confirm(key)
+                self.assertEqual(Book.objects.get(pk=self.book.pk).cover.name, key)
+                with run_storage_operations():
+                    render_book_cover(self.book.pk)
+                self.assertFalse(Book.objects.get(pk=self.book.pk).cover)
+                self.assertFalse(default_storage.exists(key))
+
+    def test_previous_cover_kept(self):
+        """The cover rendered last is kept until the new one is rendered."""
+        first = self.upload(make_image())
+        self.confirm(first)
+        with run_storage_operations():
+            render_book_cover(self.book.pk)
+        invalid = self.upload(b"not an image")
+        self.confirm(invalid)
+        self.assertTrue(default_storage.exists(first))
+        with run_storage_operations():
+            render_book_cover(self.book.pk)
+        book = Book.objects.get(pk=self.book.pk)
+        self.assertEqual(book.cover.name, first)
+        self.assertEqual(book.cover_renditions["source"], first)
+        self.assertFalse(default_storage.exists(invalid))
+        second = self.upload(make_image())
+        self.confirm(second)
+        with run_storage_operations():
+            render_book_cover(self.book.pk)
+        self.assertEqual(
+            Book.objects.get(pk=self.book.pk).cover_renditions["source"], second
+        )
+        self.assertFalse(default_storage.exists(first))
+
+    def test_foreign_keys(self):
+        """Only keys issued for the book can be attached."""
+        other = Book.objects.create(
+            title="Emma", author="Jane Austen", category=self.book.category
+        )
+        for key in [
+            f"book_covers/uploads/{other.pk}/{'0' * 32}",
+            f"book_covers/uploads/{self.book.pk}/../../library_imports/export.csv",
+            f"book_covers/uploads/{self.book.pk}/{'0' * 32}",
+        ]:
+            with self.subTest(key=key):
+                self.confirm(key, status.HTTP_400_BAD_REQUEST)
+        self.confirm(None, status.HTTP_400_BAD_REQUEST)
+
+    def test_admins_only(self):
+        """Only admins may upload covers."""
+        self.auth(None)
+        self.post(
+            f"{self.path}cover-upload/", asserted_status=status.HTTP_401_UNAUTHORIZED
+        )
+        self.confirm("key", status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,210 @@
+"""Tests for the thumbnails rendered from book covers."""
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from rest_framework import status
+
+from better_reads.covers import get_keys
+from better_reads.covers import render as render_cover
+from better_reads.models import Book, Category
+from users.models import User
+from webapp.tasks import render_book_cover
+from webapp.test.base import BaseTestCase
+from webapp.test.storage import run_storage_operations
+
+
+def make_cover(size=(1000, 1500), color="teal", pil_format="JPEG", mode="RGB"):
+    """Return an uploaded image of the given size."""
+    output = io.BytesIO()
+    Image.new(mode, size, color).save(output, pil_format)
+    return SimpleUploadedFile(
+        f"cover.{pil_format.lower()}",
+        output.getvalue(),
+        content_type=f"image/{pil_format.lower()}",
+    )
+
+
+class TestCase(BaseTestCase):
+    """Test rendering covers in the background."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Store uploads in a temporary directory."""
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.storage_settings = override_settings(
+            DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+            MEDIA_ROOT=cls.media_root,
+        )
+        cls.storage_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the uploads."""
+        cls.storage_settings.disable()
+        shutil.rmtree(cls.media_root)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a book and an admin."""
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser("covers@example.com", "pass")
+        cls.book = Book.objects.create(
+            title="Dune",
+            author="Frank Herbert",
+            category=Category.objects.create(name="Science fiction"),
+        )
+
+    def setUp(self):
+        """Authenticate as an admin."""
+        super().setUp()
+        self.auth(self.admin)
+        self.path = f"/books/{self.book.pk}/"
+
+    def upload(self, cover):
+        """Upload the cover and check its rendering is queued."""
+        with run_storage_operations(), mock.patch.object(
+            render_book_cover, "delay"
+        ) as delay:
+            self.patch(
+                f"{self.path}cover/",
+                data={"cover": cover},
+                format="multipart",
+                asserted_status=status.HTTP_204_NO_CONTENT,
+            )
+        delay.assert_called_once_with(self.book.pk)
+
+    def render(self):
+        """Render the cover and return the book's covers."""
+        with run_storage_operations():
+            render_book_cover(self.book.pk)
+        return self.get_covers()
+
+    def get_covers(self):
+        """Return the covers attribute of the book."""
+        response = self.get(self.path, asserted_status=status.HTTP_200_OK)
+        return response.json()["data"]["attributes"]["covers"]
+
+    def test_renditions(self):
+        """Covers are rendered in WebP and JPEG within the box of each rendition."""
+        self.upload(make_cover())
+        self.assertIsNone(self.get_covers())
+        covers = self.render()
+        self.assertEqual(
+            {
+                name: (rendition["width"], rendition["height"])
+                for name, rendition in covers.items()
+            },
+            {"full": (800, 1200), "card": (320, 480), "thumb": (120, 180)},
+        )
+        renditions = Book.objects.get(pk=self.book.pk).cover_renditions
+        for name, rendition in renditions["renditions"].items():
+            for extension, pil_format in [("webp", "WEBP"), ("jpeg", "JPEG")]:
+                with self.subTest(name=name, extension=extension):
+                    self.assertEqual(
+                        covers[name][extension],
+                        default_storage.url(rendition[extension]),
+                    )
+                    with default_storage.open(rendition[extension]) as fyl:
+                        image = Image.open(fyl)
+                        self.assertEqual(image.format, pil_format)
+                        self.assertEqual(
+                            image.size, (rendition["width"], rendition["height"])
+                        )
+
+    def test_small_cover(self):
+        """Covers are never enlarged, and transparent ones are put on white."""
+        self.upload(make_cover((100, 50), (0, 0, 0, 0), "PNG", "RGBA"))
+        covers = self.render()
+        self.assertEqual(
+            {
+                (rendition["width"], rendition["height"])
+                for rendition in covers.values()
+            },
+            {(100, 50)},
+        )
+        renditions = Book.objects.get(pk=self.book.pk).cover_renditions
+        with default_storage.open(renditions["renditions"]["thumb"]["jpeg"]) as fyl:
+            self.assertEqual(Image.open(fyl).getpixel((50, 25)), (255, 255, 255))
+
+    def test_new_cover(self):
+        """Previous renditions are served until those of a new cover replace them."""
+        self.upload(make_cover())
+        covers = self.render()
+        previous = get_keys(Book.objects.get(pk=self.book.pk).cover_renditions)
+        self.upload(make_cover(color="navy"))
+        self.assertEqual(self.get_covers(), covers)
+        self.assertNotEqual(self.render(), covers)
+        keys = get_keys(Book.objects.get(pk=self.book.pk).cover_renditions)
+        self.assertFalse(set(previous) & set(keys))
+        self.assertTrue(all(default_storage.exists(key) for key in keys))
+        self.assertFalse(any(default_storage.exists(key) for key in previous))
+
+    def test_replaced_while_rendering(self):
+        """Renditions of a cover replaced meanwhile are thrown away."""
+        self.upload(make_cover())
+        rendered = []
+
+        def render_then_replace(book, formats):
+            rendered.append(render_cover(book, formats))
+            Book.objects.filter(pk=book.pk).update(cover="book_covers/other.jpg")
+            return rendered[0]
+
+        with mock.patch("better_reads.covers.render", render_then_replace):
+            self.assertIsNone(self.render())
+        self.assertEqual(Book.objects.get(pk=self.book.pk).cover_renditions, {})
+        keys = get_keys(rendered[0])
+        self.assertEqual(len(keys), 6)
+        self.assertFalse(any(default_storage.exists(key) for key in keys))
+
+    def test_removed_cover(self):
+        """Removing the cover deletes its renditions."""
+        self.upload(make_cover())
+        self.render()
+        book = Book.objects.get(pk=self.book.pk)
+        keys = get_keys(book.cover_renditions)
+        book.cover = None
+        with run_storage_operations(), mock.patch.object(render_book_cover, "delay"):
+            book.save()
+        self.assertIsNone(self.render())
+        self.assertEqual(Book.objects.get(pk=book.pk).cover_renditions, {})
+        self.assertFalse(any(default_storage.exists(key) for key in keys))
+
+    def test_urls_signed_at_once(self):
+        """The cover URLs of a page of books are signed at once."""
+        self.upload(make_cover())
+        self.render()
+        book = Book.objects.get(pk=self.book.pk)
+        with mock.patch("better_reads.serializers.cache_urls") as cache_urls:
+            self.get("/books/", asserted_status=status.HTTP_200_OK)
+            self.get(
+                "/books/",
+                {"fields[books]": "title,covers"},
+                asserted_status=status.HTTP_200_OK,
+            )
+        self.assertEqual(
+            [list(call[0][0]) for call in cache_urls.call_args_list],
+            [
+                [book.cover.name, *get_keys(book.cover_renditions)],
+                get_keys(book.cover_renditions),
+            ],
+        )
+
+    def test_deleted_book(self):
+        """Deleting a book deletes its cover and renditions."""
+        self.upload(make_cover())
+        self.render()
+        book = Book.objects.get(pk=self.book.pk)
+        keys = [book.cover.name, *get_keys(book.cover_renditions)]
+        self.assertTrue(all(default_storage.exists(key) for key in keys))
+        with run_storage_operations() as apply_async:
+            book.category.delete()
+        apply_async.assert_called_once()
+        self.assertFalse(any(default_storage.exists(key) for key in keys))
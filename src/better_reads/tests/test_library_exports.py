@@ -0,0 +1,85 @@
+"""Tests for the library export endpoint."""
+import csv
+import io
+import json
+from unittest import mock
+
+from rest_framework import status
+
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from better_reads.views import LibraryExportView
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test streaming exports of libraries."""
+
+    path = "/library-exports/"
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a library and someone else's."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        category = Category.objects.create(name="Fantasy")
+        books = Book.objects.bulk_create(
+            Book(title=f"book {index}", author="author", category=category)
+            for index in range(5)
+        )
+        cls.shelf = Shelf.objects.create(name="Mine", user=cls.user)
+        Shelfbook.objects.bulk_create(
+            Shelfbook(shelf=cls.shelf, book=book) for book in books
+        )
+        Review.objects.create(rate="4", content="Good.", user=cls.user, book=books[0])
+        other_shelf = Shelf.objects.create(name="Theirs", user=UserFactory())
+        Shelfbook.objects.create(shelf=other_shelf, book=books[0])
+
+    def setUp(self):
+        """Authenticate as the owner of the library."""
+        super().setUp()
+        self.auth(self.user)
+
+    def export(self, *args, **kwargs):
+        """Return the streamed export as text."""
+        response = self.get(
+            self.path, *args, asserted_status=status.HTTP_200_OK, **kwargs
+        )
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        """Every record of the user is a line of JSON."""
+        with mock.patch.object(LibraryExportView, "chunk_size", 2):
+            response, content = self.export()
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["shelves"] + ["shelfbooks"] * 5 + ["reviews"],
+        )
+        self.assertEqual(
+            records[0],
+            {"type": "shelves", "id": self.shelf.pk, "name": "Mine", "public": True},
+        )
+        self.assertEqual(records[-1]["title"], "book 0")
+        self.assertEqual(records[-1]["rate"], "4")
+
+    def test_csv(self):
+        """CSV exports have a column per field of every resource."""
+        response, content = self.export({"format": "csv"})
+        self.assertEqual(
+            response["Content-Disposition"], 'attachment; filename="library.csv"'
+        )
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(list(rows[0]), LibraryExportView.fieldnames)
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1]["status"], "wish")
+        self.assertEqual(rows[1]["name"], "")
+
+    def test_anonymous(self):
+        """Anonymous users have nothing to export."""
+        self.auth(None)
+        self.get(self.path, asserted_status=status.HTTP_401_UNAUTHORIZED)
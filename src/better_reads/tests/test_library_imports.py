@@ -0,0 +1,249 @@
+"""Tests for the library import endpoint and task."""
+import csv
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework import status
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from better_reads.imports import INVALID_LIBRARY_MESSAGE, LibraryImporter
+from better_reads.models import Book, Category, LibraryImport, Review, Shelf, Shelfbook
+from better_reads.signals import CATALOGUE, get_book_namespace
+from users.tests.factories import UserFactory
+from webapp.cache import get_versions
+from webapp.tasks import IMPORT_FAILED_MESSAGE, import_library
+from webapp.test.base import BaseTestCase
+from webapp.test.storage import mocked_s3
+
+HEADER = [
+    "Book Id",
+    "Title",
+    "Author",
+    "My Rating",
+    "Bookshelves",
+    "Exclusive Shelf",
+    "My Review",
+]
+
+
+def export(*rows):
+    """Return a Goodreads CSV export of the rows."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(HEADER)
+    for index, row in enumerate(rows):
+        writer.writerow([index, *row])
+    return SimpleUploadedFile(
+        "goodreads_library_export.csv",
+        output.getvalue().encode("utf-8-sig"),
+        content_type="text/csv",
+    )
+
+
+class TestCase(BaseTestCase):
+    """Test importing Goodreads exports."""
+
+    path = "/library-imports/"
+
+    @classmethod
+    def setUpClass(cls):
+        """Store uploads in a temporary directory."""
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.storage_settings = override_settings(
+            DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+            MEDIA_ROOT=cls.media_root,
+        )
+        cls.storage_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the uploads."""
+        cls.storage_settings.disable()
+        shutil.rmtree(cls.media_root)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create the books of the exports."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        category = Category.objects.create(name="Fantasy")
+        cls.hobbit = Book.objects.create(
+            title="The Hobbit", author="J.R.R. Tolkien", category=category
+        )
+        cls.dune = Book.objects.create(
+            title="Dune", author="Frank Herbert", category=category
+        )
+        cls.other_dune = Book.objects.create(
+            title="Dune", author="Someone Else", category=category
+        )
+        cls.emma = Book.objects.create(
+            title="Emma", author="Jane Austen", category=category
+        )
+
+    def setUp(self):
+        """Authenticate as the importing user."""
+        super().setUp()
+        self.auth(self.user)
+
+    def upload(self, fyl):
+        """Upload the file, run its import and return the import's attributes."""
+        response = self.post(
+            self.path,
+            data={"file": fyl},
+            format="multipart",
+            asserted_status=status.HTTP_201_CREATED,
+        )
+        data = response.json()["data"]
+        self.assertEqual(data["attributes"]["status"], "pending")
+        import_library(data["id"])
+        response = self.get(
+            f"{self.path}{data['id']}/", asserted_status=status.HTTP_200_OK
+        )
+        return response.json()["data"]["attributes"]
+
+    def test_import(self):
+        """Rows are matched to books, shelved and reviewed."""
+        attributes = self.upload(
+            export(
+                [
+                    "The Hobbit (Middle-earth, #0)",
+                    "J.R.R. Tolkien",
+                    "5",
+                    "",
+                    "read",
+                    "",
+                ],
+                ["Dune", "Frank Herbert", "0", "sci-fi", "to-read", ""],
+                ["Emma", "jane austen", "3", "", "currently-reading", "Witty.\nSharp."],
+                ["Unknown", "Nobody", "4", "", "read", ""],
+            )
+        )
+        self.assertEqual(attributes["status"], "done")
+        self.assertEqual(attributes["processed"], 4)
+        self.assertEqual(attributes["shelved"], 4)
+        self.assertEqual(attributes["reviewed"], 2)
+        self.assertEqual(attributes["unmatched"], 1)
+        self.assertEqual(
+            set(Shelf.objects.filter(user=self.user).values_list("name", flat=True)),
+            {"read", "to-read", "sci-fi", "currently-reading"},
+        )
+        self.assertEqual(
+            set(Shelfbook.objects.values_list("shelf__name", "book__title", "status")),
+            {
+                ("read", "The Hobbit", "read"),
+                ("sci-fi", "Dune", "wish"),
+                ("to-read", "Dune", "wish"),
+                ("currently-reading", "Emma", "reading"),
+            },
+        )
+        self.assertEqual(
+            set(Review.objects.values_list("book__title", "rate", "content")),
+            {("The Hobbit", "5", ""), ("Emma", "3", "Witty.\nSharp.")},
+        )
+
+    def test_invalidate_reviewed_books(self):
+        """Only the cached responses of the reviewed books are invalidated."""
+        namespaces = [
+            CATALOGUE,
+            get_book_namespace(self.emma.pk),
+            get_book_namespace(self.dune.pk),
+        ]
+        catalogue, emma, dune = get_versions(namespaces)
+        self.upload(
+            export(
+                ["Emma", "Jane Austen", "4", "", "read", ""],
+                ["Dune", "Frank Herbert", "0", "", "read", ""],
+            )
+        )
+        self.assertEqual(get_versions(namespaces), [catalogue, emma + 1, dune])
+
+    def test_chunks(self):
+        """Rows are imported in chunks and re-imports skip existing rows."""
+        rows = [["Emma", "Jane Austen", "4", "", "read", ""]] * 5
+        with mock.patch.object(LibraryImporter, "chunk_size", 2):
+            attributes = self.upload(export(*rows))
+            self.assertEqual(attributes["processed"], 5)
+            self.assertEqual(attributes["shelved"], 1)
+            self.assertEqual(attributes["reviewed"], 1)
+            self.assertEqual(attributes["skipped"], 4)
+            attributes = self.upload(export(*rows))
+        self.assertEqual(attributes["shelved"], 0)
+        self.assertEqual(attributes["skipped"], 6)
+        self.assertEqual(Shelfbook.objects.count(), 1)
+        self.assertEqual(Review.objects.count(), 1)
+
+    def test_concurrent_import(self):
+        """Shelfbooks inserted since the chunk started are skipped, not counted."""
+        shelf = Shelf.objects.create(name="read", user=self.user)
+        create_shelfbooks = LibraryImporter.create_shelfbooks
+
+        def create_concurrently(shelfbooks):
+            Shelfbook.objects.create(shelf=shelf, book=self.emma)
+            return create_shelfbooks(shelfbooks)
+
+        with mock.patch.object(
+            LibraryImporter, "create_shelfbooks", side_effect=create_concurrently
+        ):
+            attributes = self.upload(
+                export(
+                    ["Emma", "Jane Austen", "0", "", "read", ""],
+                    ["Dune", "Frank Herbert", "0", "", "read", ""],
+                )
+            )
+        self.assertEqual(attributes["status"], "done")
+        self.assertEqual(attributes["shelved"], 1)
+        self.assertEqual(attributes["skipped"], 1)
+        self.assertEqual(Shelfbook.objects.count(), 2)
+
+    def test_stream_from_s3(self):
+        """Files in S3 are read as they are downloaded, never spooled whole."""
+        with mocked_s3("imports"), mock.patch(
+            "webapp.storage.STREAM_CHUNK_SIZE", 16
+        ), mock.patch.object(
+            S3Boto3Storage, "_open", side_effect=AssertionError("spooled")
+        ):
+            attributes = self.upload(
+                export(
+                    ["Emma", "Jane Austen", "3", "", "read", "Witty.\r\nSharp."],
+                    ["Dune", "Frank Herbert", "5", "", "read", ""],
+                )
+            )
+        self.assertEqual(attributes["status"], "done")
+        self.assertEqual(attributes["reviewed"], 2)
+        self.assertEqual(Review.objects.get(book=self.emma).content, "Witty.\r\nSharp.")
+
+    def test_failure(self):
+        """Files which cannot be read mark the import as failed."""
+        with self.assertLogs("webapp.tasks", "WARNING"):
+            attributes = self.upload(
+                SimpleUploadedFile("export.csv", b"\xff\xfe", content_type="text/csv")
+            )
+        self.assertEqual(attributes["status"], "failed")
+        self.assertEqual(attributes["error"], INVALID_LIBRARY_MESSAGE)
+
+    def test_unexpected_failure(self):
+        """Unexpected errors are logged, users only see a generic message."""
+        with mock.patch.object(
+            LibraryImporter, "import_chunk", side_effect=RuntimeError("secret")
+        ), self.assertLogs("webapp.tasks", "ERROR") as logs:
+            attributes = self.upload(export(["Emma", "Jane Austen", "0", "", "", ""]))
+        self.assertEqual(attributes["status"], "failed")
+        self.assertEqual(attributes["error"], IMPORT_FAILED_MESSAGE)
+        self.assertIn("secret", logs.output[0])
+
+    def test_own_imports(self):
+        """Users only see their own imports."""
+        other = LibraryImport.objects.create(user=UserFactory(), file="other.csv")
+        self.get(f"{self.path}{other.pk}/", asserted_status=status.HTTP_404_NOT_FOUND)
+        self.post(
+            self.path,
+            data={"file": SimpleUploadedFile("export.txt", b"")},
+            format="multipart",
+            asserted_status=status.HTTP_400_BAD_REQUEST,
+        )
@@ -0,0 +1,157 @@
+"""Tests for ownership checks on shelves, shelfbooks and reviews."""
+from unittest import mock
+
+from rest_framework import status
+
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from better_reads.serializers import ShelfbookSerializer
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+
+
+def document(resource_name, instance, **attributes):
+    """Return a document updating the attributes of the instance."""
+    return {
+        "data": {
+            "type": resource_name,
+            "id": str(instance.pk),
+            "attributes": attributes,
+        }
+    }
+
+
+class TestCase(BaseTestCase):
+    """Test that only owners change their shelves, shelfbooks and reviews."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a public and a private shelf of another user."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        cls.other_user = UserFactory()
+        category = Category.objects.create(name="Fantasy")
+        cls.book = Book.objects.create(
+            title="Dune", author="Herbert", category=category
+        )
+        cls.shelf = Shelf.objects.create(name="Mine", user=cls.user)
+        cls.public_shelf = Shelf.objects.create(name="Public", user=cls.other_user)
+        cls.private_shelf = Shelf.objects.create(
+            name="Private", user=cls.other_user, public=False
+        )
+        cls.shelfbook = Shelfbook.objects.create(shelf=cls.shelf, book=cls.book)
+        cls.public_shelfbook = Shelfbook.objects.create(
+            shelf=cls.public_shelf, book=cls.book
+        )
+        cls.private_shelfbook = Shelfbook.objects.create(
+            shelf=cls.private_shelf, book=cls.book
+        )
+        cls.review = Review.objects.create(rate="4", user=cls.user, book=cls.book)
+        cls.other_review = Review.objects.create(
+            rate="2", user=cls.other_user, book=cls.book
+        )
+
+    def setUp(self):
+        """Authenticate as the owner."""
+        super().setUp()
+        self.auth(self.user)
+
+    def test_shelfbooks(self):
+        """Shelfbooks are read and changed without looking up their shelf."""
+        path = f"/shelfbooks/{self.shelfbook.pk}/"
+        self.get(path, asserted_status=status.HTTP_200_OK, query_budget=2)
+        # The shelfbook with its owner, then the UPDATE.
+        self.patch(
+            path,
+            data=document("shelfbooks", self.shelfbook, status="read"),
+            asserted_status=status.HTTP_200_OK,
+            query_budget=2,
+        )
+        self.patch(
+            f"/shelfbooks/{self.public_shelfbook.pk}/",
+            data=document("shelfbooks", self.public_shelfbook, status="read"),
+            asserted_status=status.HTTP_403_FORBIDDEN,
+            query_budget=1,
+        )
+        self.delete(
+            f"/shelfbooks/{self.public_shelfbook.pk}/",
+            asserted_status=status.HTTP_403_FORBIDDEN,
+        )
+        self.delete(
+            f"/shelfbooks/{self.private_shelfbook.pk}/",
+            asserted_status=status.HTTP_404_NOT_FOUND,
+        )
+        self.assertEqual(
+            Shelfbook.objects.get(pk=self.public_shelfbook.pk).status, "wish"
+        )
+
+    def test_shelfbook_shelf(self):
+        """Shelfbooks can only be put on the user's own shelves."""
+        data = {
+            "data": {
+                "type": "shelfbooks",
+                "relationships": {
+                    "shelf": {
+                        "data": {"type": "shelves", "id": str(self.public_shelf.pk)}
+                    },
+                    "book": {"data": {"type": "books", "id": str(self.book.pk)}},
+                },
+            }
+        }
+        self.post(
+            "/shelfbooks/", data=data, asserted_status=status.HTTP_400_BAD_REQUEST
+        )
+        Shelfbook.objects.filter(pk=self.shelfbook.pk).delete()
+        data["data"]["relationships"]["shelf"]["data"]["id"] = str(self.shelf.pk)
+        self.post("/shelfbooks/", data=data, asserted_status=status.HTTP_201_CREATED)
+
+    def test_shelfbook_race(self):
+        """Books shelved concurrently, after validation, are rejected with 400."""
+        data = {
+            "data": {
+                "type": "shelfbooks",
+                "relationships": {
+                    "shelf": {"data": {"type": "shelves", "id": str(self.shelf.pk)}},
+                    "book": {"data": {"type": "books", "id": str(self.book.pk)}},
+                },
+            }
+        }
+        # The shelfbook is committed by another request once validated.
+        with mock.patch.object(
+            ShelfbookSerializer, "validate", lambda serializer, attrs: attrs
+        ):
+            response = self.post(
+                "/shelfbooks/", data=data, asserted_status=status.HTTP_400_BAD_REQUEST
+            )
+        self.assertEqual(
+            response.json()["errors"][0]["detail"], "This book is already on the shelf."
+        )
+        self.assertEqual(Shelfbook.objects.filter(shelf=self.shelf).count(), 1)
+
+    def test_shelves(self):
+        """Shelves are changed by their owner only."""
+        self.patch(
+            f"/shelves/{self.shelf.pk}/",
+            data=document("shelves", self.shelf, name="Renamed"),
+            asserted_status=status.HTTP_200_OK,
+        )
+        # The shelf and the ids of its books, the owner is not looked up.
+        self.patch(
+            f"/shelves/{self.public_shelf.pk}/",
+            data=document("shelves", self.public_shelf, name="Renamed"),
+            asserted_status=status.HTTP_403_FORBIDDEN,
+            query_budget=2,
+        )
+
+    def test_reviews(self):
+        """Reviews are changed by their owner only."""
+        self.patch(
+            f"/reviews/{self.review.pk}/",
+            data=document("reviews", self.review, content="Great."),
+            asserted_status=status.HTTP_200_OK,
+        )
+        self.delete(
+            f"/reviews/{self.other_review.pk}/",
+            asserted_status=status.HTTP_403_FORBIDDEN,
+            query_budget=1,
+        )
+        self.assertTrue(Review.objects.filter(pk=self.other_review.pk).exists())
@@ -0,0 +1,146 @@
+"""Tests for the rating aggregates of books."""
+from django.core.management import call_command
+from rest_framework import status
+
+from better_reads.management.commands.rebuild_ratings import rebuild_ratings
+from better_reads.models import Book, Category, Review
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test the rating aggregates are kept up to date."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create books to review."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        cls.category = Category.objects.create(name="Fantasy")
+        cls.book = Book.objects.create(
+            title="Dune", author="Herbert", category=cls.category
+        )
+        cls.other_book = Book.objects.create(
+            title="Emma", author="Austen", category=cls.category
+        )
+
+    def setUp(self):
+        """Authenticate as a reviewer."""
+        super().setUp()
+        self.auth(self.user)
+
+    def get_ratings(self, book):
+        """Return the rating attributes of the book."""
+        response = self.get(f"/books/{book.pk}/", asserted_status=status.HTTP_200_OK)
+        attributes = response.json()["data"]["attributes"]
+        return {key: value for key, value in attributes.items() if "rating" in key}
+
+    def review(self, book, rate):
+        """Review the book through the API and return the review id."""
+        data = {
+            "data": {
+                "type": "reviews",
+                "attributes": {"rate": rate},
+                "relationships": {"book": {"data": {"type": "books", "id": book.pk}}},
+            }
+        }
+        response = self.post(
+            "/reviews/", data=data, asserted_status=status.HTTP_201_CREATED
+        )
+        return response.json()["data"]["id"]
+
+    def test_create(self):
+        """Creating reviews adds their rate, blank rates are not counted."""
+        for rate in ["5", "4", "4", ""]:
+            self.review(self.book, rate)
+        self.assertEqual(
+            self.get_ratings(self.book),
+            {
+                "rating_sum": 13,
+                "rating_count": 3,
+                "rating_average": 13 / 3,
+                "rating_histogram": [0, 0, 0, 2, 1],
+            },
+        )
+
+    def test_update_and_delete(self):
+        """Updating and deleting reviews moves their rate."""
+        review_id = self.review(self.book, "2")
+        self.review(self.book, "4")
+        data = {
+            "data": {"type": "reviews", "id": review_id, "attributes": {"rate": "5"}}
+        }
+        self.patch(
+            f"/reviews/{review_id}/", data=data, asserted_status=status.HTTP_200_OK
+        )
+        self.assertEqual(
+            self.get_ratings(self.book)["rating_histogram"], [0, 0, 0, 1, 1]
+        )
+        self.delete(
+            f"/reviews/{review_id}/", asserted_status=status.HTTP_204_NO_CONTENT
+        )
+        self.delete(
+            f"/reviews/{Review.objects.get().pk}/",
+            asserted_status=status.HTTP_204_NO_CONTENT,
+        )
+        self.assertEqual(
+            self.get_ratings(self.book),
+            {
+                "rating_sum": 0,
+                "rating_count": 0,
+                "rating_average": 0,
+                "rating_histogram": [0, 0, 0, 0, 0],
+            },
+        )
+
+    def test_read_only(self):
+        """The aggregates are neither writable nor overwritten by stale books."""
+        stale = Book.objects.get(pk=self.book.pk)
+        self.review(self.book, "3")
+        stale.title = "Dune Messiah"
+        stale.save()
+        self.assertEqual(self.get_ratings(self.book)["rating_sum"], 3)
+
+    def test_sort(self):
+        """Books can be sorted by their average rating."""
+        self.review(self.book, "2")
+        self.review(self.other_book, "4")
+        response = self.get(
+            "/books/",
+            {"filter[category]": self.category.pk, "sort": "-rating_average"},
+            asserted_status=status.HTTP_200_OK,
+        )
+        ids = [book["id"] for book in response.json()["data"]]
+        self.assertEqual(ids, [str(self.other_book.pk), str(self.book.pk)])
+
+    def test_rebuild(self):
+        """The command recomputes the aggregates from the reviews."""
+        Review.objects.bulk_create(
+            Review(rate=rate, user=self.user, book=self.book) for rate in "1355"
+        )
+        self.assertEqual(rebuild_ratings(), 0)
+        Book.objects.update(rating_sum=0, rating_count=0)
+        call_command("rebuild_ratings", verbosity=0)
+        self.assertEqual(
+            self.get_ratings(self.book),
+            {
+                "rating_sum": 14,
+                "rating_count": 4,
+                "rating_average": 3.5,
+                "rating_histogram": [1, 0, 1, 0, 2],
+            },
+        )
+
+    def test_rebuild_batches(self):
+        """Every batch of books is rebuilt, and only the stale books count."""
+        Review.objects.bulk_create(
+            Review(rate=rate, user=self.user, book=book)
+            for book, rate in [(self.book, "2"), (self.other_book, "5")]
+        )
+        Book.objects.update(rating_sum=0)
+        Book.objects.filter(pk=self.other_book.pk).update(rating_sum=5)
+        self.assertEqual(rebuild_ratings(batch_size=1), 1)
+        Book.objects.update(rating_count=0)
+        call_command("rebuild_ratings", batch_size=1, verbosity=0)
+        self.assertEqual(self.get_ratings(self.book)["rating_sum"], 2)
+        self.assertEqual(self.get_ratings(self.other_book)["rating_count"], 1)
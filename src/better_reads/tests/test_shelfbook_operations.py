@@ -0,0 +1,220 @@
+"""Tests for the bulk shelfbook operations endpoint."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from better_reads.models import Book, Category, Shelf, Shelfbook
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+
+
+def add(shelf, book, read_status=None):
+    """Return an operation adding the book to the shelf."""
+    data = {
+        "type": "shelfbooks",
+        "relationships": {
+            "shelf": {"data": {"type": "shelves", "id": str(shelf.pk)}},
+            "book": {"data": {"type": "books", "id": str(book.pk)}},
+        },
+    }
+    if read_status is not None:
+        data["attributes"] = {"status": read_status}
+    return {"op": "add", "data": data}
+
+
+def update(shelfbook, read_status):
+    """Return an operation changing the status of the shelfbook."""
+    data = {
+        "type": "shelfbooks",
+        "id": str(shelfbook.pk),
+        "attributes": {"status": read_status},
+    }
+    return {"op": "update", "data": data}
+
+
+def remove(shelfbook):
+    """Return an operation removing the shelfbook."""
+    return {"op": "remove", "ref": {"type": "shelfbooks", "id": str(shelfbook.pk)}}
+
+
+class TestCase(BaseTestCase):
+    """Test atomic operations on shelfbooks."""
+
+    path = "/shelfbooks/operations/"
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create shelves and books."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        cls.other_user = UserFactory()
+        cls.shelf = Shelf.objects.create(name="Mine", user=cls.user)
+        cls.other_shelf = Shelf.objects.create(name="Theirs", user=cls.other_user)
+        category = Category.objects.create(name="Fantasy")
+        cls.books = Book.objects.bulk_create(
+            Book(title=f"book {index}", author="author", category=category)
+            for index in range(200)
+        )
+
+    def setUp(self):
+        """Authenticate as the owner of the shelf."""
+        super().setUp()
+        self.auth(self.user)
+
+    def operate(self, operations, asserted_status, query_budget=None):
+        """Post the operations and return the response document."""
+        response = self.post(
+            self.path,
+            data={"atomic:operations": operations},
+            asserted_status=asserted_status,
+            query_budget=query_budget,
+        )
+        return response.json()
+
+    def test_bulk_add(self):
+        """Adding many books takes a fixed number of queries."""
+        operations = [add(self.shelf, book) for book in self.books]
+        # Shelves and books within a savepoint, then one INSERT in another.
+        document = self.operate(operations, status.HTTP_200_OK, query_budget=7)
+        results = document["atomic:results"]
+        self.assertEqual(len(results), len(self.books))
+        self.assertEqual(Shelfbook.objects.filter(shelf=self.shelf).count(), 200)
+        shelfbook = Shelfbook.objects.get(shelf=self.shelf, book=self.books[0])
+        self.assertEqual(
+            results[0]["data"],
+            {
+                "type": "shelfbooks",
+                "id": str(shelfbook.pk),
+                "attributes": {"status": "wish"},
+                "relationships": {
+                    "shelf": {"data": {"type": "shelves", "id": str(self.shelf.pk)}},
+                    "book": {"data": {"type": "books", "id": str(self.books[0].pk)}},
+                },
+            },
+        )
+
+    def test_mixed(self):
+        """Operations of every kind are applied and answered in order."""
+        moved, removed = Shelfbook.objects.bulk_create(
+            Shelfbook(shelf=self.shelf, book=book) for book in self.books[:2]
+        )
+        operations = [
+            update(moved, "read"),
+            remove(removed),
+            add(self.shelf, self.books[2], "reading"),
+        ]
+        results = self.operate(operations, status.HTTP_200_OK)["atomic:results"]
+        self.assertEqual(results[0]["data"]["attributes"], {"status": "read"})
+        self.assertEqual(results[1], {})
+        self.assertEqual(results[2]["data"]["attributes"], {"status": "reading"})
+        self.assertEqual(
+            dict(Shelfbook.objects.values_list("book", "status")),
+            {self.books[0].pk: "read", self.books[2].pk: "reading"},
+        )
+
+    def test_locks(self):
+        """Shelfbooks and shelves stay locked from validation until applied."""
+        moved = Shelfbook.objects.create(shelf=self.shelf, book=self.books[0])
+        operations = [update(moved, "read"), add(self.shelf, self.books[1])]
+        with CaptureQueriesContext(connection) as context:
+            self.operate(operations, status.HTTP_200_OK)
+        queries = [query["sql"] for query in context.captured_queries]
+        start = next(i for i, sql in enumerate(queries) if sql.startswith("SAVEPOINT"))
+        locks = [i for i, sql in enumerate(queries) if "FOR UPDATE" in sql]
+        self.assertEqual(len(locks), 2)
+        self.assertIn('FOR UPDATE OF "better_reads_shelfbook"', queries[locks[0]])
+        inserts = [i for i, sql in enumerate(queries) if sql.startswith("INSERT")]
+        release = max(i for i, sql in enumerate(queries) if sql.startswith("RELEASE"))
+        self.assertTrue(start < min(locks) and max(inserts) < release)
+
+    def test_all_or_nothing(self):
+        """No operation is applied when one of them fails."""
+        operations = [
+            add(self.shelf, self.books[0]),
+            add(self.other_shelf, self.books[1]),
+            add(self.shelf, self.books[2], "skimmed"),
+        ]
+        document = self.operate(operations, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [error["source"]["pointer"] for error in document["errors"]],
+            ["/atomic:operations/2/data/attributes/status"],
+        )
+        operations[2] = add(self.shelf, self.books[2], "read")
+        document = self.operate(operations, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            document["errors"],
+            [
+                {
+                    "status": "400",
+                    "detail": "You have no permission to modify this shelf.",
+                    "source": {
+                        "pointer": "/atomic:operations/1/data/relationships/shelf"
+                    },
+                }
+            ],
+        )
+        self.assertFalse(Shelfbook.objects.exists())
+
+    def test_duplicates(self):
+        """Books already on the shelf, or shelved twice, are rejected."""
+        shelfbook = Shelfbook.objects.create(shelf=self.shelf, book=self.books[0])
+        document = self.operate(
+            [add(self.shelf, self.books[1]), add(self.shelf, self.books[0])],
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            document["errors"],
+            [
+                {
+                    "status": "400",
+                    "detail": "This book is already on the shelf.",
+                    "source": {"pointer": "/atomic:operations/1/data/relationships"},
+                }
+            ],
+        )
+        document = self.operate(
+            [add(self.shelf, self.books[1]), add(self.shelf, self.books[1])],
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            document["errors"][0]["source"]["pointer"],
+            "/atomic:operations/1/data/relationships",
+        )
+        self.assertEqual(Shelfbook.objects.count(), 1)
+        # Removed books can be shelved again in the same batch.
+        self.operate(
+            [remove(shelfbook), add(self.shelf, self.books[0], "read")],
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(
+            list(Shelfbook.objects.values_list("book", "status")),
+            [(self.books[0].pk, "read")],
+        )
+        self.post(
+            "/shelfbooks/",
+            data=add(self.shelf, self.books[0])["data"],
+            asserted_status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_other_users_shelfbooks(self):
+        """Shelfbooks on shelves of other users cannot be changed."""
+        shelfbook = Shelfbook.objects.create(shelf=self.other_shelf, book=self.books[0])
+        document = self.operate([remove(shelfbook)], status.HTTP_403_FORBIDDEN)
+        self.assertEqual(document["errors"][0]["status"], "403")
+        self.other_shelf.public = False
+        self.other_shelf.save()
+        self.operate([update(shelfbook, "read")], status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Shelfbook.objects.filter(pk=shelfbook.pk).exists())
+
+    def test_malformed(self):
+        """Documents without a list of operations are rejected."""
+        self.operate({}, status.HTTP_400_BAD_REQUEST)
+        document = self.operate([{"op": "move"}], status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            document["errors"][0]["source"]["pointer"], "/atomic:operations/0/op"
+        )
+
+    def test_anonymous(self):
+        """Anonymous users cannot apply operations."""
+        self.auth(None)
+        self.operate([add(self.shelf, self.books[0])], status.HTTP_401_UNAUTHORIZED)
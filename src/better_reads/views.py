@@ -1,19 +1,49 @@
 """Views for the better_reads app."""
-from django.db.models import Q
-from rest_framework import generics, permissions, status
+import re
+from uuid import uuid4
+
+from django.contrib.postgres.search import SearchQuery, SearchVector, TrigramSimilarity
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.http import StreamingHttpResponse
+from rest_framework import generics, mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ParseError, ValidationError
 from rest_framework.response import Response
-from rest_framework_json_api import views
+from rest_framework.settings import api_settings
+from rest_framework_json_api import utils, views
+
+from webapp.cache import ResponseCacheMixin
+from webapp.conditional import ConditionalGetMixin
+from webapp.filters import SEARCH_CONFIG
+from webapp.pagination import JsonApiEstimatedCountPagination
+from webapp.parsers import PlainJSONParser
+from webapp.prefetch import PrefetchPlanMixin
+from webapp.renderers import (
+    CSVRenderer,
+    JSONAPIRenderer,
+    NDJSONRenderer,
+    PrebuiltJSONRenderer,
+)
+from webapp.storage import delete_later
+from webapp.tasks import import_library
 
-from .models import Book, Category, Review, Shelf, Shelfbook
+from .changes import ChangeFeedPagination, get_changes, get_resources
+from .covers import get_upload_error, get_upload_prefix, is_upload_key
+from .models import Book, Category, LibraryImport, Review, Shelf, Shelfbook
+from .operations import ShelfbookOperations
 from .serializers import (
     BookCoverSerializer,
     BookSerializer,
     CategorySerializer,
+    LibraryImportSerializer,
     ReviewSerializer,
     ShelfbookSerializer,
     ShelfSerializer,
 )
+from .signals import CATALOGUE, get_book_namespace
 
 
 class IsObjectOwner(permissions.BasePermission):
@@ -24,13 +54,36 @@ class IsObjectOwner(permissions.BasePermission):
         return obj.is_owner(request.user)
 
 
-class BookView(views.ModelViewSet):
+class BookView(
+    ResponseCacheMixin, ConditionalGetMixin, PrefetchPlanMixin, views.ModelViewSet
+):
     """Book viewset."""
 
+    response_cache_namespace = CATALOGUE
+    # Reviews only invalidate the book they rate, so lists show new ratings
+    # once their cached responses expire.
+    response_cache_list_timeout = 60
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     search_fields = ["title", "author", "category__name"]
+    search_vector_field = "search_vector"
     filterset_fields = ["category", "category__name", "title", "author"]
+    cover_upload_max_size = 10 * 1024 * 1024
+    cover_upload_expire = 10 * 60
+
+    def get_response_cache_namespaces(self, request):
+        """Invalidate a book's responses when it is reviewed."""
+        namespaces = super().get_response_cache_namespaces(request)
+        if self.action == "retrieve":
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            namespaces.append(get_book_namespace(self.kwargs[lookup_url_kwarg]))
+        return namespaces
+
+    def get_response_cache_timeout(self, request):
+        """Cache lists briefly, reviews do not invalidate them."""
+        if self.action == "list":
+            return self.response_cache_list_timeout
+        return super().get_response_cache_timeout(request)
 
     @action(methods=["patch"], detail=True)
     def cover(self, request, *args, **kwargs):
@@ -41,7 +94,70 @@ class BookView(views.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         serializer.save()
         if original_image:
-            original_image.delete(save=False)
+            delete_later([original_image.name])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=["post"],
+        detail=True,
+        url_path="cover-upload",
+        renderer_classes=[PrebuiltJSONRenderer],
+    )
+    def cover_upload(self, request, *args, **kwargs):
+        """Issue a presigned POST to upload a cover straight to the bucket.
+
+        The file does not go through the API: once uploaded, it is attached to
+        the book with the `cover-confirm` action, given the issued key.
+        """
+        instance = self.get_object()
+        if not hasattr(default_storage, "get_presigned_post"):
+            raise NotFound("Covers cannot be uploaded straight to this storage.")
+        key = f"{get_upload_prefix(instance.pk)}{uuid4().hex}"
+        post = default_storage.get_presigned_post(
+            key,
+            conditions=[
+                ["content-length-range", 1, self.cover_upload_max_size],
+                ["starts-with", "$Content-Type", "image/"],
+            ],
+            expire=self.cover_upload_expire,
+        )
+        return Response(
+            {
+                "data": {
+                    "type": "cover-uploads",
+                    "id": key,
+                    "attributes": {"url": post["url"], "fields": post["fields"]},
+                }
+            }
+        )
+
+    @action(methods=["post"], detail=True, url_path="cover-confirm")
+    def cover_confirm(self, request, *args, **kwargs):
+        """Set the book cover to a file uploaded with a presigned POST.
+
+        Only the size and content type of the file are checked here, from its
+        metadata, and rejected files are deleted. Whether it is an image is
+        checked when rendering it: the cover rendered last is kept until then,
+        to be put back if it is not.
+        """
+        instance = self.get_object()
+        if not hasattr(default_storage, "head"):
+            raise NotFound("Covers cannot be uploaded straight to this storage.")
+        key = request.data.get("cover")
+        if not isinstance(key, str):
+            raise ValidationError({"cover": ["This field is required."]})
+        if not is_upload_key(instance.pk, key):
+            raise ValidationError({"cover": ["This key was not issued for this book."]})
+        error = get_upload_error(key, self.cover_upload_max_size)
+        if error is not None:
+            delete_later([key])
+            raise ValidationError({"cover": [error]})
+        original_image = instance.cover
+        instance.cover = key
+        instance.save()
+        kept = [key, instance.cover_renditions.get("source")]
+        if original_image and original_image.name not in kept:
+            delete_later([original_image.name])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_permissions(self):
@@ -53,9 +169,83 @@ class BookView(views.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class CategoryView(views.ModelViewSet):
+class BookSuggestionView(viewsets.ViewSet):
+    """Typeahead suggestions for book titles and authors.
+
+    Skips authentication, pagination, filters and serializers: only the id,
+    title and author of at most `max_results` books are read. Books with a
+    word starting with each word of the term are found through the
+    book_words_idx index; the trigram indexes on the title and author columns
+    are only searched for look-alikes when no book matches that way.
+    """
+
+    authentication_classes: list = []
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [PrebuiltJSONRenderer]
+    # Shorter terms have too few trigrams to tell books apart.
+    min_length = 3
+    max_results = 10
+    # Must stay the expression of book_words_idx (0018_bookWordsIndex) for
+    # the index to serve the prefix search.
+    words = SearchVector("title", "author", config=SEARCH_CONFIG)
+
+    def get_term(self):
+        """Return the search term with whitespace collapsed."""
+        return " ".join(
+            self.request.query_params.get(api_settings.SEARCH_PARAM, "").split()
+        )
+
+    def get_prefixed(self, term):
+        """Return books with a title or author word starting with each term word."""
+        words = re.findall(r"\w+", term)
+        if not words:
+            return []
+        raw_query = " & ".join(f"{word}:*" for word in words)
+        query = SearchQuery(raw_query, config=SEARCH_CONFIG, search_type="raw")
+        return list(
+            Book.objects.annotate(words=self.words)
+            .filter(words=query)
+            .order_by("pk")
+            .values("id", "title", "author")[: self.max_results]
+        )
+
+    def get_similar(self, term):
+        """Return books whose title or author looks like the term, closest first."""
+        similar = Q(title__trigram_similar=term) | Q(author__trigram_similar=term)
+        return list(
+            Book.objects.filter(similar)
+            .annotate(
+                similarity=Greatest(
+                    TrigramSimilarity("title", term), TrigramSimilarity("author", term)
+                )
+            )
+            .order_by("-similarity", "pk")
+            .values("id", "title", "author")[: self.max_results]
+        )
+
+    def get_suggestions(self, term):
+        """Return books matching the term by word prefix, else look-alikes."""
+        return self.get_prefixed(term) or self.get_similar(term)
+
+    def list(self, request):
+        """List the suggested books."""
+        term = self.get_term()
+        books = self.get_suggestions(term) if len(term) >= self.min_length else []
+        data = [
+            {
+                "type": Book.JSONAPIMeta.resource_name,
+                "id": str(book["id"]),
+                "attributes": {"title": book["title"], "author": book["author"]},
+            }
+            for book in books
+        ]
+        return Response({"data": data})
+
+
+class CategoryView(ResponseCacheMixin, views.ModelViewSet):
     """Category viewset."""
 
+    response_cache_namespace = CATALOGUE
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.DjangoModelPermissionsOrAnonReadOnly]
@@ -63,7 +253,7 @@ class CategoryView(views.ModelViewSet):
     filterset_fields = ["name"]
 
 
-class ShelfView(views.ModelViewSet):
+class ShelfView(ConditionalGetMixin, PrefetchPlanMixin, views.ModelViewSet):
     """Shelf viewset."""
 
     queryset = Shelf.objects.all()
@@ -73,7 +263,7 @@ class ShelfView(views.ModelViewSet):
 
     def get_queryset(self):
         """Public or self owned shelves."""
-        return super().get_queryset().filter(Q(public=True) | Q(user=self.request.user))
+        return super().get_queryset().visible_to(self.request.user)
 
     def get_permissions(self):
         """Allow authenticated users to list & retrieve (their / public) shelves."""
@@ -83,29 +273,92 @@ class ShelfView(views.ModelViewSet):
         return [permissions() for permissions in permission_classes]
 
 
-class ShelfbookView(views.ModelViewSet):
+class ShelfbookView(ConditionalGetMixin, PrefetchPlanMixin, views.ModelViewSet):
     """Books on shelf."""
 
     queryset = Shelfbook.objects.all()
     serializer_class = ShelfbookSerializer
-    permissions_classes = [permissions.DjangoModelPermissionsOrAnonReadOnly]
+    pagination_class = JsonApiEstimatedCountPagination
     search_fields = ["shelf__name", "book__title"]
     filterset_fields = ["shelf", "book", "shelf__user"]
+    max_operations = 1000
+    # Actions changing a single shelfbook, which only its owner may run.
+    owner_actions = ["update", "partial_update", "destroy"]
 
     def get_queryset(self):
         """Public or self owned shelves."""
-        return (
-            super()
-            .get_queryset()
-            .filter(Q(shelf__public=True) | Q(shelf__user=self.request.user.id))
+        queryset = super().get_queryset().visible_to(self.request.user)
+        if self.action in self.owner_actions:
+            # Fetched with the object so checking ownership needs no query.
+            queryset = queryset.annotate(owner_id=F("shelf__user"))
+        return queryset
+
+    def get_permissions(self):
+        """Only let the owner of the shelf change its shelfbooks."""
+        permission_classes = super().get_permissions()
+        if self.action in self.owner_actions:
+            permission_classes.append(IsObjectOwner())
+        return permission_classes
+
+    @action(
+        methods=["post"],
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated],
+        parser_classes=[PlainJSONParser],
+        renderer_classes=[PrebuiltJSONRenderer],
+    )
+    def operations(self, request):
+        """Add, update and remove shelfbooks in bulk.
+
+        Takes an `atomic:operations` document of the JSON:API atomic operations
+        extension. The operations are applied all together or not at all, and
+        the result of each is returned in `atomic:results`, in order.
+        """
+        data = (
+            request.data.get("atomic:operations")
+            if isinstance(request.data, dict)
+            else None
         )
+        if not isinstance(data, list) or not data:
+            raise ParseError("Expected a list of atomic:operations.")
+        if len(data) > self.max_operations:
+            raise ParseError(f"At most {self.max_operations} operations are allowed.")
+        shelfbooks, errors = ShelfbookOperations(request.user, data).execute()
+        if errors:
+            statuses = {error["status"] for error in errors}
+            error_status = (
+                int(statuses.pop())
+                if len(statuses) == 1
+                else status.HTTP_400_BAD_REQUEST
+            )
+            return Response({"errors": errors}, status=error_status)
+        serializer = self.get_serializer(
+            [shelfbook for shelfbook in shelfbooks if shelfbook is not None], many=True
+        )
+        fields = utils.get_serializer_fields(serializer.child)
+        resources = iter(zip(serializer.data, serializer.instance))
+        results = []
+        for shelfbook in shelfbooks:
+            if shelfbook is None:
+                results.append({})
+                continue
+            resource, instance = next(resources)
+            results.append(
+                {
+                    "data": JSONAPIRenderer.build_json_resource_obj(
+                        fields, resource, instance, ShelfbookOperations.resource_name
+                    )
+                }
+            )
+        return Response({"atomic:results": results})
 
 
-class ReviewView(views.ModelViewSet):
+class ReviewView(ConditionalGetMixin, PrefetchPlanMixin, views.ModelViewSet):
     """Review viewset."""
 
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = JsonApiEstimatedCountPagination
     search_fields = ["book__title", "user__email", "rate"]
     filterset_fields = ["book", "user", "rate"]
 
@@ -120,3 +373,130 @@ class ReviewView(views.ModelViewSet):
         else:
             permission_classes = [IsObjectOwner]
         return [permission() for permission in permission_classes]
+
+
+class LibraryImportView(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """Upload Goodreads CSV exports and poll the progress of their import."""
+
+    queryset = LibraryImport.objects.all()
+    serializer_class = LibraryImportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ["status"]
+
+    def get_queryset(self):
+        """Self owned imports."""
+        return super().get_queryset().filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        """Start importing the file once it is committed."""
+        library_import = serializer.save()
+        transaction.on_commit(lambda: import_library.delay(library_import.pk))
+
+
+class LibraryExportView(viewsets.ViewSet):
+    """Stream the shelves, shelfbooks and reviews of the user.
+
+    Rendered as NDJSON or CSV (`?format=csv`), one flat record per row. Rows
+    are read through server-side cursors and encoded as they are sent, so the
+    memory used does not depend on the size of the library.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    chunk_size = 2000
+    fieldnames = [
+        "type",
+        "id",
+        "name",
+        "public",
+        "shelf",
+        "book",
+        "title",
+        "author",
+        "status",
+        "rate",
+        "content",
+        "created_at",
+    ]
+
+    def get_querysets(self):
+        """Return the resource names and values querysets to export."""
+        user = self.request.user
+        book = {"title": F("book__title"), "author": F("book__author")}
+        return [
+            (
+                Shelf.JSONAPIMeta.resource_name,
+                Shelf.objects.filter(user=user).values("id", "name", "public"),
+            ),
+            (
+                Shelfbook.JSONAPIMeta.resource_name,
+                Shelfbook.objects.filter(shelf__user=user).values(
+                    "id", "shelf", "book", "status", **book
+                ),
+            ),
+            (
+                Review.JSONAPIMeta.resource_name,
+                Review.objects.filter(user=user).values(
+                    "id", "book", "rate", "content", "created_at", **book
+                ),
+            ),
+        ]
+
+    def get_records(self):
+        """Yield the records of every queryset, fetching chunk_size rows at once."""
+        for resource_name, queryset in self.get_querysets():
+            for record in queryset.order_by("pk").iterator(chunk_size=self.chunk_size):
+                yield {"type": resource_name, **record}
+
+    def get_content(self, lines):
+        """Join the lines into chunks of chunk_size lines."""
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) >= self.chunk_size:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+
+    def list(self, request):
+        """Stream the library in the requested format."""
+        renderer = request.accepted_renderer
+        lines = renderer.render_lines(self.get_records(), self.fieldnames)
+        response = StreamingHttpResponse(
+            self.get_content(lines),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        filename = f"library.{renderer.format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        # Stop nginx from buffering the whole export before sending it.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class ChangeView(viewsets.GenericViewSet):
+    """Changes to the shelves, shelfbooks and reviews of the user, for delta sync.
+
+    Clients start from an empty `page[cursor]`, follow `links.next` while it
+    is set, then keep `meta.cursor` to ask for the changes made since. Each
+    changed record is returned once per page, as it is now, with its action in
+    `meta.action`; deleted records are returned as tombstones.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [PrebuiltJSONRenderer]
+    pagination_class = ChangeFeedPagination
+
+    def get_queryset(self):
+        """Return the changes to the user's library."""
+        return get_changes(self.request.user)
+
+    def list(self, request):
+        """Return the next page of changes."""
+        changes = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(get_resources(request, changes))
@@ -6,3 +6,8 @@ class UsersConfig(AppConfig):
     """Config for the users application."""
 
     name = "users"
+
+    def ready(self):
+        """Import signals."""
+        # noqa pylint: disable=unused-import,import-outside-toplevel
+        from users import signals
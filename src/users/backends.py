@@ -0,0 +1,68 @@
+"""Authentication backends resolving permissions from a shared cache."""
+from axes.backends import AxesBackend
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.db import transaction
+
+from webapp.cache import get_version, invalidate
+
+from .authentication import get_cache
+
+PERMISSIONS = "permissions"
+
+
+def get_permissions_key(user) -> str:
+    """Return the cache key of the user's permissions."""
+    version = get_version(PERMISSIONS, get_cache())
+    return f"permissions:{version}:{user.pk}"
+
+
+def invalidate_permissions():
+    """Stop using the cached permissions of every user."""
+    invalidate(PERMISSIONS, get_cache())
+
+
+def forget_permissions(user):
+    """Stop using the cached permissions of the user.
+
+    The entry is dropped straight away, and again once the transaction
+    commits to drop copies cached by concurrent requests from the old rows.
+    """
+
+    def forget():
+        get_cache().delete(get_permissions_key(user))
+
+    forget()
+    transaction.on_commit(forget)
+
+
+class CachedPermissionsMixin:
+    """Resolve the full permission set of users once for every backend.
+
+    The set computed by ModelBackend is kept in settings.AUTH_CACHE, under
+    the version of PERMISSIONS, and on the user like ModelBackend does, so
+    every backend and request shares it. Changes to a user drop their entry,
+    changes to groups or permissions bump the version (see users.signals).
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        """Return the permissions of the user, from the cache when possible."""
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, "_perm_cache"):
+            cache = get_cache()
+            key = get_permissions_key(user_obj)
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(key, permissions, settings.AUTH_CACHE_TIMEOUT)
+            user_obj._perm_cache = permissions  # pylint: disable=protected-access
+        return user_obj._perm_cache  # pylint: disable=protected-access
+
+
+class CachedAxesBackend(CachedPermissionsMixin, AxesBackend):
+    """Axes lockout backend with cached permissions."""
+
+
+class CachedModelBackend(CachedPermissionsMixin, ModelBackend):
+    """Model backend with cached permissions."""
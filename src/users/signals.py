@@ -0,0 +1,47 @@
+"""Signals of the users app."""
+# pylint: disable=unused-argument
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, forget_user
+from .backends import forget_permissions, invalidate_permissions
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def forget_saved_user(sender, instance, update_fields=None, **kwargs):
+    """Stop authenticating the user from a copy cached before the save."""
+    # Logging in only updates last_login, and must keep the token it returns.
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    forget_user(instance)
+    forget_permissions(instance)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop authenticating the deleted token."""
+    forget_token(instance.key)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def forget_user_permissions(sender, instance, action, **kwargs):
+    """Stop using the cached permissions of users whose groups changed."""
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, User):
+        forget_permissions(instance)
+    else:
+        invalidate_permissions()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=Permission)
+def invalidate_group_permissions(sender, **kwargs):
+    """Stop using the cached permissions of every user."""
+    if kwargs.get("action", "post_").startswith("post_"):
+        invalidate_permissions()
@@ -0,0 +1,82 @@
+"""Tests for the cached token authentication."""
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from users.authentication import CachedTokenAuthentication, get_cache
+from users.tests import factories
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test authenticating with cached tokens."""
+
+    path = "/sessions/"
+
+    def setUp(self):
+        """Authenticate with the token of a new user."""
+        super().setUp()
+        self.user = factories.UserFactory(password="hellopass123")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(  # pylint: disable=no-member
+            HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        self.addCleanup(
+            get_cache().delete_many,
+            [f"token:{self.token.key}", f"user:{self.user.pk}"],
+        )
+
+    def test_cached(self):
+        """Tokens are looked up once, then authenticated without a query."""
+        self.get(self.path, asserted_status=status.HTTP_200_OK, query_budget=1)
+        response = self.get(
+            self.path, asserted_status=status.HTTP_200_OK, query_budget=0
+        )
+        self.assertEqual(
+            response.json()["data"][0]["relationships"]["user"]["data"]["id"],
+            str(self.user.pk),
+        )
+
+    def test_cached_fields(self):
+        """Password hashes are not cached, they are loaded when accessed."""
+        self.get(self.path, asserted_status=status.HTTP_200_OK)
+        fields = get_cache().get(f"token:{self.token.key}")
+        self.assertNotIn(self.user.password, fields.values())
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertEqual(user.email, self.user.email)
+        self.assertIn("password", user.get_deferred_fields())
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password("hellopass123"))
+
+    def test_logout(self):
+        """Tokens stop working as soon as the session is deleted."""
+        self.get(self.path, asserted_status=status.HTTP_200_OK)
+        self.delete(self.path, asserted_status=status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.get(self.path, asserted_status=status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated(self):
+        """Deactivated users are rejected straight away."""
+        self.get(self.path, asserted_status=status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.get(self.path, asserted_status=status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change(self):
+        """Changing the password drops the cached user."""
+        self.get(self.path, asserted_status=status.HTTP_200_OK)
+        self.assertIsNotNone(get_cache().get(f"token:{self.token.key}"))
+        self.patch(
+            f"/users/{self.user.pk}/",
+            data={
+                "data": {
+                    "type": "users",
+                    "id": str(self.user.pk),
+                    "attributes": {
+                        "password": "newpass12345",
+                        "current_password": "hellopass123",
+                    },
+                }
+            },
+            asserted_status=status.HTTP_200_OK,
+        )
+        self.assertIsNone(get_cache().get(f"token:{self.token.key}"))
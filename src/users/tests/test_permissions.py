@@ -0,0 +1,63 @@
+"""Tests for the cached permission backends."""
+from django.contrib.auth.models import Group, Permission
+
+from users.authentication import get_cache
+from users.backends import get_permissions_key
+from users.models import User
+from users.tests import factories
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test resolving permissions from the cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an editor group."""
+        super().setUpTestData()
+        cls.group = Group.objects.create(name="editors")
+        cls.permission = Permission.objects.get(codename="change_user")
+        cls.group.permissions.add(cls.permission)
+        cls.user = factories.UserFactory()
+
+    def fresh(self, user):
+        """Return the user as loaded by a new request."""
+        return User.objects.get(pk=user.pk)
+
+    def test_cached(self):
+        """Permissions are resolved once and shared across requests."""
+        self.user.groups.add(self.group)
+        user = self.fresh(self.user)
+        self.assertTrue(user.has_perm("users.change_user"))
+        user = self.fresh(self.user)
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm("users.change_user"))
+            self.assertFalse(user.has_perm("users.add_user"))
+        self.assertEqual(
+            get_cache().get(get_permissions_key(user)), {"users.change_user"}
+        )
+
+    def test_user_changes(self):
+        """Changing the groups or permissions of a user drops their entry."""
+        self.assertFalse(self.fresh(self.user).has_perm("users.change_user"))
+        self.user.groups.add(self.group)
+        self.assertTrue(self.fresh(self.user).has_perm("users.change_user"))
+        self.user.groups.remove(self.group)
+        self.assertFalse(self.fresh(self.user).has_perm("users.change_user"))
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.fresh(self.user).has_perm("users.change_user"))
+        user = self.fresh(self.user)
+        user.is_active = False
+        user.save()
+        self.assertFalse(self.fresh(self.user).has_perm("users.change_user"))
+
+    def test_group_changes(self):
+        """Changing a group drops the entries of every user."""
+        self.user.groups.add(self.group)
+        self.assertTrue(self.fresh(self.user).has_perm("users.change_user"))
+        self.group.permissions.remove(self.permission)
+        self.assertFalse(self.fresh(self.user).has_perm("users.change_user"))
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.fresh(self.user).has_perm("users.change_user"))
+        self.group.user_set.remove(self.user)
+        self.assertFalse(self.fresh(self.user).has_perm("users.change_user"))
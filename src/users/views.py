@@ -14,6 +14,7 @@ from rest_framework_json_api.views import (
     RelatedMixin,
 )
 
+from users.authentication import forget_token
 from users.models import User
 from users.serializers import SessionSerializer, UserSerializer
 
@@ -42,6 +43,8 @@ class SessionView(ViewSetMixin, auth_views.LoginView):
     def delete(self, request, *args, **kwargs):
         """Logout on delete."""
         self.check_authentication(request)
+        if request.auth is not None:
+            forget_token(request.auth.key)
         auth_views.LogoutView().logout(request)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -15,10 +15,14 @@ routes: List[Tuple[str, ViewSetMixin]] = [
     ("password-resets", user_views.PasswordResetView),
     ("password-reset-confirmations", user_views.PasswordResetConfirmView),
     ("books", better_reads_views.BookView),
+    ("book-suggestions", better_reads_views.BookSuggestionView),
     ("categories", better_reads_views.CategoryView),
     ("shelves", better_reads_views.ShelfView),
     ("shelfbooks", better_reads_views.ShelfbookView),
     ("reviews", better_reads_views.ReviewView),
+    ("library-imports", better_reads_views.LibraryImportView),
+    ("library-exports", better_reads_views.LibraryExportView),
+    ("changes", better_reads_views.ChangeView),
 ]
 
 v1_router = DefaultRouter()
@@ -0,0 +1,155 @@
+"""Shared cache of rendered API responses for anonymous reads."""
+from hashlib import sha1
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+from rest_framework import status
+
+
+def get_cache():
+    """Return the cache holding API responses."""
+    return caches[settings.API_CACHE]
+
+
+def increment(key: str, cache=None) -> int:
+    """Increment the counter at key, starting it at 0 when missing."""
+    cache = cache or get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_version(namespace: str, cache=None) -> int:
+    """Return the current version of the namespace's entries."""
+    cache = cache or get_cache()
+    version = cache.get(f"version:{namespace}")
+    if version is None:
+        cache.add(f"version:{namespace}", 1, timeout=None)
+        version = cache.get(f"version:{namespace}")
+    return version
+
+
+def get_versions(namespaces: List[str], cache=None) -> List[int]:
+    """Return the current versions of the namespaces, with one query."""
+    cache = cache or get_cache()
+    versions = cache.get_many([f"version:{namespace}" for namespace in namespaces])
+    return [
+        versions.get(f"version:{namespace}") or get_version(namespace, cache)
+        for namespace in namespaces
+    ]
+
+
+def invalidate(namespace: str, cache=None):
+    """Stop serving every cached entry of the namespace.
+
+    The version is bumped straight away, and again once the transaction
+    commits to drop entries cached from concurrent reads of the old rows.
+    """
+    increment(f"version:{namespace}", cache)
+    transaction.on_commit(lambda: increment(f"version:{namespace}", cache))
+
+
+def get_stats(namespace: str) -> Dict[str, int]:
+    """Return the hit and miss counters of the namespace."""
+    cache = get_cache()
+    names = ["hits", "misses"]
+    counters = cache.get_many([f"{name}:{namespace}" for name in names])
+    return {name: counters.get(f"{name}:{namespace}", 0) for name in names}
+
+
+class ResponseCacheMixin:
+    """Cache the rendered list and retrieve responses of anonymous users.
+
+    Responses are keyed on the path, the sorted query string and the Accept
+    header, stamped with the version of `response_cache_namespace` and of any
+    other namespace from get_response_cache_namespaces(). Saving or deleting
+    a model of a namespace bumps its version (see better_reads.signals), so
+    entries are never served stale and simply expire after
+    get_response_cache_timeout() seconds. Each lookup counts a hit or miss.
+    The validators of cached responses are kept, so hits answer conditional
+    requests too.
+    """
+
+    response_cache_namespace: str = ""
+    response_cache_actions = ["list", "retrieve"]
+    response_cache_headers = ["ETag", "Last-Modified"]
+
+    def get_response_cache_key(self, request) -> str:
+        """Return the cache key of the request's response."""
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        accept = request.META.get("HTTP_ACCEPT", "")
+        digest = sha1(f"{request.path}?{query}\n{accept}".encode()).hexdigest()
+        versions = get_versions(self.get_response_cache_namespaces(request))
+        version = ".".join(str(version) for version in versions)
+        return f"response:{self.response_cache_namespace}:{version}:{digest}"
+
+    def get_response_cache_namespaces(self, request) -> List[str]:
+        """Return the namespaces whose changes invalidate the response."""
+        return [self.response_cache_namespace]
+
+    def get_response_cache_timeout(self, request) -> int:
+        """Return the seconds the response is cached for."""
+        return settings.API_CACHE_TIMEOUT
+
+    def is_response_cacheable(self, request) -> bool:
+        """Return whether the response may be shared with other users."""
+        return (
+            request.method == "GET"
+            and self.action in self.response_cache_actions
+            and not request.user.is_authenticated
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """Return the cached response of the request, or cache the handler's."""
+        if not self.is_response_cacheable(request):
+            return handler(request, *args, **kwargs)
+        cache = get_cache()
+        key = self.get_response_cache_key(request)
+        timeout = self.get_response_cache_timeout(request)
+        cached = cache.get(key)
+        if cached is not None:
+            increment(f"hits:{self.response_cache_namespace}")
+            content, content_type, headers = cached
+            response = HttpResponse(content, content_type=content_type)
+            for header, value in headers.items():
+                response[header] = value
+            response = get_conditional_response(
+                request,
+                etag=headers.get("ETag"),
+                last_modified=parse_http_date_safe(headers.get("Last-Modified")),
+                response=response,
+            )
+            response["X-Cache"] = "HIT"
+            return response
+        increment(f"misses:{self.response_cache_namespace}")
+        response = handler(request, *args, **kwargs)
+        response["X-Cache"] = "MISS"
+        if response.status_code == status.HTTP_200_OK:
+
+            def store(rendered):
+                headers = {
+                    header: rendered[header]
+                    for header in self.response_cache_headers
+                    if rendered.has_header(header)
+                }
+                cache.set(
+                    key, (rendered.content, rendered["Content-Type"], headers), timeout,
+                )
+
+            response.add_post_render_callback(store)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """List the objects, from the cache when possible."""
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve the object, from the cache when possible."""
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,174 @@
+"""Conditional GET support for JSON:API list and retrieve requests."""
+from calendar import timegm
+from hashlib import sha1
+from typing import Optional, Tuple
+
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db.models import BigIntegerField, Count, Max, Sum
+from django.db.models.functions import Cast, Extract
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework_json_api.utils import get_included_resources
+
+from .pagination import JsonApiCursorPagination
+from .prefetch import get_included_lookups
+
+
+class ConditionalGetMixin:
+    """Answer unchanged list and retrieve requests with 304 Not Modified.
+
+    The validators only cover the rows served: the requested page, or the
+    retrieved object. They are computed with one aggregate query over those
+    rows, the size of a page however large the collection: the row count,
+    the sums of the primary keys and `updated_at` timestamps, and the latest
+    `updated_at` of the rows and of their included resources. They are hashed
+    with a fingerprint of the query and the Accept header into a weak ETag,
+    while the latest `updated_at` is sent as Last-Modified.
+
+    Requests with If-None-Match or If-Modified-Since are validated before the
+    page is fetched or rendered; other responses carry the validators for
+    the next request. Cursor pages are left out. Rows added or removed after
+    a page leave it current, so its pagination meta may lag behind.
+    """
+
+    conditional_actions = ["list", "retrieve"]
+    updated_at_field = "updated_at"
+
+    def is_conditional(self, request) -> bool:
+        """Return whether the response carries validators."""
+        return (
+            request.method in ("GET", "HEAD")
+            and self.action in self.conditional_actions
+            and JsonApiCursorPagination.cursor_query_param not in request.query_params
+        )
+
+    def has_validators(self, request) -> bool:
+        """Return whether the client sent validators of its copy."""
+        return any(
+            header in request.META
+            for header in ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+        )
+
+    def get_page_number(self, request) -> Optional[int]:
+        """Return the requested page number, None when it needs a count."""
+        if self.paginator is None:
+            return 1
+        number = request.query_params.get(self.paginator.page_query_param, 1)
+        try:
+            return max(int(number), 1)
+        except (TypeError, ValueError):
+            return None
+
+    def get_conditional_queryset(self, page_number: int):
+        """Return the queryset of the rows making up the response."""
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == "retrieve":
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        elif self.paginator is not None:
+            page_size = self.paginator.get_page_size(self.request)
+            bottom = (page_number - 1) * page_size
+            queryset = queryset.model._default_manager.filter(
+                pk__in=queryset.values("pk")[bottom : bottom + page_size]
+            )
+        return queryset.select_related(None).prefetch_related(None).order_by()
+
+    def get_validators(
+        self, request, page_number: int
+    ) -> Tuple[Optional[str], Optional[int]]:
+        """Return the ETag and Last-Modified timestamp of the response."""
+        queryset = self.get_conditional_queryset(page_number)
+        field = self.updated_at_field
+        aggregates = {
+            "count": Count("pk"),
+            "ids": Sum("pk"),
+            "timestamps": Sum(
+                Cast(Extract(field, "epoch") * 1000000, BigIntegerField())
+            ),
+            "latest": Max(field),
+        }
+        serializer_class = self.get_serializer_class()
+        include_paths = get_included_resources(request, serializer_class)
+        for index, (lookup, model) in enumerate(
+            get_included_lookups(serializer_class, include_paths)
+        ):
+            try:
+                model._meta.get_field(field)
+            except FieldDoesNotExist:
+                continue
+            aggregates[f"included_{index}"] = Max(f"{lookup}__{field}")
+        values = queryset.aggregate(**aggregates)
+        if self.action == "retrieve" and not values["count"]:
+            return None, None
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            sql = ""
+        fingerprint = "\n".join(
+            [
+                sql,
+                request.get_full_path(),
+                request.META.get("HTTP_ACCEPT", ""),
+                repr(sorted(values.items())),
+            ]
+        )
+        etag = f'W/"{sha1(fingerprint.encode()).hexdigest()}"'
+        latest = [
+            value
+            for name, value in values.items()
+            if (name == "latest" or name.startswith("included_")) and value
+        ]
+        last_modified = timegm(max(latest).utctimetuple()) if latest else None
+        return etag, last_modified
+
+    def get_validated_response(self, handler, request, *args, **kwargs):
+        """Return 304 when the client's copy is current, else the handler's."""
+        if not self.is_conditional(request):
+            return handler(request, *args, **kwargs)
+        page_number = self.get_page_number(request)
+        validators = None
+        if self.has_validators(request) and page_number is not None:
+            validators = self.get_validators(request, page_number)
+            etag, last_modified = validators
+            if etag is None:
+                return handler(request, *args, **kwargs)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return self.set_validators(response, etag, last_modified)
+        response = handler(request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        if validators is None:
+            # Pages asked for as "last" are only numbered once served.
+            page = getattr(self.paginator, "page", None)
+            validators = self.get_validators(
+                request, page.number if page is not None else page_number or 1
+            )
+            if self.has_validators(request):
+                not_modified = get_conditional_response(
+                    request, etag=validators[0], last_modified=validators[1]
+                )
+                if not_modified is not None:
+                    response = not_modified
+        return self.set_validators(response, *validators)
+
+    def set_validators(self, response, etag, last_modified):
+        """Send the validators with the response."""
+        if etag is not None:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """List the objects unless the client's copy is current."""
+        return self.get_validated_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve the object unless the client's copy is current."""
+        return self.get_validated_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,50 @@
+"""Project-wide filter backends."""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
+from rest_framework import filters
+
+# The "simple" configuration neither stems nor drops stop words, so a prefix
+# typed by the user always matches the words it is a prefix of.
+SEARCH_CONFIG = "simple"
+
+
+class SearchFilter(filters.SearchFilter):
+    """Search a full-text search vector when the view declares one.
+
+    Views with a `search_vector_field` are searched through that (GIN indexed)
+    tsvector column, matching every term as a prefix and ordering the results
+    by rank unless another ordering was requested. Other views fall back to the
+    `search_fields` lookups of rest_framework's SearchFilter.
+    """
+
+    def get_search_query(self, request):
+        """Return a tsquery matching every word of the search terms as a prefix."""
+        words = [
+            word
+            for term in self.get_search_terms(request)
+            for word in re.findall(r"\w+", term)
+        ]
+        if not words:
+            return None
+        raw_query = " & ".join(f"{word}:*" for word in words)
+        return SearchQuery(raw_query, config=SEARCH_CONFIG, search_type="raw")
+
+    def filter_queryset(self, request, queryset, view):
+        """Filter and rank the queryset using the view's search vector."""
+        search_vector_field = getattr(view, "search_vector_field", None)
+        if search_vector_field is None:
+            return super().filter_queryset(request, queryset, view)
+        if not self.get_search_terms(request):
+            return queryset
+        query = self.get_search_query(request)
+        if query is None:
+            return queryset.none()
+        queryset = queryset.filter(**{search_vector_field: query})
+        if not queryset.query.order_by:
+            rank = SearchRank(F(search_vector_field), query)
+            queryset = queryset.annotate(search_rank=rank).order_by(
+                "-search_rank", "pk"
+            )
+        return queryset
@@ -0,0 +1,29 @@
+"""Management command to show the hit and miss counters of the response cache."""
+from django.core.management.base import BaseCommand
+
+from webapp.api import routes
+from webapp.cache import get_stats
+
+
+class Command(BaseCommand):
+    """Management command to show the hit and miss counters of the response cache."""
+
+    help = "Show the hits and misses of each namespace of the API response cache."
+
+    def handle(self, *args, **options):
+        """Run the management command."""
+        namespaces = sorted(
+            {
+                viewset.response_cache_namespace
+                for _, viewset in routes
+                if getattr(viewset, "response_cache_namespace", "")
+            }
+        )
+        for namespace in namespaces:
+            stats = get_stats(namespace)
+            lookups = stats["hits"] + stats["misses"]
+            ratio = stats["hits"] / lookups if lookups else 0
+            self.stdout.write(
+                f"{namespace}: {stats['hits']} hits, {stats['misses']} misses "
+                f"({ratio:.0%} hit rate)"
+            )
@@ -1,8 +1,339 @@
 """Project-wide pagination classes."""
+import datetime
+import json
+import operator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from functools import reduce
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import FileField, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from rest_framework_json_api import pagination
 
 
+def get_estimated_count(queryset):
+    """Return the estimated rows of an unfiltered queryset, from table statistics.
+
+    Return None for filtered querysets, whose plan estimates may be far off,
+    and for tables which have never been analysed.
+    """
+    if not isinstance(queryset, QuerySet):
+        return None
+    query = queryset.query
+    if query.where or query.distinct or not query.can_filter():
+        return None
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        estimate = cursor.fetchone()[0]
+    # reltuples is -1 (or 0 before postgres 14) until the table is analysed.
+    return int(estimate) if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Avoid counting every row of large collections.
+
+    Unfiltered collections are estimated from the table statistics, filtered
+    ones are counted up to `threshold` rows. Collections estimated at fewer
+    rows are counted exactly, while those over it report the estimate, or
+    `threshold` for filtered ones, as an estimated count. Since that may be
+    too low, page numbers past the estimated last page are served (possibly
+    empty) instead of raising EmptyPage.
+    """
+
+    threshold = 100000
+
+    def __init__(self, *args, **kwargs):
+        """Mark the count as exact until it has been estimated."""
+        super().__init__(*args, **kwargs)
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        """Return the estimated count, or the exact one below the threshold."""
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        estimate = get_estimated_count(self.object_list)
+        if estimate is None:
+            # Stop counting past the threshold.
+            estimate = self.object_list.order_by()[: self.threshold + 1].count()
+            if estimate <= self.threshold:
+                return estimate
+            estimate = self.threshold
+        elif estimate < self.threshold:
+            return super().count
+        self.estimated = True
+        return estimate
+
+    def validate_number(self, number):
+        """Allow page numbers past the estimated last page."""
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.estimated or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        """Do not clamp the last page to an estimated count."""
+        if not self.count or not self.estimated:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom : bottom + self.per_page], number, self
+        )
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """JSON encoder keeping the microseconds of datetimes and times.
+
+    DjangoJSONEncoder truncates them to milliseconds, so cursors of rows
+    written in the same millisecond would land before some of them.
+    """
+
+    def default(self, o):
+        """Return times in ISO format with their microseconds."""
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class JsonApiCursorPagination(BasePagination):
+    """Keyset pagination over the queryset's ordering and primary key.
+
+    Each page is fetched with a `WHERE (ordering..., pk) > position` condition
+    and a LIMIT, so no OFFSET or COUNT(*) is run however deep clients page.
+    The position is handed to clients as an opaque `page[cursor]` in
+    `links.next` and `links.prev`; an empty `page[cursor]` starts at the top.
+    Ordering fields must be non-null columns, other than relations and files.
+    """
+
+    cursor_query_param = "page[cursor]"
+    page_size_query_param = "page[size]"
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 10000
+    # Used when the queryset is not ordered.
+    ordering = ["pk"]
+    invalid_cursor_message = "Invalid cursor."
+    invalid_ordering_message = "Cannot page by cursor when sorted by {}."
+
+    def __init__(self):
+        """Set the state of the current page."""
+        self.request = None
+        self.fields = []
+        self.model_fields = []
+        self.results = []
+        self.has_next = False
+        self.has_previous = False
+
+    def get_page_size(self, request):
+        """Return the requested page size, capped to max_page_size."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_model_field(self, model, name):
+        """Return the model field of an ordering, rejecting unusable ones.
+
+        Positions are compared to plain, non-null column values, so relations,
+        files and nullable fields cannot be paged through by cursor.
+        """
+        if name == "pk":
+            return model._meta.pk
+        field = None
+        for part in name.split("__"):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                field = None
+                break
+            model = field.related_model
+        if (
+            field is None
+            or not field.concrete
+            or field.is_relation
+            or field.null
+            or isinstance(field, FileField)
+        ):
+            raise ValidationError(self.invalid_ordering_message.format(name))
+        return field
+
+    def get_fields(self, queryset):
+        """Return the ordering of the queryset with the pk as a tie-breaker."""
+        ordering = list(queryset.query.order_by) or list(
+            queryset.model._meta.ordering or self.ordering
+        )
+        if not all(isinstance(field, str) for field in ordering):
+            raise ImproperlyConfigured(
+                f"{self.__class__.__name__} only supports ordering by field names."
+            )
+        pk_name = queryset.model._meta.pk.name
+        ordering = [
+            field.replace(pk_name, "pk") if field.lstrip("-") == pk_name else field
+            for field in ordering
+        ]
+        if "pk" not in [field.lstrip("-") for field in ordering]:
+            # Matching the direction keeps (field, pk) scannable by one index.
+            ordering.append("-pk" if ordering and ordering[-1][0] == "-" else "pk")
+        self.model_fields = [
+            self.get_model_field(queryset.model, field.lstrip("-"))
+            for field in ordering
+        ]
+        return ordering
+
+    def encode_cursor(self, instance, reverse):
+        """Return an opaque cursor positioned at the given instance."""
+        position = []
+        for field, model_field in zip(self.fields, self.model_fields):
+            value = instance
+            for attr in field.lstrip("-").split("__")[:-1]:
+                value = getattr(value, attr)
+            position.append(model_field.value_from_object(value))
+        cursor = json.dumps({"p": position, "r": reverse}, cls=CursorEncoder)
+        return urlsafe_b64encode(cursor.encode()).decode()
+
+    def decode_cursor(self, request):
+        """Return the (position, reverse) of the requested cursor, if any."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = list(cursor["p"]), bool(cursor["r"])
+            if len(position) != len(self.fields) or None in position:
+                raise ValueError
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.model_fields, position)
+            ]
+        except (BinasciiError, DjangoValidationError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def get_keyset_filter(fields, position):
+        """Return the condition for rows after position in the fields' ordering."""
+        conditions = []
+        for index, field in enumerate(fields):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {fields[j].lstrip("-"): position[j] for j in range(index)}
+            conditions.append(Q(**equal, **{f"{name}__{lookup}": position[index]}))
+        # The redundant bound on the first field lets an index range scan start
+        # at the cursor instead of filtering every row.
+        first = fields[0].lstrip("-")
+        bound = "lte" if fields[0].startswith("-") else "gte"
+        return Q(**{f"{first}__{bound}": position[0]}) & reduce(
+            operator.or_, conditions
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return the page after (or before) the requested cursor."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_fields(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[1]
+        fields = self.fields
+        if reverse:
+            fields = [
+                field[1:] if field.startswith("-") else f"-{field}" for field in fields
+            ]
+        if cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(fields, cursor[0]))
+        results = list(queryset.order_by(*fields)[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.results = results[: self.page_size]
+        if reverse:
+            self.results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        return self.results
+
+    def build_link(self, cursor):
+        """Return the url of the current request pointing at the cursor."""
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        """Return the page with links to its neighbours."""
+        next_link = previous_link = None
+        if self.results and self.has_next:
+            next_link = self.build_link(self.encode_cursor(self.results[-1], False))
+        if self.results and self.has_previous:
+            previous_link = self.build_link(self.encode_cursor(self.results[0], True))
+        return Response(
+            {
+                "results": data,
+                "meta": {"pagination": OrderedDict([("size", self.page_size)])},
+                "links": OrderedDict(
+                    [
+                        ("first", self.build_link("")),
+                        ("last", None),
+                        ("next", next_link),
+                        ("prev", previous_link),
+                    ]
+                ),
+            }
+        )
+
+
 class JsonApiPageNumberPagination(pagination.JsonApiPageNumberPagination):
-    """Increase the max page size."""
+    """Increase the max page size and switch to cursors on `page[cursor]`."""
 
     max_page_size = 10000
+    cursor_pagination_class = JsonApiCursorPagination
+
+    def __init__(self):
+        """Set the cursor paginator used for this request, if any."""
+        self.cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate by cursor when requested, by page number otherwise."""
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        """Return the response of whichever pagination was used."""
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class JsonApiEstimatedCountPagination(JsonApiPageNumberPagination):
+    """Report estimated counts for collections too large to count per page.
+
+    `meta.pagination.estimated` tells clients whether the count is exact.
+    Subclass EstimatedCountPaginator to change the threshold.
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        """Mark whether the count in the pagination meta is estimated."""
+        response = super().get_paginated_response(data)
+        if self.cursor_paginator is None:
+            paginator = self.page.paginator
+            response.data["meta"]["pagination"]["estimated"] = paginator.estimated
+        return response
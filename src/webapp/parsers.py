@@ -0,0 +1,12 @@
+"""Project-wide parsers."""
+from rest_framework import parsers
+
+
+class PlainJSONParser(parsers.JSONParser):
+    """Parse JSON:API documents without unwrapping their primary data.
+
+    Extensions such as atomic operations send documents without a top-level
+    `data` member, which rest_framework_json_api's parser requires.
+    """
+
+    media_type = "application/vnd.api+json"
@@ -0,0 +1,288 @@
+"""Plan select_related/prefetch_related/only calls for JSON:API requests."""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple, Type
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, Prefetch
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import Serializer
+from rest_framework_json_api.utils import (
+    get_included_resources,
+    get_included_serializers,
+    get_resource_type_from_serializer,
+)
+
+IncludeTree = Dict[str, "IncludeTree"]  # type: ignore
+# Sparse fieldsets by resource type.
+Fieldsets = Dict[str, List[str]]
+
+FIELDSET_PARAM = re.compile(r"^fields\[(?P<type>[^\]]+)\]$")
+
+
+@lru_cache(maxsize=None)
+def get_relationships(
+    serializer_class: Type[Serializer],
+) -> Tuple[Tuple[str, str], ...]:
+    """Return the (field name, model field name) pairs of relationship fields."""
+    relationships = []
+    for name, field in serializer_class().fields.items():
+        if not isinstance(field, (RelatedField, ManyRelatedField)):
+            continue
+        if field.source == "*" or "." in field.source:
+            continue
+        relationships.append((name, field.source))
+    return tuple(relationships)
+
+
+@lru_cache(maxsize=None)
+def get_field_sources(
+    serializer_class: Type[Serializer],
+) -> Tuple[Tuple[str, Optional[Tuple[str, ...]]], ...]:
+    """Return the (field name, model field names) each rendered field reads.
+
+    To-many relationships read no column of the model, and fields which are
+    not read from a single concrete model field have None.
+    """
+    model = serializer_class.Meta.model
+    sources = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            sources.append((name, None))
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            sources.append((name, ()))
+        elif model_field.concrete:
+            sources.append((name, (model_field.name,)))
+        else:
+            sources.append((name, None))
+    return tuple(sources)
+
+
+def get_fieldsets(request) -> Fieldsets:
+    """Return the sparse fieldsets of the request, by resource type."""
+    fieldsets = {}
+    for key, value in request.query_params.items():
+        match = FIELDSET_PARAM.match(key)
+        if match:
+            fieldsets[match.group("type")] = value.split(",")
+    return fieldsets
+
+
+def get_loaded_fields(
+    serializer_class: Type[Serializer], tree: IncludeTree, fieldsets: Fieldsets
+) -> List[str]:
+    """Return the model fields to load to render a resource in its fieldset.
+
+    The primary key and the foreign keys of included to-one relationships are
+    always loaded. Resources without a fieldset, or with a field which is not
+    read from a concrete model field, have every concrete field loaded.
+    """
+    model = serializer_class.Meta.model
+    concrete = [field.name for field in model._meta.concrete_fields]
+    fieldset = fieldsets.get(get_resource_type_from_serializer(serializer_class))
+    if fieldset is None:
+        return concrete
+    names = {model._meta.pk.name}
+    for name, sources in get_field_sources(serializer_class):
+        if name not in fieldset:
+            continue
+        if sources is None:
+            return concrete
+        names.update(sources)
+    for name, source in get_relationships(serializer_class):
+        if name in tree:
+            names.add(source)
+    return [name for name in concrete if name in names]
+
+
+def get_include_tree(include_paths: List[str]) -> IncludeTree:
+    """Turn dotted include paths into a nested dict."""
+    tree: IncludeTree = {}
+    for path in include_paths:
+        node = tree
+        for name in path.split("."):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def plan(
+    serializer_class: Type[Serializer],
+    include_paths: List[str],
+    fieldsets: Optional[Fieldsets] = None,
+) -> Tuple[List[str], List[Prefetch]]:
+    """Return the select_related and prefetch_related lookups for a request.
+
+    Forward to-one relationships are joined with select_related until a
+    to-many relationship is crossed, after which everything is prefetched.
+    To-many relationships which are rendered but not included only have
+    their primary keys fetched, and prefetched included resources only the
+    fields of their sparse fieldset.
+    """
+    select: Set[str] = set()
+    prefetch: Dict[str, Prefetch] = {}
+    _plan(
+        serializer_class,
+        get_include_tree(include_paths),
+        prefix="",
+        through_many=False,
+        select=select,
+        prefetch=prefetch,
+        fieldsets=fieldsets,
+    )
+    return sorted(select), [prefetch[lookup] for lookup in sorted(prefetch)]
+
+
+def _plan(
+    serializer_class, tree, *, prefix, through_many, select, prefetch, fieldsets
+):  # pylint: disable=too-many-arguments
+    model = serializer_class.Meta.model
+    included_serializers = get_included_serializers(serializer_class)
+    for name, source in get_relationships(serializer_class):
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        lookup = f"{prefix}{source}"
+        to_many = model_field.many_to_many or model_field.one_to_many
+        if name in tree and name in included_serializers:
+            nested_through_many = through_many or to_many
+            if nested_through_many:
+                prefetch[lookup] = get_included_prefetch(
+                    lookup,
+                    model_field,
+                    included_serializers[name],
+                    tree[name],
+                    fieldsets,
+                )
+            else:
+                select.add(lookup)
+            _plan(
+                included_serializers[name],
+                tree[name],
+                prefix=f"{lookup}__",
+                through_many=nested_through_many,
+                select=select,
+                prefetch=prefetch,
+                fieldsets=fieldsets,
+            )
+        elif to_many:
+            related_model = model_field.related_model
+            queryset = related_model._default_manager.only(related_model._meta.pk.name)
+            prefetch[lookup] = Prefetch(lookup, queryset=queryset)
+
+
+def get_included_prefetch(
+    lookup, model_field, serializer_class, tree, fieldsets
+) -> Prefetch:  # pylint: disable=too-many-arguments
+    """Return the prefetch of included resources, restricted to their fieldset."""
+    if not fieldsets:
+        return Prefetch(lookup)
+    fields = get_loaded_fields(serializer_class, tree, fieldsets)
+    if model_field.one_to_many:
+        # Prefetched rows are matched to their parent by the foreign key.
+        fields.append(model_field.field.name)
+    queryset = model_field.related_model._default_manager.only(*fields)
+    return Prefetch(lookup, queryset=queryset)
+
+
+def get_only(
+    serializer_class: Type[Serializer], include_paths: List[str], fieldsets: Fieldsets
+) -> List[str]:
+    """Return the fields to load with only() for the sparse fieldsets.
+
+    Covers the primary resources and the included ones joined to them, so
+    columns such as descriptions and review contents are left in the
+    database when the client did not ask for them.
+    """
+    only: List[str] = []
+    _only(serializer_class, get_include_tree(include_paths), "", fieldsets, only=only)
+    return only
+
+
+def _only(serializer_class, tree, prefix, fieldsets, *, only):
+    only.extend(
+        f"{prefix}{name}"
+        for name in get_loaded_fields(serializer_class, tree, fieldsets)
+    )
+    model = serializer_class.Meta.model
+    included_serializers = get_included_serializers(serializer_class)
+    for name, source in get_relationships(serializer_class):
+        if name not in tree or name not in included_serializers:
+            continue
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            continue
+        _only(
+            included_serializers[name],
+            tree[name],
+            f"{prefix}{source}__",
+            fieldsets,
+            only=only,
+        )
+
+
+def get_included_lookups(
+    serializer_class: Type[Serializer], include_paths: List[str]
+) -> List[Tuple[str, Type[Model]]]:
+    """Return the ORM lookups and models of the included relationships."""
+    lookups: List[Tuple[str, Type[Model]]] = []
+    _included_lookups(
+        serializer_class, get_include_tree(include_paths), "", lookups=lookups
+    )
+    return lookups
+
+
+def _included_lookups(serializer_class, tree, prefix, *, lookups):
+    model = serializer_class.Meta.model
+    included_serializers = get_included_serializers(serializer_class)
+    for name, source in get_relationships(serializer_class):
+        if name not in tree or name not in included_serializers:
+            continue
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        lookup = f"{prefix}{source}"
+        lookups.append((lookup, model_field.related_model))
+        _included_lookups(
+            included_serializers[name], tree[name], f"{lookup}__", lookups=lookups
+        )
+
+
+class PrefetchPlanMixin:
+    """Select and prefetch everything the serializer renders for the request.
+
+    On list and retrieve requests with sparse fieldsets, only the columns of
+    the requested fields are loaded.
+    """
+
+    sparse_fieldset_actions = ["list", "retrieve"]
+
+    def get_queryset(self, *args, **kwargs):
+        """Apply the planned select_related/prefetch_related/only lookups."""
+        queryset = super().get_queryset(*args, **kwargs)
+        serializer_class = self.get_serializer_class()
+        include_paths = get_included_resources(self.request, serializer_class)
+        fieldsets = None
+        if self.action in self.sparse_fieldset_actions:
+            fieldsets = get_fieldsets(self.request)
+        if fieldsets:
+            # The plan covers every include: drop the plain lookups added by
+            # AutoPrefetchMixin, which clash with the restricted prefetches.
+            queryset = queryset.prefetch_related(None).only(
+                *get_only(serializer_class, include_paths, fieldsets)
+            )
+        select, prefetch = plan(serializer_class, include_paths, fieldsets)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
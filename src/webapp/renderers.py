@@ -0,0 +1,276 @@
+"""Project-wide renderers."""
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict, abc
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import orjson
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import encoding
+from rest_framework import relations, renderers
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+from rest_framework_json_api import utils
+from rest_framework_json_api.relations import ResourceRelatedField, SkipDataMixin
+from rest_framework_json_api.renderers import JSONRenderer
+from rest_framework_json_api.settings import json_api_settings
+
+# Floats in this range are written alike by json and orjson.
+ORJSON_FLOAT_RANGE = (1e-4, 1e16)
+
+
+class JSONFloat(float):
+    """Float written as json writes it, which orjson hands over to `default`."""
+
+
+def as_json_float(value):
+    """Return the value with floats orjson would write differently as JSONFloat.
+
+    Floats within lists, tuples and dicts are converted too, in copies of them.
+    """
+    value_type = type(value)
+    if value_type is float:
+        low, high = ORJSON_FLOAT_RANGE
+        if value and not low <= abs(value) < high:
+            return JSONFloat(value)
+    elif value_type is list or value_type is tuple:
+        return [as_json_float(item) for item in value]
+    elif isinstance(value, dict):
+        return {key: as_json_float(item) for key, item in value.items()}
+    return value
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """Encode JSON with orjson, byte for byte as the JSON renderer of DRF.
+
+    Indented output, other encoders and anything orjson cannot encode, such as
+    integers over 64 bits, are left to the JSON renderer of DRF.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def default(self, obj):
+        """Encode what orjson cannot as the JSON encoder of DRF would."""
+        if isinstance(obj, JSONFloat):
+            return orjson.Fragment(json.dumps(obj, allow_nan=not self.strict).encode())
+        return as_json_float(self.encoder_class().default(obj))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render the data into JSON."""
+        if (
+            data is None
+            or self.encoder_class is not encoders.JSONEncoder
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by DRF, since they end lines in JavaScript.
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class ResourcePlan(NamedTuple):
+    """Where the members of the resource objects of a serializer come from."""
+
+    # (member, field name, whether the field is read only)
+    attributes: Tuple[Tuple[str, str, bool], ...]
+    # (member, field name, whether the relationship is to-many)
+    relationships: Tuple[Tuple[str, str, bool], ...]
+
+
+def compile_plan(fields, format_type) -> Optional[ResourcePlan]:
+    """Return the plan of the fields, or None when they need the full renderer.
+
+    Only attributes and relationships of resource related fields without links
+    are planned, which the JSON:API renderer builds from the serializer data.
+    """
+    attributes, relationships = [], []
+    for name, field in fields.items():
+        if name == api_settings.URL_FIELD_NAME and isinstance(
+            field, relations.RelatedField
+        ):
+            return None
+        if name == "id" or field.write_only:
+            continue
+        member = utils.format_value(name, format_type)
+        if not isinstance(
+            field, (relations.RelatedField, relations.ManyRelatedField, BaseSerializer)
+        ):
+            attributes.append((member, name, field.read_only))
+            continue
+        many = isinstance(field, relations.ManyRelatedField)
+        relation = field.child_relation if many else field
+        if (
+            type(relation)  # pylint: disable=unidiomatic-typecheck
+            is not ResourceRelatedField
+            or isinstance(relation, SkipDataMixin)
+            or relation.self_link_view_name
+            or relation.related_link_view_name
+        ):
+            return None
+        relationships.append((member, name, many))
+    return ResourcePlan(tuple(attributes), tuple(relationships))
+
+
+class JSONAPIRenderer(JSONRenderer, ORJSONRenderer):
+    """Render JSON:API documents from precompiled plans, encoded with orjson.
+
+    The JSON:API renderer inspects every field of the serializer for each
+    resource object; the plan of the fields is compiled once per serializer
+    and set of fields instead. Resources the plans do not cover are built by
+    the JSON:API renderer, and the documents are the same byte for byte. The
+    JSON:API renderer hands the document over to ORJSONRenderer to encode.
+    """
+
+    plans: Dict[Tuple, Optional[ResourcePlan]] = {}
+
+    @classmethod
+    def get_plan(cls, fields) -> Optional[ResourcePlan]:
+        """Return the compiled plan of the serializer fields."""
+        format_type = json_api_settings.FORMAT_FIELD_NAMES
+        key = (type(fields.serializer), tuple(fields), format_type)
+        try:
+            return cls.plans[key]
+        except KeyError:
+            plan = cls.plans[key] = compile_plan(fields, format_type)
+            return plan
+
+    @classmethod
+    def build_json_resource_obj(
+        cls,
+        fields,
+        resource,
+        resource_instance,
+        resource_name,
+        force_type_resolution=False,
+    ):
+        """Build the resource object following the plan of the fields."""
+        plan = None
+        if resource_instance is not None and not force_type_resolution:
+            plan = cls.get_plan(fields)
+        if plan is None or any(
+            many and name not in resource for _, name, many in plan.relationships
+        ):
+            resource_object = super().build_json_resource_obj(
+                fields,
+                resource,
+                resource_instance,
+                resource_name,
+                force_type_resolution,
+            )
+            if "attributes" in resource_object:
+                resource_object["attributes"] = as_json_float(
+                    resource_object["attributes"]
+                )
+            return resource_object
+        attributes = OrderedDict()
+        for member, name, read_only in plan.attributes:
+            if read_only and name not in resource:
+                continue
+            attributes[member] = as_json_float(resource.get(name))
+        resource_object = OrderedDict(
+            [
+                ("type", resource_name),
+                ("id", encoding.force_str(resource_instance.pk)),
+                ("attributes", attributes),
+            ]
+        )
+        if plan.relationships:
+            relationships = resource_object["relationships"] = OrderedDict()
+            for member, name, many in plan.relationships:
+                data = resource.get(name)
+                if many and isinstance(data, abc.Iterable):
+                    relationships[member] = {"meta": {"count": len(data)}, "data": data}
+                else:
+                    relationships[member] = {"data": data}
+        return resource_object
+
+    @classmethod
+    def extract_included(
+        cls, fields, resource, resource_instance, included_resources, included_cache
+    ):
+        """Add the included resources, if any were requested."""
+        if included_resources:
+            super().extract_included(
+                fields, resource, resource_instance, included_resources, included_cache
+            )
+
+
+class PrebuiltJSONRenderer(ORJSONRenderer):
+    """Render documents which views have already shaped as JSON:API."""
+
+    media_type = "application/vnd.api+json"
+    format = "vnd.api+json"
+
+
+class _Echo:
+    """File-like object returning what is written to it."""
+
+    def write(self, value):
+        """Return the value instead of buffering it."""
+        return value
+
+
+class StreamingRenderer(renderers.BaseRenderer, metaclass=ABCMeta):
+    """Render flat records one line at a time.
+
+    Views stream large collections by passing an iterator of records to
+    `render_lines`; `render` handles ordinary responses such as errors.
+    """
+
+    charset = "utf-8"
+
+    @abstractmethod
+    def render_lines(
+        self, records: Iterable[dict], fieldnames: Optional[List[str]] = None
+    ) -> Iterator[str]:
+        """Yield the encoded lines of the records."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render a record, or a list of them."""
+        if data is None:
+            return b""
+        records = data if isinstance(data, list) else [data]
+        return "".join(self.render_lines(records)).encode(self.charset)
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """Render newline delimited JSON, one object per record."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render_lines(self, records, fieldnames=None):
+        """Yield each record as a line of JSON."""
+        for record in records:
+            yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+class CSVRenderer(StreamingRenderer):
+    """Render CSV with a header row, one row per record."""
+
+    media_type = "text/csv"
+    format = "csv"
+
+    def render_lines(self, records, fieldnames=None):
+        """Yield the header, then a row of the fields of each record."""
+        records = iter(records)
+        if fieldnames is None:
+            first = next(records, None)
+            if first is None:
+                return
+            fieldnames = list(first)
+            records = chain([first], records)
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fieldnames)
+        for record in records:
+            yield writer.writerow([record.get(name) for name in fieldnames])
@@ -3,6 +3,7 @@ from datetime import timedelta
 from typing import Any, Dict, List, Tuple, Type
 from urllib.parse import urlparse
 
+from celery.schedules import crontab
 from environ import Env
 
 env = Env()
@@ -32,6 +33,14 @@ if DEBUG:
             "CELERY_TASK_DEFAULT_QUEUE": (str, "celery"),
             "AXES_KEY_PREFIX": (str, "axes"),
             "AXES_REDIS_URL": (str, "rediscache://redis/1"),
+            "API_CACHE_KEY_PREFIX": (str, "api"),
+            "API_CACHE_REDIS_URL": (str, "rediscache://redis/2"),
+            "AUTH_CACHE_KEY_PREFIX": (str, "auth"),
+            "AUTH_CACHE_REDIS_URL": (str, "rediscache://redis/3"),
+            "MEDIA_URL_CACHE_KEY_PREFIX": (str, "media_urls"),
+            "MEDIA_URL_CACHE_REDIS_URL": (str, "rediscache://redis/4"),
+            "STORAGE_QUEUE_KEY_PREFIX": (str, "storage"),
+            "STORAGE_QUEUE_REDIS_URL": (str, "rediscache://redis/5"),
             "SECRET_KEY": (str, "super_secret_secret_key"),
         },
     }
@@ -89,6 +98,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",
     "axes",
 ]
 
@@ -124,6 +134,7 @@ TEMPLATES = [
 
 ROOT_URLCONF = "webapp.urls"
 WSGI_APPLICATION = "webapp.wsgi.application"
+TEST_RUNNER = "webapp.test.runner.TestRunner"
 SITE_ID = 1
 
 # i18n
@@ -136,8 +147,8 @@ USE_TZ = True
 # Auth
 ANONYMOUS_USER_ID = -1
 AUTHENTICATION_BACKENDS = [
-    "axes.backends.AxesBackend",
-    "django.contrib.auth.backends.ModelBackend",
+    "users.backends.CachedAxesBackend",
+    "users.backends.CachedModelBackend",
 ]
 AUTH_USER_MODEL = "users.User"
 AUTH_PASSWORD_VALIDATORS = [
@@ -157,6 +168,12 @@ CSRF_COOKIE_SECURE = True
 AWS_AUTO_CREATE_BUCKET = False
 AWS_DEFAULT_ACL = "private"
 AWS_BUCKET_ACL = "private"
+# Signed URLs are reused for an hour, see webapp.storage.MediaS3, so each one
+# handed out stays valid for at least another hour: as long as the responses
+# cached with it.
+AWS_QUERYSTRING_EXPIRE = 2 * 60 * 60
+# Serves book covers unsigned from this URL, e.g. a CDN in front of the bucket.
+MEDIA_PUBLIC_URL = env("MEDIA_PUBLIC_URL", default="")
 
 # URLs
 MEDIA_URL = "/assets/media/"
@@ -168,6 +185,13 @@ CELERY_RESULT_BACKEND = "django-db"
 CELERY_TIMEZONE = "UTC"
 CELERY_ENABLE_UTC = True
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Saved as periodic tasks by the scheduler when beat starts.
+CELERY_BEAT_SCHEDULE = {
+    "collect-orphaned-media": {
+        "task": "webapp.tasks.collect_orphaned_media",
+        "schedule": crontab(minute=30, hour=3),
+    },
+}
 CELERY_APP_NAME = PROJECT_NAME
 
 # Email
@@ -208,9 +232,33 @@ axes_cache_config["KEY_PREFIX"] = env("AXES_KEY_PREFIX")
 axes_cache_config["OPTIONS"][
     "SERIALIZER"
 ] = "django_redis.serializers.json.JSONSerializer"
+# Rendered API responses shared by every worker, see webapp.cache.
+API_CACHE = "api"
+API_CACHE_TIMEOUT = 60 * 60
+api_cache_config: Dict[str, Any] = {**env.cache_url("API_CACHE_REDIS_URL")}
+api_cache_config["KEY_PREFIX"] = env("API_CACHE_KEY_PREFIX")
+# Users of API tokens and their permissions, see users.authentication and
+# users.backends.
+AUTH_CACHE = "auth"
+AUTH_CACHE_TIMEOUT = 5 * 60
+auth_cache_config: Dict[str, Any] = {**env.cache_url("AUTH_CACHE_REDIS_URL")}
+auth_cache_config["KEY_PREFIX"] = env("AUTH_CACHE_KEY_PREFIX")
+# Signed URLs of media files, see webapp.storage.
+MEDIA_URL_CACHE = "media_urls"
+MEDIA_URL_CACHE_TIMEOUT = 60 * 60
+media_url_cache_config: Dict[str, Any] = {**env.cache_url("MEDIA_URL_CACHE_REDIS_URL")}
+media_url_cache_config["KEY_PREFIX"] = env("MEDIA_URL_CACHE_KEY_PREFIX")
+# Storage operations deferred to background tasks, see webapp.storage.
+STORAGE_QUEUE = "storage"
+storage_queue_config: Dict[str, Any] = {**env.cache_url("STORAGE_QUEUE_REDIS_URL")}
+storage_queue_config["KEY_PREFIX"] = env("STORAGE_QUEUE_KEY_PREFIX")
 CACHES = {
     "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
     AXES_CACHE: axes_cache_config,
+    API_CACHE: api_cache_config,
+    AUTH_CACHE: auth_cache_config,
+    MEDIA_URL_CACHE: media_url_cache_config,
+    STORAGE_QUEUE: storage_queue_config,
 }
 
 # DRF Core
@@ -228,7 +276,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly"
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
@@ -238,13 +286,13 @@ REST_FRAMEWORK = {
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
-    "DEFAULT_RENDERER_CLASSES": ["rest_framework_json_api.renderers.JSONRenderer"],
+    "DEFAULT_RENDERER_CLASSES": ["webapp.renderers.JSONAPIRenderer"],
     "DEFAULT_METADATA_CLASS": "rest_framework_json_api.metadata.JSONAPIMetadata",
     "DEFAULT_FILTER_BACKENDS": [
         "rest_framework_json_api.filters.QueryParameterValidationFilter",
         "rest_framework_json_api.filters.OrderingFilter",
         "rest_framework_json_api.django_filters.DjangoFilterBackend",
-        "rest_framework.filters.SearchFilter",
+        "webapp.filters.SearchFilter",
     ],
     "SEARCH_PARAM": "filter[search]",
     "DEFAULT_PAGINATION_CLASS": "webapp.pagination.JsonApiPageNumberPagination",
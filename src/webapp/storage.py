@@ -1,8 +1,106 @@
 """Storage classes for the project."""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
 from django.conf import settings
+from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.encoding import filepath_to_uri
+from django_redis import get_redis_connection
 from storages.backends import s3boto3
 
+# Media files waiting to be deleted, in settings.STORAGE_QUEUE.
+DELETE_QUEUE = "deletes"
+DELETE_SCHEDULED = "deletes:scheduled"
+# Deletes are sent DELETE_DELAY seconds after being queued, in batches of up
+# to DELETE_BATCH_SIZE: the most S3 deletes in one request.
+DELETE_DELAY = 10
+DELETE_BATCH_SIZE = 1000
+# Bytes read at a time when streaming files line by line.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_url_cache():
+    """Return the cache holding the signed URLs of media files."""
+    return caches[settings.MEDIA_URL_CACHE]
+
+
+def cache_urls(names: Iterable[str]):
+    """Sign the URLs of the media files at once, before rendering them."""
+    if hasattr(default_storage, "cache_urls"):
+        default_storage.cache_urls(names)
+
+
+def iter_lines(name: str) -> Iterator[bytes]:
+    """Yield the lines of a media file with their endings, reading it bit by bit."""
+    if hasattr(default_storage, "iter_lines"):
+        yield from default_storage.iter_lines(name)
+        return
+    with default_storage.open(name, "rb") as fyl:
+        yield from fyl
+
+
+def get_queue_key(name: str) -> str:
+    """Return the Redis key of a storage queue."""
+    return caches[settings.STORAGE_QUEUE].make_key(name)
+
+
+def delete_later(names: Iterable[str]):
+    """Delete the media files in the background once the transaction commits.
+
+    Nothing is deleted when the transaction rolls back, so the files of rows
+    which are still there are never lost.
+    """
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: queue_deletes(names))
+
+
+def queue_deletes(names: List[str]):
+    """Queue the media files for deletion and schedule the queue to be drained."""
+    # noqa pylint: disable=import-outside-toplevel
+    from webapp.tasks import delete_media
+
+    push_deletes(names)
+    # The flag expires before the drain runs, so names queued after the
+    # drain has emptied the queue schedule another one.
+    scheduled = get_redis_connection(settings.STORAGE_QUEUE).set(
+        get_queue_key(DELETE_SCHEDULED), 1, nx=True, ex=DELETE_DELAY // 2
+    )
+    if scheduled:
+        delete_media.apply_async(countdown=DELETE_DELAY)
+
+
+def push_deletes(names: List[str]):
+    """Put media files on the deletion queue."""
+    get_redis_connection(settings.STORAGE_QUEUE).rpush(
+        get_queue_key(DELETE_QUEUE), *names
+    )
+
+
+def pop_deletes(count: int = DELETE_BATCH_SIZE) -> List[str]:
+    """Take up to count media files off the deletion queue."""
+    key = get_queue_key(DELETE_QUEUE)
+    pipeline = get_redis_connection(settings.STORAGE_QUEUE).pipeline()
+    pipeline.lrange(key, 0, count - 1)
+    pipeline.ltrim(key, count, -1)
+    names, _ = pipeline.execute()
+    return [name.decode() for name in names]
+
+
+def delete_many(names: List[str]) -> List[str]:
+    """Delete media files and return the names of those which failed."""
+    if hasattr(default_storage, "delete_many"):
+        return default_storage.delete_many(names)
+    for name in names:
+        default_storage.delete(name)
+    return []
+
 
 class StaticS3(s3boto3.S3Boto3Storage):  # pylint: disable=abstract-method
     """The static storage for the project."""
@@ -11,9 +109,187 @@ class StaticS3(s3boto3.S3Boto3Storage):  # pylint: disable=abstract-method
 
 
 class MediaS3(s3boto3.S3Boto3Storage):  # pylint: disable=abstract-method
-    """The default_storage for the project."""
+    """The default_storage for the project.
+
+    Signing a URL costs an HMAC and a trip through the boto3 client, so signed
+    URLs are shared by every worker through settings.MEDIA_URL_CACHE and kept
+    in memory, for MEDIA_URL_CACHE_TIMEOUT seconds: well before they expire.
+    When MEDIA_PUBLIC_URL is set, files under `public_prefixes` are served
+    from it unsigned instead, e.g. from a CDN in front of the bucket.
+    """
 
     location = settings.MEDIA_URL.lstrip("/")
+    public_prefixes = ["book_covers/"]
+    # Signed URLs kept in memory, by name, with the time they stop being used,
+    # least recently used first: a few pages of books with their renditions.
+    max_memoized_urls = 20000
+
+    def __init__(self, *args, **kwargs):
+        """Start with no URLs in memory."""
+        super().__init__(*args, **kwargs)
+        self.urls: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.urls_lock = threading.Lock()
+
+    def is_signed(self) -> bool:
+        """Return whether url() signs the URLs."""
+        return self.querystring_auth and (
+            not self.custom_domain or self.cloudfront_signer is not None
+        )
+
+    def get_public_url(self, name: str) -> Optional[str]:
+        """Return the unsigned URL of a public file, if it is one."""
+        if not settings.MEDIA_PUBLIC_URL or not any(
+            name.startswith(prefix) for prefix in self.public_prefixes
+        ):
+            return None
+        key = self._normalize_name(self._clean_name(name))
+        return f"{settings.MEDIA_PUBLIC_URL.rstrip('/')}/{filepath_to_uri(key)}"
+
+    def get_memoized_urls(self, names: Iterable[str], now: float) -> Dict[str, str]:
+        """Return the URLs in memory which are still used, as recently used."""
+        urls = {}
+        with self.urls_lock:
+            for name in names:
+                url, expires = self.urls.get(name, ("", 0))
+                if expires > now:
+                    self.urls.move_to_end(name)
+                    urls[name] = url
+        return urls
+
+    def memoize_urls(self, urls: Dict[str, Tuple[str, float]]):
+        """Put URLs in memory, forgetting the least recently used ones."""
+        with self.urls_lock:
+            for name, url in urls.items():
+                self.urls[name] = url
+                self.urls.move_to_end(name)
+            while len(self.urls) > self.max_memoized_urls:
+                self.urls.popitem(last=False)
+
+    def cache_urls(self, names: Iterable[str]) -> Dict[str, str]:
+        """Put the signed URLs of the files in memory and return them.
+
+        URLs missing from memory are read from the cache with one query, and
+        the ones missing there are signed and cached with another.
+        """
+        now = time.time()
+        names = {name for name in names if name and self.get_public_url(name) is None}
+        if not names or not self.is_signed():
+            return {}
+        urls = self.get_memoized_urls(names, now)
+        missing = names - urls.keys()
+        if not missing:
+            return urls
+        cache = get_url_cache()
+        cached = cache.get_many([f"url:{name}" for name in missing])
+        resolved = {}
+        signed = {}
+        for name in missing:
+            url, expires = cached.get(f"url:{name}", ("", 0))
+            if expires <= now:
+                url = super().url(name)
+                expires = now + settings.MEDIA_URL_CACHE_TIMEOUT
+                signed[f"url:{name}"] = (url, expires)
+            resolved[name] = (url, expires)
+            urls[name] = url
+        self.memoize_urls(resolved)
+        if signed:
+            cache.set_many(signed, timeout=settings.MEDIA_URL_CACHE_TIMEOUT)
+        return urls
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        """Return the public, memoized or newly signed URL of the file."""
+        if parameters is not None or expire is not None or http_method is not None:
+            return super().url(name, parameters, expire, http_method)
+        public_url = self.get_public_url(name)
+        if public_url is not None:
+            return public_url
+        if not self.is_signed():
+            return super().url(name)
+        return self.cache_urls([name])[name]
+
+    def delete_many(self, names: List[str]) -> List[str]:
+        """Delete files with one request per DELETE_BATCH_SIZE of them.
+
+        Returns the names of the files which could not be deleted.
+        """
+        keys = {self._normalize_name(self._clean_name(name)): name for name in names}
+        objects = [{"Key": key} for key in keys]
+        failed = []
+        for start in range(0, len(objects), DELETE_BATCH_SIZE):
+            response = self.bucket.meta.client.delete_objects(
+                Bucket=self.bucket.name,
+                Delete={
+                    "Objects": objects[start : start + DELETE_BATCH_SIZE],
+                    "Quiet": True,
+                },
+            )
+            failed += [keys[error["Key"]] for error in response.get("Errors", [])]
+        return failed
+
+    def list_pages(
+        self, prefix: str, start_after: str = ""
+    ) -> Iterator[List[Tuple[str, datetime]]]:
+        """Yield the names and modification times of files, page by page.
+
+        Pages hold up to DELETE_BATCH_SIZE files, in the byte order of their
+        names, starting after start_after.
+        """
+        root = self._normalize_name("")
+        paginator = self.bucket.meta.client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self.bucket.name,
+            Prefix=self._normalize_name(self._clean_name(prefix)),
+            StartAfter=root + start_after if start_after else "",
+            PaginationConfig={"PageSize": DELETE_BATCH_SIZE},
+        )
+        for page in pages:
+            yield [
+                (item["Key"][len(root) :], item["LastModified"])
+                for item in page.get("Contents", [])
+            ]
+
+    def head(self, name: str) -> Optional[Tuple[int, str]]:
+        """Return the size and content type of a file, or None when missing.
+
+        Only the metadata is requested, the file itself is not downloaded.
+        """
+        try:
+            response = self.bucket.meta.client.head_object(
+                Bucket=self.bucket.name,
+                Key=self._normalize_name(self._clean_name(name)),
+            )
+        except s3boto3.ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response["ContentLength"], response.get("ContentType", "")
+
+    def iter_lines(self, name: str) -> Iterator[bytes]:
+        """Yield the lines of a file with their endings, as they are downloaded.
+
+        Unlike open(), which spools the whole file before it can be read, only
+        STREAM_CHUNK_SIZE bytes and the line being read are held in memory.
+        """
+        key = self._normalize_name(self._clean_name(name))
+        body = self.bucket.Object(key).get()["Body"]
+        pending = b""
+        for chunk in iter(lambda: body.read(STREAM_CHUNK_SIZE), b""):
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+        body.close()
+        if pending:
+            yield pending
+
+    def get_presigned_post(
+        self, name: str, conditions: List, expire: int
+    ) -> Dict[str, Any]:
+        """Return the URL and form fields to upload a file straight to the bucket."""
+        key = self._normalize_name(self._clean_name(name))
+        return self.bucket.meta.client.generate_presigned_post(
+            self.bucket.name, key, Conditions=conditions, ExpiresIn=expire
+        )
 
     def create_bucket(self):
         """Ensure the bucket exists when in debug.
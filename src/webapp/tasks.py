@@ -1,11 +1,28 @@
 """Project wide tasks."""
+import logging
+
 from axes.helpers import get_cache, get_cache_timeout
+from botocore.exceptions import BotoCoreError, ClientError
 from celery import shared_task
 from django.conf import settings
 from django.core.mail import mail_admins
 from django.template.loader import render_to_string
 from django.utils.timezone import now
 
+from better_reads.covers import process_cover
+from better_reads.imports import InvalidLibrary, LibraryImporter
+from better_reads.models import LibraryImport
+from better_reads.objects import ImportStatus
+from better_reads.orphans import RATE, TIME_LIMIT, collect_orphans
+from webapp.storage import DELETE_DELAY, delete_many, pop_deletes, push_deletes
+
+logger = logging.getLogger(__name__)
+
+# Storage errors worth retrying, such as timeouts, throttling and 5xx.
+STORAGE_ERRORS = (BotoCoreError, ClientError, OSError)
+# Shown to users instead of the errors of failed imports, which are logged.
+IMPORT_FAILED_MESSAGE = "The import failed, please try again later."
+
 
 @shared_task
 def email_admins_on_user_locked_out(cache_key, ip_address):
@@ -27,3 +44,57 @@ def email_admins_on_user_locked_out(cache_key, ip_address):
                 "axes/lockout_admin_email.html", context=context
             ),
         )
+
+
+@shared_task
+def import_library(library_import_id):
+    """Import a library file, recording the progress on the LibraryImport."""
+    library_import = LibraryImport.objects.get(pk=library_import_id)
+    imports = LibraryImport.objects.filter(pk=library_import_id)
+    imports.update(status=ImportStatus.running.value)
+    try:
+        LibraryImporter(library_import).run()
+    except InvalidLibrary as error:
+        logger.warning("Library import %s is invalid: %r", library_import_id, error)
+        imports.update(status=ImportStatus.failed.value, error=str(error))
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Library import %s failed", library_import_id)
+        imports.update(status=ImportStatus.failed.value, error=IMPORT_FAILED_MESSAGE)
+    else:
+        imports.update(status=ImportStatus.done.value)
+
+
+@shared_task
+def render_book_cover(book_id):
+    """Render the thumbnails of a book's cover."""
+    process_cover(book_id)
+
+
+@shared_task(bind=True, max_retries=5)
+def delete_media(self):
+    """Delete the queued media files, batch by batch, until the queue is empty.
+
+    Files which fail are queued again and the drain is retried with an
+    exponential backoff; after max_retries they are logged and left for the
+    orphaned media cleanup.
+    """
+    names = pop_deletes()
+    while names:
+        try:
+            failed = delete_many(names)
+        except STORAGE_ERRORS:
+            logger.exception("Deleting %s media files failed", len(names))
+            failed = names
+        if failed and self.request.retries < self.max_retries:
+            push_deletes(failed)
+            raise self.retry(countdown=DELETE_DELAY * 2 ** self.request.retries)
+        if failed:
+            logger.error("Could not delete media files: %s", ", ".join(failed))
+        names = pop_deletes()
+
+
+@shared_task
+def collect_orphaned_media():
+    """Delete the cover files no book refers to, resuming the previous run."""
+    collection = collect_orphans(rate=RATE, time_limit=TIME_LIMIT)
+    logger.info("Collected orphaned media: %s", collection)
@@ -1,8 +1,11 @@
 """Project wide base test class."""
+from contextlib import contextmanager
 from typing import Any, Dict, Optional, Tuple, Type
 
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from hamcrest import assert_that
 from hamcrest.core.base_matcher import BaseMatcher  # type: ignore
 from rest_framework import status, test
@@ -68,10 +71,12 @@ class BaseTestCase(test.APITestCase):
         *args,
         asserted_status: int = None,
         asserted_schema: Dict[str, Any] = None,
+        query_budget: int = None,
         **kwargs,
     ):
-        """Wrap self.client.get and check status and/or the schema."""
-        response = self.client.get(path, *args, **kwargs)
+        """Wrap self.client.get and check status, schema and/or query count."""
+        with self.assertMaxQueries(query_budget):
+            response = self.client.get(path, *args, **kwargs)
         self._check_response(response, asserted_status, asserted_schema)
         return response
 
@@ -81,10 +86,12 @@ class BaseTestCase(test.APITestCase):
         *args,
         asserted_status: int = None,
         asserted_schema: Dict[str, Any] = None,
+        query_budget: int = None,
         **kwargs,
     ):
-        """Wrap self.client.post and check status and/or the schema."""
-        response = self.client.post(path, *args, **kwargs)
+        """Wrap self.client.post and check status, schema and/or query count."""
+        with self.assertMaxQueries(query_budget):
+            response = self.client.post(path, *args, **kwargs)
         self._check_response(response, asserted_status, asserted_schema)
         return response
 
@@ -94,10 +101,12 @@ class BaseTestCase(test.APITestCase):
         *args,
         asserted_status: int = None,
         asserted_schema: Dict[str, Any] = None,
+        query_budget: int = None,
         **kwargs,
     ):
-        """Wrap self.client.put and check status and/or the schema."""
-        response = self.client.put(path, *args, **kwargs)
+        """Wrap self.client.put and check status, schema and/or query count."""
+        with self.assertMaxQueries(query_budget):
+            response = self.client.put(path, *args, **kwargs)
         self._check_response(response, asserted_status, asserted_schema)
         return response
 
@@ -107,10 +116,12 @@ class BaseTestCase(test.APITestCase):
         *args,
         asserted_status: int = None,
         asserted_schema: Dict[str, Any] = None,
+        query_budget: int = None,
         **kwargs,
     ):
-        """Wrap self.client.patch and check status and/or the schema."""
-        response = self.client.patch(path, *args, **kwargs)
+        """Wrap self.client.patch and check status, schema and/or query count."""
+        with self.assertMaxQueries(query_budget):
+            response = self.client.patch(path, *args, **kwargs)
         self._check_response(response, asserted_status, asserted_schema)
         return response
 
@@ -120,13 +131,29 @@ class BaseTestCase(test.APITestCase):
         *args,
         asserted_status: int = None,
         asserted_schema: Dict[str, Any] = None,
+        query_budget: int = None,
         **kwargs,
     ):
-        """Wrap self.client.delete and check status and/or the schema."""
-        response = self.client.delete(path, *args, **kwargs)
+        """Wrap self.client.delete and check status, schema and/or query count."""
+        with self.assertMaxQueries(query_budget):
+            response = self.client.delete(path, *args, **kwargs)
         self._check_response(response, asserted_status, asserted_schema)
         return response
 
+    @contextmanager
+    def assertMaxQueries(self, budget: Optional[int]):  # pylint: disable=invalid-name
+        """Assert that at most `budget` queries are run within the context."""
+        if budget is None:
+            yield None
+            return
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context)
+        if executed > budget:
+            queries = "\n".join(query["sql"] for query in context.captured_queries)
+            msg = f"{executed} queries executed, {budget} allowed.\nqueries:\n{queries}"
+            raise self.failureException(msg)
+
     def assertThat(
         self, actual: Any, matcher: BaseMatcher, reason: str = ""
     ):  # pylint: disable=invalid-name,no-self-use
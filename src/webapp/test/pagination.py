@@ -0,0 +1,9 @@
+"""Craft pagination cursors in tests."""
+import json
+from base64 import urlsafe_b64encode
+
+
+def forge_cursor(position, reverse=False):
+    """Return a cursor at the given position, as a client could craft it."""
+    cursor = json.dumps({"p": position, "r": reverse})
+    return urlsafe_b64encode(cursor.encode()).decode()
@@ -0,0 +1,50 @@
+"""Project wide test runner."""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def get_local_cache(alias: str) -> dict:
+    """Return the settings of an in-memory cache for the alias."""
+    return {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": alias,
+    }
+
+
+class TestRunner(DiscoverRunner):
+    """Keep the entries written by tests out of the shared caches.
+
+    Test databases reuse the primary keys of earlier runs, so nothing cached
+    by another run may be read. The response, auth and media URL caches are
+    kept in memory. The storage queue needs redis, its keys are prefixed with
+    a new key prefix for every run instead and deleted afterwards.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        """Isolate the caches while the tests run."""
+        super().setup_test_environment(**kwargs)
+        storage_queue_config = settings.CACHES[settings.STORAGE_QUEUE]
+        key_prefix = storage_queue_config.get("KEY_PREFIX", "")
+        self.cache_settings = override_settings(
+            CACHES={
+                **settings.CACHES,
+                settings.API_CACHE: get_local_cache(settings.API_CACHE),
+                settings.AUTH_CACHE: get_local_cache(settings.AUTH_CACHE),
+                settings.MEDIA_URL_CACHE: get_local_cache(settings.MEDIA_URL_CACHE),
+                settings.STORAGE_QUEUE: {
+                    **storage_queue_config,
+                    "KEY_PREFIX": f"{key_prefix}test-{uuid4().hex}",
+                },
+            }
+        )
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        """Delete the storage queue of the run and restore the caches."""
+        caches[settings.STORAGE_QUEUE].delete_pattern("*")
+        self.cache_settings.disable()
+        super().teardown_test_environment(**kwargs)
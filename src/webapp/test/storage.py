@@ -0,0 +1,68 @@
+"""Run the deferred storage operations of tests."""
+from contextlib import contextmanager
+from unittest import mock
+
+import boto3
+from django.conf import settings
+from django.test import override_settings
+from django_redis import get_redis_connection
+from moto import mock_s3
+
+from webapp.storage import DELETE_QUEUE, DELETE_SCHEDULED, get_queue_key
+from webapp.tasks import delete_media
+
+
+def clear_storage_queue():
+    """Empty the deletion queue and its schedule."""
+    get_redis_connection(settings.STORAGE_QUEUE).delete(
+        get_queue_key(DELETE_QUEUE), get_queue_key(DELETE_SCHEDULED)
+    )
+
+
+def drain(*args, **kwargs):
+    """Run the scheduled drain of the deletion queue right away."""
+    delete_media()
+    get_redis_connection(settings.STORAGE_QUEUE).delete(get_queue_key(DELETE_SCHEDULED))
+
+
+@contextmanager
+def run_storage_operations():
+    """Run storage operations as soon as they are deferred.
+
+    Test cases never commit, so transaction.on_commit callbacks run at once.
+    """
+    clear_storage_queue()
+    with mock.patch(
+        "django.db.transaction.on_commit", side_effect=lambda func: func()
+    ), mock.patch.object(delete_media, "apply_async", side_effect=drain) as apply_async:
+        yield apply_async
+    clear_storage_queue()
+
+
+@contextmanager
+def mocked_s3(bucket: str):
+    """Store media in a bucket of a mocked S3."""
+    with mock_s3(), override_settings(
+        DEFAULT_FILE_STORAGE="webapp.storage.MediaS3",
+        AWS_STORAGE_BUCKET_NAME=bucket,
+        AWS_S3_REGION_NAME="us-east-1",
+        AWS_S3_ENDPOINT_URL=None,
+        AWS_S3_CUSTOM_DOMAIN=None,
+        AWS_ACCESS_KEY_ID="testing",
+        AWS_SECRET_ACCESS_KEY="testing",
+    ):
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=bucket)
+        yield
+
+
+class MockedS3Mixin:
+    """Store media in the `bucket` of a mocked S3 during each test."""
+
+    bucket = "media"
+
+    def setUp(self):
+        """Mock S3 until the test is cleaned up."""
+        super().setUp()
+        context = mocked_s3(self.bucket)
+        context.__enter__()
+        self.addCleanup(context.__exit__, None, None, None)
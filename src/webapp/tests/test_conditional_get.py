@@ -0,0 +1,135 @@
+"""Ensure unchanged resources are answered with 304 Not Modified."""
+from rest_framework import status
+
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test conditional GETs of shelves, shelfbooks and reviews."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a shelf of books."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        cls.category = Category.objects.create(name="Fantasy")
+        cls.books = [
+            Book.objects.create(title=title, author="Tolkien", category=cls.category)
+            for title in ["The Hobbit", "The Silmarillion"]
+        ]
+        cls.shelf = Shelf.objects.create(name="Mine", user=cls.user)
+        Shelfbook.objects.create(shelf=cls.shelf, book=cls.books[0])
+
+    def setUp(self):
+        """Authenticate as the owner of the shelf."""
+        super().setUp()
+        self.auth(self.user)
+
+    def assertNotModified(self, path, response, *args, **kwargs):
+        """Check that revalidating the response is answered with 304."""
+        not_modified = self.get(
+            path,
+            *args,
+            asserted_status=status.HTTP_304_NOT_MODIFIED,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            **kwargs,
+        )
+        self.assertEqual(not_modified.content, b"")
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+
+    def assertModified(self, path, response, *args, **kwargs):
+        """Check that revalidating the response returns a new one."""
+        modified = self.get(
+            path,
+            *args,
+            asserted_status=status.HTTP_200_OK,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            **kwargs,
+        )
+        self.assertNotEqual(modified["ETag"], response["ETag"])
+        return modified
+
+    def test_validators(self):
+        """Responses carry a weak ETag and the latest modification date."""
+        response = self.get("/shelves/", asserted_status=status.HTTP_200_OK)
+        self.assertRegex(response["ETag"], r'^W/"[0-9a-f]{40}"$')
+        self.assertTrue(response.has_header("Last-Modified"))
+        # Authentication, then the aggregate of the validators.
+        self.assertNotModified("/shelves/", response, query_budget=2)
+        self.get(
+            "/shelves/",
+            asserted_status=status.HTTP_304_NOT_MODIFIED,
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+
+    def test_retrieve(self):
+        """Single resources are revalidated, missing ones are still 404."""
+        path = f"/shelves/{self.shelf.pk}/"
+        response = self.get(path, asserted_status=status.HTTP_200_OK)
+        self.assertNotModified(path, response)
+        self.shelf.name = "Renamed"
+        self.shelf.save()
+        self.assertModified(path, response)
+        self.get(
+            "/shelves/0/",
+            asserted_status=status.HTTP_404_NOT_FOUND,
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+
+    def test_shelved_books(self):
+        """Shelving a book changes the shelf and its shelfbooks."""
+        shelves = self.get("/shelves/", asserted_status=status.HTTP_200_OK)
+        shelfbooks = self.get("/shelfbooks/", asserted_status=status.HTTP_200_OK)
+        shelfbook = Shelfbook.objects.create(shelf=self.shelf, book=self.books[1])
+        shelves = self.assertModified("/shelves/", shelves)
+        shelfbooks = self.assertModified("/shelfbooks/", shelfbooks)
+        shelfbook.delete()
+        self.assertModified("/shelves/", shelves)
+        self.assertModified("/shelfbooks/", shelfbooks)
+
+    def test_request_fingerprint(self):
+        """Pages, filters and includes of the same rows have their own ETags."""
+        response = self.get("/shelfbooks/", asserted_status=status.HTTP_200_OK)
+        self.assertModified("/shelfbooks/", response, {"include": "book"})
+        self.assertModified("/shelfbooks/", response, {"filter[shelf]": self.shelf.pk})
+        self.assertNotModified("/shelfbooks/", response)
+
+    def test_included_resources(self):
+        """Changes to included resources change the ETag."""
+        params = {"include": "book"}
+        included = self.get("/shelfbooks/", params, asserted_status=status.HTTP_200_OK)
+        response = self.get("/shelfbooks/", asserted_status=status.HTTP_200_OK)
+        Review.objects.create(rate="5", user=self.user, book=self.books[0])
+        self.assertModified("/shelfbooks/", included, params)
+        self.assertNotModified("/shelfbooks/", response)
+
+    def test_visibility(self):
+        """Other users see their own version of the collection."""
+        response = self.get("/shelves/", asserted_status=status.HTTP_200_OK)
+        self.auth(UserFactory())
+        self.assertModified("/shelves/", response)
+        self.shelf.public = False
+        self.shelf.save()
+        self.auth(self.user)
+        self.assertModified("/shelves/", response)
+
+    def test_pages(self):
+        """Pages are validated from their own rows only."""
+        other = Shelf.objects.create(name="Theirs", user=self.user)
+        first, second = Shelf.objects.filter(pk__in=[self.shelf.pk, other.pk])
+        params = {"page[size]": 1}
+        response = self.get("/shelves/", params, asserted_status=status.HTTP_200_OK)
+        last = {**params, "page[number]": "last"}
+        self.assertNotModified(
+            "/shelves/",
+            self.get("/shelves/", last, asserted_status=status.HTTP_200_OK),
+            last,
+        )
+        second.name = "Renamed"
+        second.save()
+        self.assertNotModified("/shelves/", response, params)
+        first.name = "Renamed"
+        first.save()
+        self.assertModified("/shelves/", response, params)
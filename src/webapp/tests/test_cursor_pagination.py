@@ -0,0 +1,122 @@
+"""Ensure cursor pagination walks collections without OFFSET or COUNT."""
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from better_reads.models import Book, Category, Review
+from users.models import User
+from webapp.test.base import APIClient, BaseTestCase
+from webapp.test.pagination import forge_cursor
+
+
+def get_relative_link(link):
+    """Strip the host and api base from a link so the test client can follow it."""
+    url = urlsplit(link)
+    return f"/{url.path[len(APIClient.api_base):]}?{url.query}"
+
+
+class TestCase(BaseTestCase):
+    """Test cursor pagination on the reviews endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create reviews to page through."""
+        super().setUpTestData()
+        cls.user = User.objects.create_user("cursor@example.com", "pass")
+        category = Category.objects.create(name="Fantasy")
+        book = Book.objects.create(title="Dune", author="Herbert", category=category)
+        cls.reviews = [
+            Review.objects.create(rate=str(index % 5 + 1), user=cls.user, book=book)
+            for index in range(7)
+        ]
+
+    def setUp(self):
+        """Authenticate as the reviewer."""
+        super().setUp()
+        self.auth(self.user)
+
+    def get_page(self, url, **params):
+        """Return the ids and links of the page, checking no COUNT was run."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(url, params, asserted_status=status.HTTP_200_OK)
+        for query in context.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+            self.assertNotIn("OFFSET", query["sql"])
+        json = response.json()
+        return [int(review["id"]) for review in json["data"]], json["links"]
+
+    def test_walk(self):
+        """Following next then prev links visits every row once in order."""
+        expected = sorted(
+            self.reviews, key=lambda review: (review.rate, review.pk), reverse=True
+        )
+        expected = [review.pk for review in expected]
+        ids, links = self.get_page(
+            "/reviews/", **{"page[cursor]": "", "page[size]": 3, "sort": "-rate"}
+        )
+        self.assertIsNone(links["prev"])
+        pages = [ids]
+        while links["next"]:
+            ids, links = self.get_page(get_relative_link(links["next"]))
+            pages.append(ids)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+        ids, links = self.get_page(get_relative_link(links["prev"]))
+        self.assertEqual(ids, pages[1])
+        ids, links = self.get_page(get_relative_link(links["prev"]))
+        self.assertEqual(ids, pages[0])
+        self.assertIsNone(links["prev"])
+
+    def test_same_millisecond(self):
+        """Rows written in the same millisecond are each visited once."""
+        created_at = self.reviews[0].created_at.replace(microsecond=123400)
+        for index, review in enumerate(self.reviews):
+            Review.objects.filter(pk=review.pk).update(
+                created_at=created_at + timedelta(microseconds=index % 2 * 100)
+            )
+        ids, links = self.get_page(
+            "/reviews/", **{"page[cursor]": "", "page[size]": 2, "sort": "createdAt"}
+        )
+        pages = [ids]
+        # Cursors landing before rows already served would loop forever.
+        while links["next"] and len(pages) < len(self.reviews):
+            ids, links = self.get_page(get_relative_link(links["next"]))
+            pages.append(ids)
+        reviews = self.reviews[::2] + self.reviews[1::2]
+        self.assertEqual(sum(pages, []), [review.pk for review in reviews])
+
+    def test_page_number_default(self):
+        """Without page[cursor] page number pagination is used."""
+        response = self.get("/reviews/", asserted_status=status.HTTP_200_OK)
+        self.assertEqual(response.json()["meta"]["pagination"]["count"], 7)
+
+    def test_invalid_cursor(self):
+        """Tampered cursors are rejected."""
+        self.get(
+            "/reviews/",
+            {"page[cursor]": "not-a-cursor"},
+            asserted_status=status.HTTP_404_NOT_FOUND,
+        )
+
+    def test_forged_cursor(self):
+        """Cursors whose values do not fit the sort fields are rejected."""
+        for params in [
+            {"page[cursor]": forge_cursor(["x"])},
+            {"page[cursor]": forge_cursor([None])},
+            {"page[cursor]": forge_cursor(["not-a-date", 1]), "sort": "-createdAt"},
+        ]:
+            with self.subTest(params=params):
+                self.get("/reviews/", params, asserted_status=status.HTTP_404_NOT_FOUND)
+
+    def test_unsupported_sort(self):
+        """Relations, files and nullable fields cannot be paged by cursor."""
+        for sort in ["category", "-cover"]:
+            with self.subTest(sort=sort):
+                self.get(
+                    "/books/",
+                    {"page[cursor]": "", "sort": sort},
+                    asserted_status=status.HTTP_400_BAD_REQUEST,
+                )
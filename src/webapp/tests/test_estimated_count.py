@@ -0,0 +1,77 @@
+"""Ensure large collections report estimated counts."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from better_reads.models import Book, Category, Review
+from users.models import User
+from webapp.pagination import EstimatedCountPaginator
+from webapp.test.base import BaseTestCase
+
+
+class Paginator(EstimatedCountPaginator):
+    """Estimate counts of any size."""
+
+    threshold = 1
+
+
+class TestCase(BaseTestCase):
+    """Test the estimated count paginator."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create and analyse reviews."""
+        super().setUpTestData()
+        cls.user = User.objects.create_user("estimate@example.com", "pass")
+        category = Category.objects.create(name="Fantasy")
+        book = Book.objects.create(title="Dune", author="Herbert", category=category)
+        Review.objects.bulk_create(
+            Review(rate="5", user=cls.user, book=book) for _ in range(20)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Review._meta.db_table}")
+
+    def test_unfiltered_estimate(self):
+        """Unfiltered querysets are estimated from the table statistics."""
+        paginator = Paginator(Review.objects.order_by("pk"), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 20)
+        self.assertTrue(paginator.estimated)
+
+    def test_filtered_count(self):
+        """Filtered querysets are counted up to the threshold, not estimated."""
+        queryset = Review.objects.filter(rate="5").order_by("pk")
+        paginator = EstimatedCountPaginator(queryset, 5)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(paginator.count, 20)
+        self.assertFalse(paginator.estimated)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertIn("LIMIT 100001", context.captured_queries[0]["sql"])
+        paginator = Paginator(queryset, 5)
+        self.assertEqual(paginator.count, 1)
+        self.assertTrue(paginator.estimated)
+        self.assertEqual(len(paginator.page(4)), 5)
+
+    def test_below_threshold(self):
+        """Small collections are counted exactly."""
+        paginator = EstimatedCountPaginator(Review.objects.order_by("pk"), 5)
+        self.assertEqual(paginator.count, 20)
+        self.assertFalse(paginator.estimated)
+
+    def test_past_estimated_pages(self):
+        """Pages past an underestimated count are still served."""
+        paginator = Paginator(Review.objects.order_by("pk"), 5)
+        self.assertEqual(paginator.count, 20)
+        self.assertTrue(paginator.estimated)
+        # Simulate statistics lagging behind the table.
+        paginator.count = 6
+        self.assertEqual(len(paginator.page(4)), 5)
+        self.assertEqual(len(paginator.page(5)), 0)
+
+    def test_meta(self):
+        """The pagination meta marks whether the count is estimated."""
+        self.auth(self.user)
+        response = self.get("/reviews/", asserted_status=status.HTTP_200_OK)
+        pagination = response.json()["meta"]["pagination"]
+        self.assertEqual(pagination["count"], 20)
+        self.assertFalse(pagination["estimated"])
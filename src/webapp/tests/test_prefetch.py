@@ -0,0 +1,90 @@
+"""Ensure the prefetch planner covers every rendered relationship."""
+from django.test import SimpleTestCase
+
+from better_reads.serializers import (
+    BookSerializer,
+    ReviewSerializer,
+    ShelfbookSerializer,
+    ShelfSerializer,
+)
+from webapp.prefetch import get_only, plan
+
+
+def get_lookups(serializer_class, include_paths):
+    """Return the planned lookups as plain strings."""
+    select, prefetch = plan(serializer_class, include_paths)
+    return select, [lookup.prefetch_to for lookup in prefetch]
+
+
+class TestCase(SimpleTestCase):
+    """Test the select_related/prefetch_related planner."""
+
+    def test_no_includes(self):
+        """To-one relationships are not joined when they are not included."""
+        self.assertEqual(get_lookups(BookSerializer, []), ([], []))
+        self.assertEqual(get_lookups(ReviewSerializer, []), ([], []))
+
+    def test_to_many_ids(self):
+        """Rendered to-many relationships are prefetched with only their ids."""
+        select, prefetch = plan(ShelfSerializer, [])
+        self.assertEqual(select, [])
+        self.assertEqual([lookup.prefetch_to for lookup in prefetch], ["books"])
+        self.assertEqual(prefetch[0].queryset.query.deferred_loading[0], {"id"})
+
+    def test_to_one_includes(self):
+        """Included to-one relationships are joined."""
+        self.assertEqual(
+            get_lookups(ReviewSerializer, ["book", "user"]), (["book", "user"], [])
+        )
+
+    def test_nested_includes(self):
+        """Nested includes are joined and their to-many relationships prefetched."""
+        self.assertEqual(
+            get_lookups(ShelfbookSerializer, ["shelf.user", "book.category"]),
+            (["book", "book__category", "shelf", "shelf__user"], ["shelf__books"]),
+        )
+
+    def test_through_to_many(self):
+        """Everything past a to-many relationship is prefetched."""
+        self.assertEqual(
+            get_lookups(ShelfSerializer, ["books.category", "user"]),
+            (["user"], ["books", "books__category"]),
+        )
+
+    def test_unknown_include(self):
+        """Unknown include paths are left for the serializer to reject."""
+        self.assertEqual(get_lookups(BookSerializer, ["nope"]), ([], []))
+
+    def test_sparse_fieldsets(self):
+        """Only the columns of the requested fields and relationships are loaded."""
+        self.assertEqual(
+            get_only(BookSerializer, [], {"books": ["title"]}), ["id", "title"]
+        )
+        self.assertEqual(
+            get_only(
+                ReviewSerializer,
+                ["book.category"],
+                {"reviews": ["rate"], "books": ["title"]},
+            ),
+            [
+                "id",
+                "rate",
+                "book",
+                "book__id",
+                "book__title",
+                "book__category",
+                "book__category__id",
+                "book__category__name",
+            ],
+        )
+
+    def test_sparse_fieldsets_through_to_many(self):
+        """Prefetched included resources are restricted to their fieldset."""
+        _, prefetch = plan(ShelfSerializer, ["books.category"], {"books": ["author"]})
+        self.assertEqual(
+            prefetch[0].queryset.query.deferred_loading,
+            ({"id", "author", "category"}, False),
+        )
+        self.assertEqual(
+            prefetch[1].queryset.query.deferred_loading, ({"id", "name"}, False)
+        )
@@ -0,0 +1,107 @@
+"""Ensure the number of queries per request does not grow with the page size."""
+import json
+from typing import List
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework_json_api.utils import get_included_serializers
+
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from users.models import User
+from webapp.api import routes
+from webapp.test.base import BaseTestCase
+
+PAGE_SIZES = [1, 100, 1000]
+ROWS = max(PAGE_SIZES)
+
+
+def get_include_paths(serializer_class, prefix="") -> List[str]:
+    """Return every include path the serializer accepts."""
+    paths = []
+    for name, included in get_included_serializers(serializer_class).items():
+        path = f"{prefix}{name}"
+        paths.append(path)
+        if included is not serializer_class:
+            paths += get_include_paths(included, prefix=f"{path}.")
+    return paths
+
+
+def get_include_params(serializer_class) -> List[str]:
+    """Return no include, each include path on its own and all of them at once.
+
+    The prefetch planner handles each path independently, so this covers every
+    path and their interactions without rendering the whole power set.
+    """
+    paths = get_include_paths(serializer_class)
+    params = [""] + paths
+    if len(paths) > 1:
+        params.append(",".join(paths))
+    return params
+
+
+class TestCase(BaseTestCase):
+    """Check every listable route against growing page sizes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create enough rows to fill the largest page on every route."""
+        super().setUpTestData()
+        cls.user = User.objects.create_superuser("query-counts@example.com", "pass")
+        users = User.objects.bulk_create(
+            User(email=f"user_{index:04d}@example.com") for index in range(ROWS)
+        )
+        categories = Category.objects.bulk_create(
+            Category(name=f"category {index}") for index in range(ROWS)
+        )
+        books = Book.objects.bulk_create(
+            Book(title=f"book {index}", author="author", category=category)
+            for index, category in enumerate(categories)
+        )
+        shelves = Shelf.objects.bulk_create(
+            Shelf(name=f"shelf {index}", user=user) for index, user in enumerate(users)
+        )
+        Shelfbook.objects.bulk_create(
+            Shelfbook(shelf=shelf, book=book) for shelf, book in zip(shelves, books)
+        )
+        Review.objects.bulk_create(
+            Review(rate="3", user=user, book=book) for user, book in zip(users, books)
+        )
+        # The library export of the superuser streams a shelf of ROWS books.
+        library = Shelf.objects.create(name="library", user=cls.user)
+        Shelfbook.objects.bulk_create(
+            Shelfbook(shelf=library, book=book) for book in books
+        )
+        cls.library_size = 1 + len(books)
+
+    def setUp(self):
+        """Authenticate as a superuser so every row is visible."""
+        super().setUp()
+        self.auth(self.user)
+
+    def test_query_counts(self):
+        """Query counts are the same for every page size and include."""
+        for regex, viewset in routes:
+            if not hasattr(viewset, "list"):
+                continue
+            serializer_class = getattr(viewset, "serializer_class", None)
+            for include in get_include_params(serializer_class):
+                with self.subTest(route=regex, include=include):
+                    self._check_route(regex, include)
+
+    def _check_route(self, regex, include):
+        path = f"/{regex}/"
+        params = {"include": include} if include else {}
+        with CaptureQueriesContext(connection) as context:
+            self._read(path, {**params, "page[size]": PAGE_SIZES[0]})
+        for page_size in PAGE_SIZES[1:]:
+            with self.assertMaxQueries(len(context)):
+                self._read(path, {**params, "page[size]": page_size})
+
+    def _read(self, path, params):
+        response = self.get(path, params, asserted_status=status.HTTP_200_OK)
+        if response.streaming:
+            # Streamed bodies run their queries as they are read.
+            lines = b"".join(response.streaming_content).decode().splitlines()
+            records = [json.loads(line) for line in lines]
+            self.assertEqual(len(records), self.library_size)
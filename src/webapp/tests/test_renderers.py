@@ -0,0 +1,109 @@
+"""Ensure the JSON:API renderer writes the same documents as the original one."""
+from rest_framework import status
+from rest_framework_json_api.renderers import JSONRenderer
+
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from better_reads.signals import CATALOGUE
+from users.tests import schemas
+from users.tests.factories import UserFactory
+from webapp.cache import invalidate
+from webapp.renderers import JSONAPIRenderer
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test rendering documents from compiled plans with orjson."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a shelf of reviewed books."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        category = Category.objects.create(name="Fantasy")
+        cls.books = [
+            Book.objects.create(
+                title=title, author="Tolkien", category=category, description="“…”"
+            )
+            for title in ["The Hobbit", "The Silmarillion "]
+        ]
+        cls.shelf = Shelf.objects.create(name="Mine", user=cls.user)
+        for book in cls.books:
+            Shelfbook.objects.create(shelf=cls.shelf, book=book)
+        Review.objects.create(rate="5", user=cls.user, book=cls.books[0])
+
+    def setUp(self):
+        """Authenticate as the owner of the shelf."""
+        super().setUp()
+        self.auth(self.user)
+        invalidate(CATALOGUE)
+
+    def assertRenderedAlike(self, path, *args, **kwargs):
+        """Check the response is what the original renderer would have written."""
+        response = self.get(path, *args, **kwargs)
+        self.assertIsInstance(response.accepted_renderer, JSONAPIRenderer)
+        expected = JSONRenderer().render(
+            response.data, response.accepted_media_type, response.renderer_context
+        )
+        self.assertEqual(response.content, expected)
+        return response
+
+    def test_documents(self):
+        """Lists, resources, includes, sparse fieldsets and errors are alike."""
+        for path, params in [
+            ("/books/", {}),
+            ("/books/", {"include": "category", "fields[books]": "title,category"}),
+            (f"/books/{self.books[1].pk}/", {}),
+            ("/shelves/", {"include": "books"}),
+            ("/shelfbooks/", {"include": "book,shelf"}),
+            ("/reviews/", {"include": "book.category,user"}),
+            ("/books/0/", {}),
+            ("/shelfbooks/", {"filter[nonsense]": "1"}),
+        ]:
+            with self.subTest(path=path, params=params):
+                self.assertRenderedAlike(path, params)
+        planned = {
+            key[0].__name__ for key, plan in JSONAPIRenderer.plans.items() if plan
+        }
+        self.assertLessEqual(
+            {"BookSerializer", "ShelfSerializer", "ShelfbookSerializer"}, planned
+        )
+
+    def test_schemas(self):
+        """Documents still match the schemas of their resources."""
+        self.assertRenderedAlike(
+            f"/users/{self.user.pk}/",
+            asserted_status=status.HTTP_200_OK,
+            asserted_schema=schemas.UsersSchema.get_matcher(),
+        )
+
+    def test_floats(self):
+        """Floats are written as json writes them, exponents included."""
+        Book.objects.filter(pk=self.books[0].pk).update(rating_average=1e-05)
+        Book.objects.filter(pk=self.books[1].pk).update(rating_average=1e16)
+        response = self.assertRenderedAlike("/books/")
+        self.assertIn(b'"rating_average":1e-05', response.content)
+        self.assertIn(b'"rating_average":1e+16', response.content)
+
+    def test_nested_floats(self):
+        """Floats inside lists and objects of attributes are written alike."""
+        renditions = {
+            "small": {
+                "webp": "small.webp",
+                "jpeg": "small.jpeg",
+                "scale": 1e-05,
+                "sizes": [3e-06, [0.5, 2e-07]],
+            }
+        }
+        Book.objects.filter(pk=self.books[0].pk).update(
+            cover_renditions={"renditions": renditions}
+        )
+        response = self.assertRenderedAlike("/books/")
+        self.assertIn(b'"scale":1e-05', response.content)
+        self.assertIn(b'"sizes":[3e-06,[0.5,2e-07]]', response.content)
+
+    def test_indent(self):
+        """Indented documents are left to the JSON renderer of DRF."""
+        response = self.assertRenderedAlike(
+            "/books/", HTTP_ACCEPT="application/vnd.api+json; indent=2"
+        )
+        self.assertIn(b'\n  "data"', response.content)
@@ -0,0 +1,115 @@
+"""Ensure anonymous catalogue reads are served from the response cache."""
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from rest_framework import status
+
+from better_reads.models import Book, Category, Review
+from better_reads.signals import CATALOGUE
+from users.tests.factories import UserFactory
+from webapp.cache import get_cache, get_stats, invalidate
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test the response cache of books and categories."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a catalogue."""
+        super().setUpTestData()
+        cls.category = Category.objects.create(name="Fantasy")
+        cls.book = Book.objects.create(
+            title="Dune", author="Herbert", category=cls.category
+        )
+
+    def setUp(self):
+        """Start from an empty cache."""
+        super().setUp()
+        invalidate(CATALOGUE)
+
+    def assertCache(self, path, expected, *args, **kwargs):
+        """Get the path and check whether it was served from the cache."""
+        response = self.get(path, *args, asserted_status=status.HTTP_200_OK, **kwargs)
+        self.assertEqual(response.get("X-Cache"), expected)
+        return response
+
+    def test_hit(self):
+        """Repeated anonymous reads run no query and render the same content."""
+        miss = self.assertCache("/books/", "MISS", {"include": "category"})
+        hit = self.assertCache(
+            "/books/", "HIT", {"include": "category"}, query_budget=0
+        )
+        self.assertEqual(hit.content, miss.content)
+        self.assertEqual(hit["Content-Type"], miss["Content-Type"])
+        self.assertCache(f"/books/{self.book.pk}/", "MISS")
+        self.assertCache(f"/books/{self.book.pk}/", "HIT", query_budget=0)
+
+    def test_key(self):
+        """Query strings are normalized, Accept headers are distinguished."""
+        self.assertCache("/categories/", "MISS", {"sort": "name", "page[size]": 5})
+        self.assertCache("/categories/", "HIT", {"page[size]": 5, "sort": "name"})
+        self.assertCache("/categories/", "MISS", {"sort": "-name", "page[size]": 5})
+        self.assertCache(
+            "/categories/",
+            "MISS",
+            {"sort": "name", "page[size]": 5},
+            HTTP_ACCEPT="application/vnd.api+json",
+        )
+
+    def test_invalidation(self):
+        """Changes to books, categories and reviews invalidate the responses."""
+        self.assertCache("/books/", "MISS")
+        self.category.name = "Sci-fi"
+        self.category.save()
+        response = self.assertCache("/books/", "MISS", {"include": "category"})
+        self.assertEqual(response.json()["included"][0]["attributes"]["name"], "Sci-fi")
+        self.assertCache("/books/", "MISS")
+        self.assertCache(f"/books/{self.book.pk}/", "MISS")
+        other = Book.objects.create(
+            title="Emma", author="Austen", category=self.category
+        )
+        self.assertCache("/books/", "MISS")
+        self.assertCache(f"/books/{other.pk}/", "MISS")
+        review = Review.objects.create(rate="4", user=UserFactory(), book=self.book)
+        response = self.assertCache(f"/books/{self.book.pk}/", "MISS")
+        self.assertEqual(response.json()["data"]["attributes"]["rating_count"], 1)
+        self.assertCache(f"/books/{self.book.pk}/", "HIT")
+        # Reviews leave the rest of the catalogue cached.
+        self.assertCache(f"/books/{other.pk}/", "HIT")
+        self.assertCache("/books/", "HIT")
+        review.delete()
+        response = self.assertCache(f"/books/{self.book.pk}/", "MISS")
+        self.assertEqual(response.json()["data"]["attributes"]["rating_count"], 0)
+
+    def test_timeout(self):
+        """Book lists expire sooner, they are not invalidated by reviews."""
+        with mock.patch.object(get_cache(), "set") as cache_set:
+            self.assertCache("/books/", "MISS")
+            self.assertCache(f"/books/{self.book.pk}/", "MISS")
+            self.assertCache("/categories/", "MISS")
+        self.assertEqual(
+            [call[0][2] for call in cache_set.call_args_list],
+            [60, settings.API_CACHE_TIMEOUT, settings.API_CACHE_TIMEOUT],
+        )
+
+    def test_authenticated(self):
+        """Responses of authenticated users are neither cached nor shared."""
+        self.auth(UserFactory())
+        self.assertCache("/books/", None)
+        self.assertCache("/books/", None)
+
+    def test_stats(self):
+        """Hits and misses are counted and reported."""
+        before = get_stats(CATALOGUE)
+        self.assertCache("/categories/", "MISS")
+        self.assertCache("/categories/", "HIT")
+        self.assertCache("/categories/", "HIT")
+        after = get_stats(CATALOGUE)
+        self.assertEqual(after["hits"] - before["hits"], 2)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        output = StringIO()
+        call_command("response_cache_stats", stdout=output)
+        self.assertIn(f"{CATALOGUE}: {after['hits']} hits", output.getvalue())
@@ -0,0 +1,61 @@
+"""Ensure full-text search is used for views with a search vector."""
+from rest_framework import status
+
+from better_reads.models import Book, Category
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test the search filter on the books endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create books to search."""
+        super().setUpTestData()
+        cls.fantasy = Category.objects.create(name="Fantasy")
+        cls.history = Category.objects.create(name="History")
+        cls.hobbit = Book.objects.create(
+            title="The Hobbit", author="Tolkien", category=cls.fantasy
+        )
+        cls.rings = Book.objects.create(
+            title="The Fellowship",
+            author="Tolkien",
+            category=cls.fantasy,
+            description="The journey of the hobbit Frodo.",
+        )
+        cls.rome = Book.objects.create(
+            title="SPQR", author="Beard", category=cls.history
+        )
+
+    def search(self, term, **params):
+        """Return the ids of the books matching the search term."""
+        params["filter[search]"] = term
+        response = self.get("/books/", params, asserted_status=status.HTTP_200_OK)
+        return [int(book["id"]) for book in response.json()["data"]]
+
+    def test_prefix(self):
+        """Every term is matched as a prefix of a word."""
+        self.assertEqual(self.search("spq"), [self.rome.pk])
+        self.assertEqual(self.search("tolk hob"), [self.hobbit.pk, self.rings.pk])
+
+    def test_ranked(self):
+        """Matches on the title rank above matches on the description."""
+        self.assertEqual(self.search("hobbit"), [self.hobbit.pk, self.rings.pk])
+
+    def test_explicit_sort(self):
+        """A requested ordering takes precedence over the rank."""
+        self.assertEqual(
+            self.search("hobbit", sort="-id"), [self.rings.pk, self.hobbit.pk]
+        )
+
+    def test_category_name(self):
+        """Renaming a category updates the search vector of its books."""
+        self.assertEqual(self.search("history"), [self.rome.pk])
+        self.history.name = "Classics"
+        self.history.save()
+        self.assertEqual(self.search("history"), [])
+        self.assertEqual(self.search("classics"), [self.rome.pk])
+
+    def test_no_words(self):
+        """Terms without any words match nothing."""
+        self.assertEqual(self.search("!!"), [])
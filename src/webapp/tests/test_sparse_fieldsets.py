@@ -0,0 +1,120 @@
+"""Ensure sparse fieldsets keep unrequested columns in the database."""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from better_reads.models import Book, Category, Review, Shelf, Shelfbook
+from users.tests.factories import UserFactory
+from webapp.test.base import BaseTestCase
+
+
+class TestCase(BaseTestCase):
+    """Test fetching only the columns of sparse fieldsets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a shelf of reviewed books."""
+        super().setUpTestData()
+        cls.user = UserFactory()
+        category = Category.objects.create(name="Fantasy")
+        cls.books = [
+            Book.objects.create(
+                title=title,
+                author="Tolkien",
+                category=category,
+                description="A long description.",
+            )
+            for title in ["The Hobbit", "The Silmarillion"]
+        ]
+        shelf = Shelf.objects.create(name="Mine", user=cls.user)
+        for book in cls.books:
+            Shelfbook.objects.create(shelf=shelf, book=book)
+            Review.objects.create(
+                rate="4", content="A long review.", user=cls.user, book=book
+            )
+
+    def setUp(self):
+        """Authenticate as the owner of the shelf."""
+        super().setUp()
+        self.auth(self.user)
+
+    def get_sql(self, path, params):
+        """Return the response and the SQL run to answer the request."""
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(path, params, asserted_status=status.HTTP_200_OK)
+        return response.json(), "\n".join(query["sql"] for query in context)
+
+    def test_columns(self):
+        """Unrequested columns are not selected, with the same number of queries."""
+        for path, params, columns in [
+            ("/books/", {"fields[books]": "title"}, ["description", "cover"]),
+            (
+                "/reviews/",
+                {
+                    "include": "book",
+                    "fields[reviews]": "rate,book",
+                    "fields[books]": "title",
+                },
+                ['"content"', "description"],
+            ),
+            (
+                "/reviews/",
+                {"include": "book.category", "fields[reviews]": "rate,book"},
+                ['"content"'],
+            ),
+            (
+                "/shelves/",
+                {"include": "books", "fields[books]": "title,author"},
+                ["description", "cover"],
+            ),
+            (
+                f"/books/{self.books[0].pk}/",
+                {"fields[books]": "title"},
+                ["description"],
+            ),
+        ]:
+            with self.subTest(path=path, params=params):
+                expected, full_sql = self.get_sql(
+                    path,
+                    {key: value for key, value in params.items() if key == "include"},
+                )
+                document, sql = self.get_sql(path, params)
+                for column in columns:
+                    self.assertIn(column, full_sql)
+                    self.assertNotIn(column, sql)
+                self.assertEqual(full_sql.count("SELECT"), sql.count("SELECT"))
+                self.assertEqual(
+                    {resource["id"] for resource in document.get("included", [])},
+                    {resource["id"] for resource in expected.get("included", [])},
+                )
+
+    def test_attributes(self):
+        """Requested attributes are rendered from the loaded columns."""
+        document, _ = self.get_sql(
+            "/reviews/",
+            {
+                "include": "book.category",
+                "fields[reviews]": "content,book",
+                "fields[books]": "title,category",
+            },
+        )
+        self.assertEqual(
+            [resource["attributes"] for resource in document["data"]],
+            [{"content": "A long review."}] * 2,
+        )
+        books = [
+            resource for resource in document["included"] if resource["type"] == "books"
+        ]
+        self.assertEqual(
+            sorted(book["attributes"]["title"] for book in books),
+            ["The Hobbit", "The Silmarillion"],
+        )
+        self.assertEqual(
+            {book["relationships"]["category"]["data"]["id"] for book in books},
+            {str(self.books[0].category_id)},
+        )
+
+    def test_not_applied(self):
+        """Fieldsets of other resource types leave the columns alone."""
+        _, sql = self.get_sql("/books/", {"fields[reviews]": "rate"})
+        self.assertIn("description", sql)
@@ -0,0 +1,108 @@
+"""Tests for the signed URLs of media files."""
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.test import SimpleTestCase, override_settings
+from storages.backends import s3boto3
+
+from webapp.storage import MediaS3, get_url_cache
+
+NAMES = ["book_covers/hobbit.jpg", "library_imports/export.csv"]
+OTHER = "book_covers/emma.jpg"
+
+
+def make_storage():
+    """Return a media storage signing its URLs, as in production."""
+    return MediaS3(
+        custom_domain=None,
+        access_key="key",
+        secret_key="secret",
+        endpoint_url="https://s3.example.com",
+        region_name="us-east-1",
+    )
+
+
+class TestCase(SimpleTestCase):
+    """Test signing media URLs through the shared cache."""
+
+    def setUp(self):
+        """Count the URLs signed and start from an empty cache."""
+        super().setUp()
+        keys = [f"url:{name}" for name in NAMES + [OTHER]]
+        get_url_cache().delete_many(keys)
+        self.addCleanup(get_url_cache().delete_many, keys)
+        patcher = mock.patch.object(
+            s3boto3.S3Boto3Storage,
+            "url",
+            autospec=True,
+            side_effect=s3boto3.S3Boto3Storage.url,
+        )
+        self.signed = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_signed_once(self):
+        """Each URL is signed once, then shared with other workers."""
+        storage = make_storage()
+        url = storage.url(NAMES[0])
+        self.assertIn("Signature", parse_qs(urlparse(url).query))
+        self.assertEqual(storage.url(NAMES[0]), url)
+        self.assertEqual(make_storage().url(NAMES[0]), url)
+        self.assertEqual(self.signed.call_count, 1)
+
+    def test_expiry(self):
+        """Each URL is signed again once used for the cache timeout."""
+        storage = make_storage()
+        with mock.patch("webapp.storage.time.time", return_value=1000):
+            storage.url(NAMES[0])
+        with mock.patch("webapp.storage.time.time", return_value=1000 + 3599):
+            storage.url(NAMES[0])
+            self.assertEqual(self.signed.call_count, 1)
+        with mock.patch("webapp.storage.time.time", return_value=1000 + 3600):
+            storage.url(NAMES[0])
+            make_storage().url(NAMES[0])
+            self.assertEqual(self.signed.call_count, 2)
+
+    def test_cache_urls(self):
+        """The URLs of many files are read from the cache at once."""
+        storage = make_storage()
+        storage.cache_urls(NAMES)
+        self.assertEqual(self.signed.call_count, 2)
+        other = make_storage()
+        with mock.patch.object(
+            get_url_cache(), "get_many", wraps=get_url_cache().get_many
+        ) as get_many:
+            other.cache_urls(NAMES + [""])
+            urls = [other.url(name) for name in NAMES]
+        get_many.assert_called_once()
+        self.assertEqual(urls, [storage.url(name) for name in NAMES])
+        self.assertEqual(self.signed.call_count, 2)
+
+    def test_least_recently_used(self):
+        """The least recently used URLs are forgotten first, and returned anyway."""
+        storage = make_storage()
+        storage.max_memoized_urls = 2
+        urls = storage.cache_urls(NAMES)
+        self.assertEqual(urls, {name: storage.url(name) for name in NAMES})
+        storage.url(NAMES[0])
+        storage.cache_urls([OTHER])
+        self.assertEqual(list(storage.urls), [NAMES[0], OTHER])
+        self.assertEqual(storage.url(NAMES[1]), urls[NAMES[1]])
+        self.assertEqual(self.signed.call_count, 3)
+
+    def test_custom_parameters(self):
+        """Each URL with custom parameters is signed anew."""
+        storage = make_storage()
+        storage.url(NAMES[0], expire=60)
+        storage.url(NAMES[0], expire=60)
+        self.assertEqual(self.signed.call_count, 2)
+
+    @override_settings(MEDIA_PUBLIC_URL="https://cdn.example.com/")
+    def test_public_url(self):
+        """Covers are served unsigned from the public URL, other files are signed."""
+        storage = make_storage()
+        self.assertEqual(
+            storage.url(NAMES[0]),
+            "https://cdn.example.com/assets/media/book_covers/hobbit.jpg",
+        )
+        self.assertEqual(self.signed.call_count, 0)
+        self.assertIn("Signature", storage.url(NAMES[1]))
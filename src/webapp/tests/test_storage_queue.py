@@ -0,0 +1,108 @@
+"""Tests for the deferred deletes of media files."""
+from unittest import mock
+
+from celery.exceptions import Retry
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import TestCase as DjangoTestCase
+
+from webapp.storage import delete_later, pop_deletes, push_deletes
+from webapp.tasks import delete_media
+from webapp.test.storage import (
+    MockedS3Mixin,
+    clear_storage_queue,
+    run_storage_operations,
+)
+
+
+class TestCase(MockedS3Mixin, DjangoTestCase):
+    """Test the storage queue against a mocked S3."""
+
+    def setUp(self):
+        """Start from an empty queue."""
+        super().setUp()
+        clear_storage_queue()
+        self.addCleanup(clear_storage_queue)
+
+    def save(self, count, prefix="library_imports/export"):
+        """Store count files and return their names."""
+        return [
+            default_storage.save(f"{prefix}{index}.csv", ContentFile(b"isbn"))
+            for index in range(count)
+        ]
+
+    def test_batches(self):
+        """Deletes queued by many transactions are sent 1000 keys at a time."""
+        names = self.save(3) + [
+            f"library_imports/gone{index}.csv" for index in range(2497)
+        ]
+        with mock.patch(
+            "django.db.transaction.on_commit", side_effect=lambda func: func()
+        ), mock.patch.object(delete_media, "apply_async") as apply_async:
+            for start in range(0, len(names), 100):
+                delete_later(names[start : start + 100])
+        apply_async.assert_called_once_with(countdown=10)
+        client = default_storage.bucket.meta.client
+        with mock.patch.object(
+            client, "delete_objects", wraps=client.delete_objects
+        ) as delete_objects:
+            delete_media()
+        self.assertEqual(
+            [
+                len(call[1]["Delete"]["Objects"])
+                for call in delete_objects.call_args_list
+            ],
+            [1000, 1000, 500],
+        )
+        self.assertFalse(any(default_storage.exists(name) for name in names[:3]))
+        self.assertEqual(pop_deletes(), [])
+
+    def test_rescheduled(self):
+        """Files queued once the queue was drained schedule another drain."""
+        names = self.save(2)
+        with run_storage_operations() as apply_async:
+            delete_later(names[:1])
+            delete_later(names[1:])
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_rollback(self):
+        """Nothing is deleted when the transaction rolls back."""
+        (name,) = self.save(1)
+        with self.assertRaises(ValueError), transaction.atomic():
+            delete_later([name])
+            raise ValueError
+        self.assertEqual(transaction.get_connection().run_on_commit, [])
+        self.assertTrue(default_storage.exists(name))
+
+    def test_retries(self):
+        """Failed deletes are queued again and retried."""
+        names = self.save(3)
+        push_deletes(names)
+
+        def fail_second(Bucket, Delete):  # pylint: disable=invalid-name
+            return {
+                "Errors": [{"Key": Delete["Objects"][1]["Key"], "Code": "SlowDown"}]
+            }
+
+        with mock.patch.object(
+            default_storage.bucket.meta.client,
+            "delete_objects",
+            side_effect=fail_second,
+        ), mock.patch.object(delete_media, "retry", side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                delete_media()
+        retry.assert_called_once_with(countdown=10)
+        self.assertEqual(pop_deletes(), [names[1]])
+
+    def test_retries_exhausted(self):
+        """Files still failing after the last retry are logged and dropped."""
+        (name,) = self.save(1)
+        push_deletes([name])
+        with mock.patch.object(
+            default_storage.bucket.meta.client, "delete_objects", side_effect=OSError,
+        ), self.assertLogs("webapp.tasks", "ERROR") as logs:
+            delete_media.apply(retries=delete_media.max_retries)
+        self.assertIn(name, logs.output[-1])
+        self.assertEqual(pop_deletes(), [])